@@ -0,0 +1,193 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+
+class ALSModel:
+    """Matrix factorization trained with alternating least squares.
+
+    Learns float32 ``user_factors`` and ``item_factors`` from a sparse
+    user x item rating matrix so that a user's scores are a single
+    ``user_factors[u] @ item_factors.T``.
+
+    With ``implicit=False`` the ratings are fitted around their global mean
+    with weighted-lambda regularization (Zhou et al., 2008), so scores are
+    predicted ratings.
+    With ``implicit=True`` ratings are treated as confidence ``1 + alpha * r``
+    in observed preferences (Hu, Koren & Volinsky, 2008) and scores are
+    relative preferences.
+
+    Each half-step solves every row's normal equations with a few conjugate
+    gradient steps, warm-started from the previous iteration and vectorized
+    over chunks of rows. Chunks are spread over ``num_threads`` threads.
+    """
+
+    def __init__(self, factors=64, regularization=0.1, iterations=15, implicit=False,
+                 alpha=40.0, cg_steps=3, num_threads=None, chunk_size=2 ** 20,
+                 random_state=0):
+        self.factors = factors
+        self.regularization = regularization
+        self.iterations = iterations
+        self.implicit = implicit
+        self.alpha = alpha
+        self.cg_steps = cg_steps
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.random_state = random_state
+        self.global_mean = 0.0
+        self.user_factors = None
+        self.item_factors = None
+        self._item_factors_cache = None
+
+    def fit(self, rating_matrix):
+        """Train factors on a users x items sparse ``rating_matrix``."""
+        user_items = self._residuals(rating_matrix, fit_mean=True)
+        item_users = user_items.T.tocsr()
+
+        rng = np.random.default_rng(self.random_state)
+        scale = 0.01 if self.implicit else 1.0 / self.factors ** 0.5
+        self.user_factors = (rng.random((user_items.shape[0], self.factors),
+                                        dtype=np.float32) * scale)
+        self.item_factors = (rng.random((user_items.shape[1], self.factors),
+                                        dtype=np.float32) * scale)
+
+        for _ in range(self.iterations):
+            self._solve(user_items, self.item_factors, self.user_factors)
+            self._solve(item_users, self.user_factors, self.item_factors)
+        self._item_factors_cache = None
+        return self
+
+    def recalculate_rows(self, rating_rows, current=None):
+        """Solve user factors for ``rating_rows`` against the fixed item factors.
+
+        Used to fold new or updated users into a trained model without
+        retraining it.
+        """
+        rating_rows = self._residuals(rating_rows)
+        if current is None:
+            current = np.zeros((rating_rows.shape[0], self.factors), dtype=np.float32)
+        else:
+            current = np.array(current, dtype=np.float32)
+        # More CG steps since there is no previous iteration to warm-start from
+        self._solve(rating_rows, self.item_factors, current,
+                    cg_steps=max(self.cg_steps, self.factors // 4))
+        return current
+
+    def score(self, user_row, items=None):
+        """Return the model score of every item (or of the ``items`` rows) for one user row."""
+        return self.score_block([user_row], items)[0]
+
+    def score_block(self, user_rows, items=None):
+        """Return a ``(len(user_rows), n_items)`` float32 score matrix.
+
+        Dot products are accumulated in float64 and rounded to float32, so a
+        user's scores do not depend on whether they were computed alone, in
+        a block or for a subset of items (GEMM and gemv kernels sum in
+        different orders).
+        """
+        item_factors = self._item_factors_f64()
+        if items is not None:
+            item_factors = item_factors[items]
+        scores = self.user_factors[user_rows].astype(np.float64) @ item_factors.T
+        scores += self.global_mean
+        return scores.astype(np.float32)
+
+    def _item_factors_f64(self):
+        # Converted once per set of item factors; they only change on fit or load
+        cached = self._item_factors_cache
+        if cached is None or cached[0] is not self.item_factors:
+            cached = (self.item_factors, np.asarray(self.item_factors, dtype=np.float64))
+            self._item_factors_cache = cached
+        return cached[1]
+
+    def _residuals(self, rating_matrix, fit_mean=False):
+        """Copy ``rating_matrix`` as float32 CSR, centered for explicit ratings."""
+        matrix = sparse.csr_matrix(rating_matrix, dtype=np.float32, copy=True)
+        if not self.implicit:
+            if fit_mean:
+                self.global_mean = float(matrix.data.mean()) if matrix.nnz else 0.0
+            matrix.data -= self.global_mean
+        return matrix
+
+    def _solve(self, matrix, fixed, current, cg_steps=None):
+        """Update ``current`` in place: one least-squares solve per matrix row."""
+        gram = fixed.T @ fixed if self.implicit else None
+        chunks = _row_chunks(matrix.indptr, self.chunk_size)
+
+        def solve_chunk(bounds):
+            start, stop = bounds
+            current[start:stop] = self._solve_chunk(
+                matrix, start, stop, fixed, current[start:stop], gram,
+                cg_steps or self.cg_steps)
+
+        if self.num_threads > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=self.num_threads) as pool:
+                list(pool.map(solve_chunk, chunks))
+        else:
+            for bounds in chunks:
+                solve_chunk(bounds)
+
+    def _solve_chunk(self, matrix, start, stop, fixed, x, gram, cg_steps):
+        """Run batched conjugate gradient for rows ``start:stop``."""
+        indptr = matrix.indptr[start:stop + 1]
+        lo, hi = indptr[0], indptr[-1]
+        local_indptr = indptr - lo
+        counts = np.diff(indptr)
+        indices = matrix.indices[lo:hi]
+        owner = np.repeat(np.arange(stop - start), counts)
+        fixed_rows = fixed[indices]
+        values = matrix.data[lo:hi]
+
+        if self.implicit:
+            weights = self.alpha * values
+            targets = 1 + weights
+            reg = np.full(stop - start, self.regularization, dtype=np.float32)
+        else:
+            weights = np.ones_like(values)
+            targets = values
+            reg = self.regularization * np.maximum(counts, 1).astype(np.float32)
+
+        def weighted_sum(row_weights):
+            # Per-row sums of weighted fixed factors as one sparse @ dense product
+            weighted = sparse.csr_matrix((row_weights, indices, local_indptr),
+                                         shape=(stop - start, fixed.shape[0]))
+            return weighted @ fixed
+
+        def matvec(p):
+            projected = np.einsum('tf,tf->t', fixed_rows, p[owner]) * weights
+            out = weighted_sum(projected)
+            out += reg[:, None] * p
+            if gram is not None:
+                out += p @ gram
+            return out
+
+        b = weighted_sum(targets)
+        x = np.array(x, dtype=np.float32)
+        r = b - matvec(x)
+        p = r.copy()
+        rs = np.einsum('ij,ij->i', r, r)
+        for _ in range(cg_steps):
+            ap = matvec(p)
+            denom = np.einsum('ij,ij->i', p, ap)
+            step = np.divide(rs, denom, out=np.zeros_like(rs), where=denom > 0)
+            x += step[:, None] * p
+            r -= step[:, None] * ap
+            rs_new = np.einsum('ij,ij->i', r, r)
+            if rs_new.max(initial=0) < 1e-10:
+                break
+            beta = np.divide(rs_new, rs, out=np.zeros_like(rs), where=rs > 0)
+            p = r + beta[:, None] * p
+            rs = rs_new
+        return x
+
+
+def _row_chunks(indptr, chunk_size):
+    """Split CSR rows into contiguous ranges holding about ``chunk_size`` values."""
+    n_rows = len(indptr) - 1
+    bounds = np.searchsorted(indptr, np.arange(0, indptr[-1], chunk_size), side='right') - 1
+    bounds = np.unique(np.concatenate((bounds, [n_rows])).clip(0, n_rows))
+    if bounds[0] != 0:
+        bounds = np.concatenate(([0], bounds))
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
@@ -1,11 +1,17 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify
 from flask_caching import Cache
-from movie_recommender import MovieRecommender
-from tmdb_client import TMDBClient
+from artifacts import latest_version
+from model_manager import ModelManager, ModelNotReady
+from pagination import next_cursor
+from rec_cache import RecommendationCache
+from metrics import REGISTRY, HTTP_REQUEST_SECONDS, SamplingProfiler, span
 from config import Config
+import hmac
 import json
 import os
+import time
 import logging
+import threading
 from functools import wraps
 
 # Configure logging
@@ -22,24 +28,108 @@ app.config.from_object(Config)
 # Initialize caching
 cache = Cache(app)
 
-# Initialize the recommender system
-try:
-    recommender = MovieRecommender(
-        Config.MOVIES_DATASET,
-        Config.RATINGS_DATASET
-    )
-    logger.info("MovieRecommender initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize MovieRecommender: {str(e)}")
-    raise
-
-# Initialize TMDB client
-try:
-    tmdb_client = TMDBClient(Config.TMDB_API_KEY)
-    logger.info("TMDBClient initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize TMDBClient: {str(e)}")
-    raise
+# Sample MovieRecommender calls with cProfile when PROFILE_SAMPLE_RATE > 0
+PROFILED_METHODS = ('content_based_recommendations', 'collaborative_recommendations',
+                    'hybrid_recommendations', 'get_top_rated_movies', 'search_titles',
+                    'add_ratings')
+profiler = SamplingProfiler(Config.PROFILE_SAMPLE_RATE) if Config.PROFILE_SAMPLE_RATE > 0 else None
+
+# Created with the first model; they are carried over to every later version
+rating_updater = None
+tmdb_client = None
+_tmdb_client_lock = threading.Lock()
+
+def init_tmdb_client():
+    """Create the TMDB client, backed by the durable metadata cache, once.
+
+    Without a TMDB API key recommendations are served without TMDB data.
+    """
+    global tmdb_client
+    with _tmdb_client_lock:
+        if tmdb_client is not None or not Config.TMDB_API_KEY:
+            return tmdb_client
+        try:
+            from tmdb_client import TMDBClient
+            from tmdb_cache import TMDBMetadataCache
+
+            metadata_cache = TMDBMetadataCache(Config.TMDB_CACHE_PATH, ttl=Config.TMDB_CACHE_TTL)
+            if os.path.exists(Config.LINKS_DATASET):
+                metadata_cache.seed_links_file(Config.LINKS_DATASET)
+            else:
+                logger.warning(f"Links file '{Config.LINKS_DATASET}' not found; "
+                               "TMDB lookups will fall back to title search")
+            tmdb_client = TMDBClient(
+                Config.TMDB_API_KEY,
+                base_url=Config.TMDB_API_BASE_URL,
+                max_workers=Config.TMDB_MAX_WORKERS,
+                request_timeout=Config.TMDB_REQUEST_TIMEOUT,
+                batch_timeout=Config.TMDB_BATCH_TIMEOUT,
+                metadata_cache=metadata_cache
+            )
+            logger.info("TMDBClient initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize TMDBClient: {str(e)}")
+        return tmdb_client
+
+def load_recommender():
+    """Build the recommender, preferring prebuilt artifacts (runs on the loader thread)."""
+    init_tmdb_client()
+    from movie_recommender import MovieRecommender
+    if profiler is not None:
+        profiler.instrument(MovieRecommender, PROFILED_METHODS)
+
+    if latest_version(Config.MODEL_ARTIFACTS_DIR):
+        recommender = MovieRecommender.load(Config.MODEL_ARTIFACTS_DIR)
+        logger.info(f"MovieRecommender loaded from artifacts version {recommender.model_version}")
+    else:
+        recommender = MovieRecommender(
+            Config.MOVIES_DATASET,
+            Config.RATINGS_DATASET,
+            **Config.recommender_options()
+        )
+        logger.info("MovieRecommender initialized successfully")
+    return recommender
+
+def swap_recommender(old, new):
+    """Carry the result cache and rating feed over to a newly loaded model.
+
+    Ratings still queued are applied to the new model. Ratings already
+    applied to the old model are only kept if the new version includes them,
+    as after a restart.
+    """
+    global rating_updater
+    if old is not None:
+        new.result_cache = old.result_cache
+    else:
+        # Cache finished recommendation lists, keyed by model version
+        new.result_cache = RecommendationCache(
+            backend=Config.RESULT_CACHE_BACKEND,
+            max_entries=Config.RESULT_CACHE_SIZE,
+            ttl=Config.RESULT_CACHE_TTL,
+            path=Config.RESULT_CACHE_PATH
+        )
+
+    if rating_updater is None:
+        from rating_updates import RatingUpdater
+
+        # Stream newly submitted ratings into the live model
+        rating_updater = RatingUpdater(
+            new,
+            batch_size=Config.RATING_BATCH_SIZE,
+            flush_interval=Config.RATING_FLUSH_INTERVAL,
+            compaction_interval=Config.RATING_COMPACTION_INTERVAL
+        ).start()
+    else:
+        rating_updater.recommender = new
+
+# The model loads in the background on the first request, so importing the
+# app is cheap and health checks are answered while it loads
+model_manager = ModelManager(
+    load_recommender,
+    on_swap=swap_recommender,
+    version_source=lambda: latest_version(Config.MODEL_ARTIFACTS_DIR),
+    watch_interval=Config.MODEL_RELOAD_INTERVAL
+)
 
 def handle_errors(f):
     """Decorator to handle errors consistently across routes."""
@@ -47,6 +137,8 @@ def handle_errors(f):
     def decorated_function(*args, **kwargs):
         try:
             return f(*args, **kwargs)
+        except ModelNotReady as e:
+            return jsonify({'success': False, 'error': str(e)}), 503
         except Exception as e:
             logger.error(f"Error in {f.__name__}: {str(e)}")
             return jsonify({
@@ -56,61 +148,159 @@ def handle_errors(f):
             }), 500
     return decorated_function
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    model_manager.start()
+
+@app.after_request
+def record_request_latency(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                     endpoint=request.endpoint or 'unmatched',
+                                     method=request.method, status=response.status_code)
+    return response
+
+def enhance_with_tmdb(recommendations):
+    """Attach TMDB poster, overview and rating to each recommendation.
+
+    Metadata comes from the TMDB cache by movieId; misses are fetched
+    concurrently. Recommendations without TMDB data (no match, or a lookup
+    that failed or timed out) are left out; without a TMDB client they are
+    returned as they are.
+    """
+    client = init_tmdb_client()
+    if client is None:
+        return recommendations
+    with span('enrichment'):
+        summaries = client.get_movie_summaries(
+            [rec['movieId'] for rec in recommendations],
+            [rec['title'] for rec in recommendations]
+        )
+    return merge_tmdb(recommendations, summaries)
+
+def merge_tmdb(recommendations, summaries):
+    """Copy TMDB fields into the recommendations that have a TMDB summary."""
+    enhanced = []
+    for rec, tmdb_movie in zip(recommendations, summaries):
+        if tmdb_movie:
+            rec.update({
+                'poster_path': tmdb_movie['poster_path'],
+                'overview': tmdb_movie['overview'],
+                'vote_average': tmdb_movie['vote_average']
+            })
+            enhanced.append(rec)
+    return enhanced
+
 @app.route('/')
-@cache.cached(timeout=300)  # Cache for 5 minutes
+@cache.cached(timeout=300, unless=lambda: not model_manager.ready)  # Cache for 5 minutes
 @handle_errors
 def home():
     # Get trending movies
-    trending_movies = tmdb_client.get_trending_movies()
+    client = init_tmdb_client()
+    trending_movies = client.get_trending_movies() if client is not None else []
     
     # Get top rated movies from our dataset
-    top_rated = recommender.get_top_rated_movies(
-        min_reviews=Config.MIN_REVIEWS_FOR_TOP_RATED
-    ).head(10)
+    top_rated = model_manager.get().get_top_rated_movies(
+        min_reviews=Config.MIN_REVIEWS_FOR_TOP_RATED,
+        limit=Config.TOP_RATED_LIMIT
+    )
     
-    top_rated_list = [{
+    return render_template('index.html', 
+                         trending_movies=trending_movies, 
+                         top_rated=format_top_rated(top_rated))
+
+def format_top_rated(top_rated):
+    """Shape a top-rated DataFrame for templates and JSON responses."""
+    return [{
+        'movieId': int(movie['movieId']),
         'title': movie['title'],
-        'rating': float(movie['rating_mean']),
+        'rating': float(movie.get('bayesian_rating', movie['rating_mean'])),
         'votes': int(movie['rating_count']),
         'genres': movie['genres']
     } for movie in top_rated.to_dict('records')]
+
+@app.route('/top_rated')
+@handle_errors
+def top_rated():
+    try:
+        min_reviews = int(request.args.get('min_reviews', Config.MIN_REVIEWS_FOR_TOP_RATED))
+        limit = min(int(request.args.get('limit', Config.TOP_RATED_LIMIT)),
+                    Config.TOP_RATED_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'min_reviews and limit must be integers'}), 400
+    if limit < 1:
+        return jsonify({'success': False, 'error': 'limit must be positive'}), 400
+    bayesian = request.args.get('bayesian', '0').lower() in ('1', 'true', 'yes')
     
-    return render_template('index.html', 
-                         trending_movies=trending_movies, 
-                         top_rated=top_rated_list)
+    try:
+        movies = model_manager.get().get_top_rated_movies(
+            min_reviews=min_reviews,
+            limit=limit,
+            genre=request.args.get('genre') or None,
+            bayesian=bayesian
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'movies': format_top_rated(movies)})
+
+def recommendation_query(form):
+    """Parse the page size, filters and cursor of a recommendation request.
+
+    Returns ``(limit, filters, cursor)``: ``limit`` is capped at
+    RECOMMENDATIONS_MAX_LIMIT and ``filters`` is a dict for
+    ``MovieRecommender.filter_mask``, None when nothing is filtered.
+    Raises ValueError with a message for the client on invalid input.
+    """
+    try:
+        limit = int(form.get('limit') or Config.DEFAULT_NUM_RECOMMENDATIONS)
+        year_range = tuple(int(form[name]) if form.get(name) else None
+                           for name in ('year_from', 'year_to'))
+        filters = {
+            'genres': [genre for genre in form.getlist('genre') if genre],
+            'year_range': year_range if any(year is not None for year in year_range) else None,
+            'exclude_ids': sorted({int(movie_id) for movie_id in form.getlist('exclude_id')
+                                   if movie_id}),
+            'min_ratings': int(form['min_ratings']) if form.get('min_ratings') else None,
+        }
+    except ValueError:
+        raise ValueError('limit, years, excluded ids and min_ratings must be integers')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    filters = {name: value for name, value in filters.items() if value}
+    return min(limit, Config.RECOMMENDATIONS_MAX_LIMIT), filters or None, form.get('cursor') or None
 
 @app.route('/recommend_by_movie', methods=['POST'])
-@cache.memoize(timeout=300)
 @handle_errors
 def recommend_by_movie():
     movie_title = request.form.get('movie_title')
     if not movie_title:
         return jsonify({'success': False, 'error': 'Movie title is required'}), 400
-        
-    # Get recommendations from our dataset
-    recommendations = recommender.content_based_recommendations(
-        movie_title,
-        num_recommendations=Config.DEFAULT_NUM_RECOMMENDATIONS
-    )
+
+    try:
+        limit, filters, cursor = recommendation_query(request.form)
+        # Get recommendations from our dataset
+        recommendations = model_manager.get().content_based_recommendations(
+            movie_title,
+            num_recommendations=limit,
+            filters=filters,
+            cursor=cursor
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    # Taken before enrichment, which may leave out movies TMDB has no data for
+    page_cursor = next_cursor(recommendations, 'similarity', limit)
     
     # Get real-time movie data for the recommendations
-    enhanced_recommendations = []
-    for rec in recommendations:
-        tmdb_results = tmdb_client.search_movies(rec['title'])
-        if tmdb_results:
-            tmdb_movie = tmdb_results[0]  # Get the first match
-            rec.update({
-                'poster_path': tmdb_movie['poster_path'],
-                'overview': tmdb_movie['overview'],
-                'vote_average': tmdb_movie['vote_average'],
-                'similarity_score': int(rec['similarity'] * 100)  # Convert to percentage
-            })
-            enhanced_recommendations.append(rec)
+    enhanced_recommendations = enhance_with_tmdb(recommendations)
+    for rec in enhanced_recommendations:
+        rec['similarity_score'] = int(rec['similarity'] * 100)  # Convert to percentage
     
-    return jsonify({'success': True, 'recommendations': enhanced_recommendations})
+    return jsonify({'success': True, 'recommendations': enhanced_recommendations,
+                    'next_cursor': page_cursor})
 
 @app.route('/recommend_by_user', methods=['POST'])
-@cache.memoize(timeout=300)
 @handle_errors
 def recommend_by_user():
     try:
@@ -118,49 +308,178 @@ def recommend_by_user():
     except (TypeError, ValueError):
         return jsonify({'success': False, 'error': 'Valid user ID is required'}), 400
         
-    recommendations = recommender.collaborative_recommendations(
-        user_id,
-        num_recommendations=Config.DEFAULT_NUM_RECOMMENDATIONS
-    )
+    try:
+        limit, filters, cursor = recommendation_query(request.form)
+        recommendations = model_manager.get().collaborative_recommendations(
+            user_id,
+            num_recommendations=limit,
+            filters=filters,
+            cursor=cursor
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    page_cursor = next_cursor(recommendations, 'predicted_rating', limit)
     
     # Enhance recommendations with TMDB data
-    enhanced_recommendations = []
-    for rec in recommendations:
-        tmdb_results = tmdb_client.search_movies(rec['title'])
-        if tmdb_results:
-            tmdb_movie = tmdb_results[0]
-            rec.update({
-                'poster_path': tmdb_movie['poster_path'],
-                'overview': tmdb_movie['overview'],
-                'vote_average': tmdb_movie['vote_average'],
-                'predicted_rating': round(float(rec['predicted_rating']), 1)
-            })
-            enhanced_recommendations.append(rec)
-        
+    enhanced_recommendations = enhance_with_tmdb(recommendations)
+    for rec in enhanced_recommendations:
+        rec['predicted_rating'] = round(float(rec['predicted_rating']), 1)
+
+    return jsonify({'success': True, 'recommendations': enhanced_recommendations,
+                    'next_cursor': page_cursor})
+
+def hybrid_arguments(form):
+    """Parse a hybrid request form into ``(user_id, movie_titles, weights)``.
+
+    Signal weights missing from the form fall back to HYBRID_WEIGHTS.
+    Raises ValueError with a message for the client on invalid input.
+    """
+    movie_titles = [title for title in form.getlist('movie_title') if title]
+    try:
+        user_id = int(form['user_id']) if form.get('user_id') else None
+        weights = {name: float(form[f'{name}_weight'])
+                   for name in Config.HYBRID_WEIGHTS if form.get(f'{name}_weight')}
+    except ValueError:
+        raise ValueError('user_id and weights must be numbers')
+    if user_id is None and not movie_titles:
+        raise ValueError('A user ID or movie title is required')
+    return user_id, movie_titles, {**Config.HYBRID_WEIGHTS, **weights}
+
+@app.route('/recommend_hybrid', methods=['POST'])
+@handle_errors
+def recommend_hybrid():
+    try:
+        user_id, movie_titles, weights = hybrid_arguments(request.form)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    try:
+        recommendations = model_manager.get().hybrid_recommendations(
+            user_id,
+            movie_titles,
+            weights=weights,
+            num_recommendations=Config.DEFAULT_NUM_RECOMMENDATIONS,
+            max_candidates=Config.HYBRID_MAX_CANDIDATES
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    enhanced_recommendations = enhance_with_tmdb(recommendations)
+    for rec in enhanced_recommendations:
+        rec['hybrid_score'] = int(rec['hybrid_score'] * 100)  # Convert to percentage
+
     return jsonify({'success': True, 'recommendations': enhanced_recommendations})
 
 @app.route('/search_movies', methods=['POST'])
-@cache.memoize(timeout=300)
 @handle_errors
 def search_movies():
     query = request.form.get('query')
     if not query:
         return jsonify({'success': False, 'error': 'Search query is required'}), 400
         
-    movies = tmdb_client.search_movies(query)
+    client = init_tmdb_client()
+    if client is None:
+        return jsonify({'success': False, 'error': 'TMDB is not configured'}), 503
+    movies = client.search_movies(query)
     return jsonify({'success': True, 'movies': movies})
 
+@app.route('/autocomplete')
+@handle_errors
+def autocomplete():
+    query = request.args.get('q', '')
+    try:
+        limit = min(int(request.args.get('limit', Config.AUTOCOMPLETE_LIMIT)),
+                    Config.AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Limit must be an integer'}), 400
+
+    titles = model_manager.get().autocomplete(query, limit=limit) if query.strip() else []
+    return jsonify({'success': True, 'titles': titles})
+
+@app.route('/rate', methods=['POST'])
+@handle_errors
+def rate_movie():
+    try:
+        user_id = int(request.form.get('user_id'))
+        movie_id = int(request.form.get('movie_id'))
+        rating = float(request.form.get('rating'))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'user_id, movie_id and rating are required'}), 400
+    # MovieLens ratings are half stars from 0.5 to 5
+    if not (0.5 <= rating <= 5 and (rating * 2).is_integer()):
+        return jsonify({'success': False,
+                        'error': 'Rating must be between 0.5 and 5 in half-star steps'}), 400
+    if not model_manager.get().has_movie(movie_id):
+        return jsonify({'success': False, 'error': f'Movie {movie_id} not found'}), 404
+
+    # Applied by the background updater within RATING_FLUSH_INTERVAL seconds
+    rating_updater.submit(user_id, movie_id, rating)
+    return jsonify({'success': True, 'queued': True}), 202
+
+@app.route('/cache_stats')
+@handle_errors
+def cache_stats():
+    return jsonify({'success': True,
+                    'recommendations': model_manager.get().result_cache.stats()})
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up, whether or not the model has loaded."""
+    return jsonify({'success': True, 'status': 'ok', 'model': model_manager.status()})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: 200 once a model is serving, 503 while loading or after a failed load."""
+    status = model_manager.status()
+    return jsonify({'success': status['ready'], 'model': status}), 200 if status['ready'] else 503
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_model():
+    """Load the newest model version in the background and swap it in.
+
+    Needs the ADMIN_TOKEN in an X-Admin-Token header; disabled without one.
+    """
+    if not Config.ADMIN_TOKEN:
+        return jsonify({'success': False, 'error': 'Resource not found'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), Config.ADMIN_TOKEN):
+        return jsonify({'success': False, 'error': 'Invalid admin token'}), 403
+    if not model_manager.reload():
+        return jsonify({'success': False, 'error': 'A model load is already running'}), 409
+    return jsonify({'success': True, 'reloading': True}), 202
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint: stage spans, request latency and cache counters."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/profile')
+def profile():
+    """Merged cProfile statistics of the sampled recommender calls."""
+    if profiler is None:
+        return jsonify({'success': False, 'error': 'Profiling is disabled; '
+                                                   'set PROFILE_SAMPLE_RATE'}), 404
+    try:
+        limit = int(request.args.get('limit', 30))
+        report = profiler.report(limit=limit, sort=request.args.get('sort', 'cumulative'))
+    except (ValueError, KeyError):
+        return jsonify({'success': False, 'error': 'Invalid limit or sort key'}), 400
+    return Response(report, mimetype='text/plain')
+
 @app.route('/movie_details/<int:movie_id>')
 @cache.memoize(timeout=300)
 @handle_errors
 def movie_details(movie_id):
+    client = init_tmdb_client()
+    if client is None:
+        return jsonify({'success': False, 'error': 'TMDB is not configured'}), 503
+
     # Get all movie information in parallel
-    details = tmdb_client.get_movie_details(movie_id)
+    details = client.get_movie_details(movie_id)
     if not details:
         return jsonify({'success': False, 'error': 'Movie not found'}), 404
         
-    credits = tmdb_client.get_movie_credits(movie_id)
-    similar = tmdb_client.get_similar_movies(movie_id)
+    credits = client.get_movie_credits(movie_id)
+    similar = client.get_similar_movies(movie_id)
     
     return jsonify({
         'success': True,
@@ -178,4 +497,5 @@ def internal_error(error):
     return jsonify({'success': False, 'error': 'Internal server error'}), 500
 
 if __name__ == '__main__':
+    model_manager.start()
     app.run(debug=Config.DEBUG)
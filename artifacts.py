@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+from scipy import sparse
+
+# Bump when the layout of saved arrays changes incompatibly
+FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+LATEST_FILE = 'LATEST'
+
+
+def encode_strings(values):
+    """Pack strings into a UTF-8 byte blob plus int64 offsets."""
+    encoded = [str(value).encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def decode_strings(blob, offsets):
+    """Inverse of ``encode_strings``: return an object array of str."""
+    data = np.asarray(blob).tobytes()
+    offsets = np.asarray(offsets).tolist()
+    return np.array([data[start:stop].decode('utf-8')
+                     for start, stop in zip(offsets[:-1], offsets[1:])], dtype=object)
+
+
+def sparse_arrays(prefix, matrix):
+    """Flatten a CSR matrix into named arrays under ``prefix``."""
+    matrix = sparse.csr_matrix(matrix)
+    return {
+        f'{prefix}.data': matrix.data,
+        f'{prefix}.indices': matrix.indices,
+        f'{prefix}.indptr': matrix.indptr,
+        f'{prefix}.shape': np.array(matrix.shape, dtype=np.int64),
+    }
+
+
+def load_sparse(arrays, prefix):
+    """Rebuild a CSR matrix saved with ``sparse_arrays`` without copying its buffers."""
+    return sparse.csr_matrix(
+        (arrays[f'{prefix}.data'], arrays[f'{prefix}.indices'], arrays[f'{prefix}.indptr']),
+        shape=tuple(arrays[f'{prefix}.shape']), copy=False)
+
+
+def latest_version(root):
+    """Return the version name recorded in ``root/LATEST``, or None."""
+    try:
+        with open(os.path.join(root, LATEST_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def resolve_version_dir(path):
+    """Accept either an artifact root (follows LATEST) or a version directory."""
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return path
+    version = latest_version(path)
+    if version is None:
+        raise FileNotFoundError(f"No model artifacts found in '{path}'")
+    return os.path.join(path, version)
+
+
+def save_arrays(root, arrays, metadata):
+    """Write ``arrays`` as a new artifact version under ``root``.
+
+    Every array goes to its own ``.npy`` file next to a JSON manifest. The
+    version is written to a temporary directory, renamed into place and only
+    then published through ``root/LATEST``, so readers never observe a
+    partially written version.
+
+    Returns the new version directory.
+    """
+    version = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(root, exist_ok=True)
+    staging = os.path.join(root, f'.{version}.tmp')
+    os.makedirs(staging)
+    try:
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'version': version,
+            'created_at': time.time(),
+            'metadata': metadata,
+            'arrays': {},
+        }
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            filename = f'{name}.npy'
+            np.save(os.path.join(staging, filename), array, allow_pickle=False)
+            manifest['arrays'][name] = {
+                'file': filename,
+                'dtype': array.dtype.str,
+                'shape': list(array.shape),
+            }
+        with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        version_dir = os.path.join(root, version)
+        os.replace(staging, version_dir)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    pointer = os.path.join(root, f'.{LATEST_FILE}.tmp')
+    with open(pointer, 'w') as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(root, LATEST_FILE))
+    return version_dir
+
+
+def load_arrays(path, mmap_mode='r'):
+    """Load an artifact version, memory-mapping every array.
+
+    ``path`` may be the artifact root or a specific version directory.
+    Returns ``(arrays, manifest)``. Pages are shared through the OS page
+    cache by every process that maps the same version.
+    """
+    version_dir = resolve_version_dir(path)
+    with open(os.path.join(version_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(
+            f"Artifact format {manifest.get('format_version')} in '{version_dir}' is not "
+            f"supported (expected {FORMAT_VERSION}); rebuild the model artifacts.")
+
+    arrays = {
+        name: np.load(os.path.join(version_dir, entry['file']),
+                      mmap_mode=mmap_mode, allow_pickle=False)
+        for name, entry in manifest['arrays'].items()
+    }
+    return arrays, manifest
+
+
+def main():
+    """Command-line entry point: build or inspect model artifacts."""
+    parser = argparse.ArgumentParser(description='Build or inspect model artifacts.')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    build = subcommands.add_parser('build', help='Train the models and save a new version')
+    build.add_argument('--movies', help='Path to movies.csv')
+    build.add_argument('--ratings', help='Path to ratings.csv')
+    build.add_argument('--out', help='Artifact root directory')
+
+    info = subcommands.add_parser('info', help='Describe the latest (or given) version')
+    info.add_argument('path', nargs='?', help='Artifact root or version directory')
+
+    args = parser.parse_args()
+
+    from config import Config
+    if args.command == 'build':
+        from movie_recommender import MovieRecommender
+
+        start = time.perf_counter()
+        recommender = MovieRecommender(
+            args.movies or Config.MOVIES_DATASET,
+            args.ratings or Config.RATINGS_DATASET,
+            **Config.recommender_options()
+        )
+        version_dir = recommender.save(args.out or Config.MODEL_ARTIFACTS_DIR)
+        print(f"Saved {version_dir} in {time.perf_counter() - start:.1f}s")
+    else:
+        _, manifest = load_arrays(args.path or Config.MODEL_ARTIFACTS_DIR)
+        total = sum(np.prod(entry['shape']) * np.dtype(entry['dtype']).itemsize
+                    for entry in manifest['arrays'].values())
+        print(f"Version {manifest['version']} (format {manifest['format_version']}), "
+              f"{len(manifest['arrays'])} arrays, {total / 2 ** 20:.1f} MiB")
+        print(json.dumps(manifest['metadata'], indent=2))
+
+
+if __name__ == "__main__":
+    main()
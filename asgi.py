@@ -0,0 +1,273 @@
+import asyncio
+import contextlib
+import json
+import logging
+import time
+from functools import wraps
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+from app import app as flask_app
+from app import (hybrid_arguments, init_tmdb_client, merge_tmdb, model_manager,
+                 recommendation_query)
+from coalescing import MicroBatcher, RequestCoalescer
+from config import Config
+from metrics import HTTP_REQUEST_SECONDS, span
+from model_manager import ModelNotReady
+from pagination import next_cursor
+
+# Async serving mode: run with `uvicorn asgi:app --workers N`.
+#
+# The recommendation and search routes are served natively on the event
+# loop: identical requests in flight share one computation, concurrent
+# collaborative requests are scored together in micro-batches, and TMDB is
+# queried without blocking. Every other route of the Flask app is served by
+# the Flask app itself on a thread pool, so both modes expose the same API.
+
+logger = logging.getLogger(__name__)
+
+responses = RequestCoalescer('recommendations')
+
+
+def recommend_users(items):
+    """Score a micro-batch of ``(user_id, num_recommendations)`` requests.
+
+    Runs on a worker thread; users asking for the same number of
+    recommendations are scored with one blocked matrix product.
+    """
+    recommender = model_manager.get()
+    results = [None] * len(items)
+    groups = {}
+    for i, (_, k) in enumerate(items):
+        groups.setdefault(k, []).append(i)
+    for k, positions in groups.items():
+        user_ids = [items[i][0] for i in positions]
+        try:
+            lists = recommender.collaborative_recommendations_batch(user_ids, k)
+        except ValueError:
+            # An unknown user fails the whole batch; score the users one by one
+            lists = []
+            for user_id in user_ids:
+                try:
+                    lists.append(recommender.collaborative_recommendations(user_id, k))
+                except Exception as e:
+                    lists.append(e)
+        except Exception as e:
+            lists = [e] * len(user_ids)
+        for i, result in zip(positions, lists):
+            results[i] = result
+    return results
+
+
+collaborative_batcher = MicroBatcher(recommend_users, 'collaborative',
+                                     max_batch=Config.ASYNC_BATCH_MAX_SIZE,
+                                     max_wait=Config.ASYNC_BATCH_MAX_WAIT)
+
+
+def endpoint(f):
+    """Time a route and map errors to the same responses as the Flask app."""
+    @wraps(f)
+    async def route(request):
+        start = time.perf_counter()
+        try:
+            response = await f(request)
+        except ModelNotReady as e:
+            response = JSONResponse({'success': False, 'error': str(e)}, 503)
+        except Exception as e:
+            logger.error(f"Error in {f.__name__}: {str(e)}")
+            response = JSONResponse({
+                'success': False,
+                'error': str(e),
+                'message': 'An error occurred while processing your request.'
+            }, 500)
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=f.__name__,
+                                     method=request.method, status=response.status_code)
+        return response
+    return route
+
+
+async def enhance_with_tmdb(tmdb, recommendations):
+    """Async counterpart of ``app.enhance_with_tmdb``."""
+    if tmdb is None:
+        return recommendations
+    with span('enrichment'):
+        summaries = await tmdb.get_movie_summaries(
+            [rec['movieId'] for rec in recommendations],
+            [rec['title'] for rec in recommendations]
+        )
+    return merge_tmdb(recommendations, summaries)
+
+
+async def coalesced_response(key, compute):
+    """Serve ``compute()``'s ``(payload, status)`` once for every identical request in flight."""
+    recommender = model_manager.get()
+    payload, status = await responses.run(
+        key + (recommender.model_version,), lambda: compute(recommender))
+    return JSONResponse(payload, status)
+
+
+def query_key(limit, filters, cursor):
+    """Coalescing key part for the page size, filters and cursor of a request."""
+    return limit, json.dumps(filters, sort_keys=True), cursor
+
+
+@endpoint
+async def recommend_by_movie(request):
+    form = await request.form()
+    movie_title = form.get('movie_title')
+    if not movie_title:
+        return JSONResponse({'success': False, 'error': 'Movie title is required'}, 400)
+    try:
+        limit, filters, cursor = recommendation_query(form)
+    except ValueError as e:
+        return JSONResponse({'success': False, 'error': str(e)}, 400)
+
+    async def compute(recommender):
+        try:
+            recommendations = await asyncio.to_thread(
+                recommender.content_based_recommendations,
+                movie_title,
+                num_recommendations=limit,
+                filters=filters,
+                cursor=cursor
+            )
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}, 400
+        page_cursor = next_cursor(recommendations, 'similarity', limit)
+        enhanced_recommendations = await enhance_with_tmdb(request.app.state.tmdb,
+                                                           recommendations)
+        for rec in enhanced_recommendations:
+            rec['similarity_score'] = int(rec['similarity'] * 100)  # Convert to percentage
+        return {'success': True, 'recommendations': enhanced_recommendations,
+                'next_cursor': page_cursor}, 200
+
+    return await coalesced_response(
+        ('content', movie_title) + query_key(limit, filters, cursor), compute)
+
+
+@endpoint
+async def recommend_by_user(request):
+    form = await request.form()
+    try:
+        user_id = int(form.get('user_id'))
+    except (TypeError, ValueError):
+        return JSONResponse({'success': False, 'error': 'Valid user ID is required'}, 400)
+    try:
+        limit, filters, cursor = recommendation_query(form)
+    except ValueError as e:
+        return JSONResponse({'success': False, 'error': str(e)}, 400)
+
+    async def compute(recommender):
+        try:
+            if filters is None and cursor is None:
+                recommendations = await collaborative_batcher.submit((user_id, limit))
+            else:
+                # Filtered and later pages are scored one by one
+                recommendations = await asyncio.to_thread(
+                    recommender.collaborative_recommendations,
+                    user_id,
+                    num_recommendations=limit,
+                    filters=filters,
+                    cursor=cursor
+                )
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}, 400
+        page_cursor = next_cursor(recommendations, 'predicted_rating', limit)
+        enhanced_recommendations = await enhance_with_tmdb(request.app.state.tmdb,
+                                                           recommendations)
+        for rec in enhanced_recommendations:
+            rec['predicted_rating'] = round(float(rec['predicted_rating']), 1)
+        return {'success': True, 'recommendations': enhanced_recommendations,
+                'next_cursor': page_cursor}, 200
+
+    return await coalesced_response(
+        ('collaborative', user_id) + query_key(limit, filters, cursor), compute)
+
+
+@endpoint
+async def recommend_hybrid(request):
+    try:
+        user_id, movie_titles, weights = hybrid_arguments(await request.form())
+    except ValueError as e:
+        return JSONResponse({'success': False, 'error': str(e)}, 400)
+
+    async def compute(recommender):
+        try:
+            recommendations = await asyncio.to_thread(
+                recommender.hybrid_recommendations,
+                user_id,
+                movie_titles,
+                weights=weights,
+                num_recommendations=Config.DEFAULT_NUM_RECOMMENDATIONS,
+                max_candidates=Config.HYBRID_MAX_CANDIDATES
+            )
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}, 400
+
+        enhanced_recommendations = await enhance_with_tmdb(request.app.state.tmdb,
+                                                           recommendations)
+        for rec in enhanced_recommendations:
+            rec['hybrid_score'] = int(rec['hybrid_score'] * 100)  # Convert to percentage
+        return {'success': True, 'recommendations': enhanced_recommendations}, 200
+
+    return await coalesced_response(
+        ('hybrid', user_id, tuple(movie_titles), tuple(sorted(weights.items()))), compute)
+
+
+@endpoint
+async def search_movies(request):
+    query = (await request.form()).get('query')
+    if not query:
+        return JSONResponse({'success': False, 'error': 'Search query is required'}, 400)
+
+    tmdb = request.app.state.tmdb
+    if tmdb is None:
+        return JSONResponse({'success': False, 'error': 'TMDB is not configured'}, 503)
+    # Identical searches in flight share one TMDB request
+    movies = await tmdb.search_movies(query)
+    return JSONResponse({'success': True, 'movies': movies})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    model_manager.start()
+    # Reuse the sync client's metadata cache, so both modes fill the same entries
+    client = await asyncio.to_thread(init_tmdb_client)
+    app.state.tmdb = None
+    if client is not None:
+        from tmdb_async import AsyncTMDBClient
+
+        app.state.tmdb = AsyncTMDBClient(
+            Config.TMDB_API_KEY,
+            base_url=Config.TMDB_API_BASE_URL,
+            max_connections=Config.TMDB_MAX_WORKERS,
+            request_timeout=Config.TMDB_REQUEST_TIMEOUT,
+            batch_timeout=Config.TMDB_BATCH_TIMEOUT,
+            metadata_cache=client.metadata_cache,
+            language=client.tmdb.language
+        )
+    try:
+        yield
+    finally:
+        if app.state.tmdb is not None:
+            await app.state.tmdb.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/recommend_by_movie', recommend_by_movie, methods=['POST']),
+        Route('/recommend_by_user', recommend_by_user, methods=['POST']),
+        Route('/recommend_hybrid', recommend_hybrid, methods=['POST']),
+        Route('/search_movies', search_movies, methods=['POST']),
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app)
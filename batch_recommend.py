@@ -0,0 +1,219 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from movie_recommender import MovieRecommender
+
+# Score at most this many user x movie entries per block
+MAX_BLOCK_ELEMENTS = 2 ** 24
+
+# Recommender used by pool workers; set by the initializer, or inherited on fork
+_worker_recommender = None
+
+
+def _init_worker(artifact_path):
+    """Pool initializer: memory-map the model artifacts once per worker."""
+    global _worker_recommender
+    if artifact_path is not None:
+        _worker_recommender = MovieRecommender.load(artifact_path)
+
+
+def _score_block(user_rows, k):
+    """Worker task: top-k movie rows and scores for one block of user rows."""
+    return user_rows, *_worker_recommender._collaborative_top_k_block(user_rows, k)
+
+
+def _user_blocks(user_rows, block_users):
+    for start in range(0, len(user_rows), block_users):
+        yield user_rows[start:start + block_users]
+
+
+def iter_recommendation_blocks(recommender, user_ids=None, k=10, workers=1,
+                               artifact_path=None, block_users=None):
+    """Yield ``(user_ids, movie_rows, scores)`` blocks of top-``k`` recommendations.
+
+    ``user_ids`` defaults to every user. Users are scored ``block_users`` at
+    a time (by default as many as fit ``MAX_BLOCK_ELEMENTS`` scores) with one
+    matrix product per block. With ``workers > 1`` blocks are spread over a
+    process pool: workers memory-map ``artifact_path`` when given, so the
+    model's pages are shared through the OS page cache, and otherwise
+    inherit ``recommender`` by fork. At most two blocks per worker are in
+    flight, so memory stays bounded however many users there are. Blocks
+    are yielded in user order; slots without a prediction score -inf.
+    """
+    global _worker_recommender
+    if user_ids is None:
+        user_rows = np.arange(len(recommender.user_ids))
+    else:
+        user_rows = recommender._user_rows.get_indexer(user_ids)
+        if (user_rows < 0).any():
+            missing = np.asarray(user_ids)[user_rows < 0][0]
+            raise ValueError(f"User {missing} not found in the database.")
+    block_users = block_users or max(1, MAX_BLOCK_ELEMENTS // len(recommender.movies))
+    blocks = _user_blocks(user_rows, block_users)
+
+    def results(block):
+        rows, top, scores = block
+        return recommender.user_ids[rows], top, scores
+
+    if workers <= 1:
+        for rows in blocks:
+            yield results((rows, *recommender._collaborative_top_k_block(rows, k)))
+        return
+
+    if artifact_path is None:
+        # Workers inherit the in-memory model copy-on-write
+        _worker_recommender = recommender
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(artifact_path,)) as pool:
+        pending = deque()
+        for rows in blocks:
+            pending.append(pool.submit(_score_block, rows, k))
+            if len(pending) >= 2 * workers:
+                yield results(pending.popleft().result())
+        while pending:
+            yield results(pending.popleft().result())
+
+
+class _JSONLWriter:
+    """One JSON object per user: its id and ranked recommendations."""
+
+    def __init__(self, path, recommender):
+        self.file = open(path, 'w')
+        self.recommender = recommender
+
+    def write(self, user_ids, top, scores):
+        movie_ids = self.recommender._movie_ids
+        titles = self.recommender._titles
+        for user_id, row_top, row_scores in zip(user_ids.tolist(), top, scores):
+            found = np.isfinite(row_scores)
+            row_top, row_scores = row_top[found], row_scores[found]
+            self.file.write(json.dumps({
+                'userId': user_id,
+                'recommendations': [
+                    {'movieId': movie_id, 'title': title, 'predicted_rating': round(score, 4)}
+                    for movie_id, title, score in zip(movie_ids[row_top].tolist(),
+                                                      titles[row_top].tolist(),
+                                                      row_scores.tolist())
+                ],
+            }) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    """Long-format rows (userId, rank, movieId, predicted_rating), one row group per block."""
+
+    def __init__(self, path, recommender):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Writing Parquet requires pyarrow (pip install pyarrow); "
+                              "use a .jsonl output path instead.")
+        self.pa = pa
+        self.schema = pa.schema([('userId', pa.int64()), ('rank', pa.int16()),
+                                 ('movieId', pa.int64()), ('predicted_rating', pa.float32())])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.recommender = recommender
+
+    def write(self, user_ids, top, scores):
+        found = np.isfinite(scores)
+        users = np.broadcast_to(user_ids[:, None], top.shape)[found]
+        ranks = np.broadcast_to(np.arange(1, top.shape[1] + 1), top.shape)[found]
+        table = self.pa.table({
+            'userId': users.astype(np.int64),
+            'rank': ranks.astype(np.int16),
+            'movieId': self.recommender._movie_ids[top[found]].astype(np.int64),
+            'predicted_rating': scores[found].astype(np.float32),
+        }, schema=self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+
+def write_recommendations(recommender, output_path, user_ids=None, k=10, workers=1,
+                          artifact_path=None, block_users=None):
+    """Compute top-``k`` recommendations for many users and stream them to a file.
+
+    ``output_path`` ending in ``.parquet`` writes Parquet (needs pyarrow);
+    anything else writes JSON Lines. Each block is written as soon as it is
+    scored. See ``iter_recommendation_blocks`` for the other arguments.
+
+    Returns a report with the number of users, elapsed seconds and users/sec.
+    """
+    writer_class = _ParquetWriter if output_path.endswith('.parquet') else _JSONLWriter
+    writer = writer_class(output_path, recommender)
+    start = time.perf_counter()
+    users = 0
+    try:
+        for block_user_ids, top, scores in iter_recommendation_blocks(
+                recommender, user_ids=user_ids, k=k, workers=workers,
+                artifact_path=artifact_path, block_users=block_users):
+            writer.write(block_user_ids, top, scores)
+            users += len(block_user_ids)
+    finally:
+        writer.close()
+    seconds = time.perf_counter() - start
+    return {
+        'users': users,
+        'seconds': seconds,
+        'users_per_second': users / seconds if seconds > 0 else float('inf'),
+        'workers': workers,
+        'output': output_path,
+    }
+
+
+def main():
+    """Command-line entry point: write recommendations for all (or some) users."""
+    parser = argparse.ArgumentParser(
+        description='Generate collaborative recommendations for many users.')
+    parser.add_argument('output', help='Output file (.jsonl, or .parquet with pyarrow)')
+    parser.add_argument('-k', type=int, default=10, help='Recommendations per user')
+    parser.add_argument('--users', help='Comma-separated user ids (default: all users)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes')
+    parser.add_argument('--block-users', type=int, help='Users scored per block')
+    parser.add_argument('--artifacts', help='Model artifact root or version directory')
+    parser.add_argument('--movies', help='Path to movies.csv (when not using artifacts)')
+    parser.add_argument('--ratings', help='Path to ratings.csv (when not using artifacts)')
+    args = parser.parse_args()
+
+    from artifacts import latest_version
+    from config import Config
+
+    artifact_path = args.artifacts
+    if artifact_path is None and not (args.movies or args.ratings) \
+            and latest_version(Config.MODEL_ARTIFACTS_DIR):
+        artifact_path = Config.MODEL_ARTIFACTS_DIR
+    if artifact_path is not None:
+        recommender = MovieRecommender.load(artifact_path)
+    else:
+        recommender = MovieRecommender(
+            args.movies or Config.MOVIES_DATASET,
+            args.ratings or Config.RATINGS_DATASET,
+            **Config.recommender_options()
+        )
+
+    user_ids = [int(user_id) for user_id in args.users.split(',')] if args.users else None
+    report = write_recommendations(recommender, args.output, user_ids=user_ids, k=args.k,
+                                   workers=args.workers, artifact_path=artifact_path,
+                                   block_users=args.block_users)
+    print(f"Wrote recommendations for {report['users']} users to {report['output']} "
+          f"in {report['seconds']:.1f}s ({report['users_per_second']:.0f} users/sec, "
+          f"{report['workers']} workers)")
+
+
+if __name__ == "__main__":
+    main()
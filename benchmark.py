@@ -0,0 +1,315 @@
+import argparse
+import json
+import math
+import multiprocessing
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from data_loader import load_ratings
+from movie_recommender import MovieRecommender
+
+ALGORITHMS = ('popularity', 'content', 'collaborative', 'hybrid')
+# Algorithms whose results depend on the collaborative backend; the others
+# are only evaluated with the first model
+BACKEND_ALGORITHMS = ('collaborative', 'hybrid')
+QUALITY_METRICS = ('precision', 'recall', 'ndcg', 'coverage')
+COST_METRICS = ('latency_p50_ms', 'latency_p99_ms', 'build_seconds', 'peak_rss_mb')
+
+
+def time_split(ratings, test_fraction=0.2):
+    """Split ratings at a global timestamp cutoff.
+
+    The latest ``test_fraction`` of ratings form the test set, so models are
+    always evaluated on ratings made after everything they were trained on.
+    Returns ``(train, test, cutoff)``.
+    """
+    cutoff = int(np.quantile(ratings['timestamp'].to_numpy(), 1 - test_fraction))
+    later = ratings['timestamp'].to_numpy() > cutoff
+    return ratings[~later], ratings[later], cutoff
+
+
+def evaluation_users(train, test, relevant_rating=4.0, max_users=1000, seed=0):
+    """Pick the users to evaluate and what counts as a hit for each.
+
+    A user qualifies with at least one test rating of ``relevant_rating`` or
+    more and at least one training rating. Returns ``{userId: relevant
+    movieIds}`` and ``{userId: last liked training movieId}`` (the seed for
+    content-based recommendations), sampled down to ``max_users``.
+    """
+    liked = test[test['rating'] >= relevant_rating]
+    relevant = liked.groupby('userId')['movieId'].agg(set)
+    relevant = relevant[relevant.index.isin(train['userId'].unique())]
+    if max_users and len(relevant) > max_users:
+        rng = np.random.default_rng(seed)
+        relevant = relevant.loc[np.sort(rng.choice(relevant.index, max_users, replace=False))]
+
+    history = train[train['userId'].isin(relevant.index)].sort_values('timestamp')
+    liked_history = history[history['rating'] >= relevant_rating]
+    seeds = liked_history.groupby('userId')['movieId'].last()
+    # Users without a liked movie fall back to their latest rating
+    seeds = seeds.combine_first(history.groupby('userId')['movieId'].last()).astype(int)
+    return relevant.to_dict(), seeds.to_dict()
+
+
+def ranking_metrics(recommended, relevant, k):
+    """Precision@k, recall@k and binary-relevance NDCG@k for one user."""
+    gains = [1.0 if movie_id in relevant else 0.0 for movie_id in recommended[:k]]
+    hits = sum(gains)
+    dcg = sum(gain / math.log2(rank + 2) for rank, gain in enumerate(gains))
+    ideal = sum(1.0 / math.log2(rank + 2) for rank in range(min(len(relevant), k)))
+    return hits / k, hits / len(relevant), dcg / ideal if ideal else 0.0
+
+
+def _memory_mb(field):
+    """A ``/proc/self/status`` memory field of this process in MiB (None where unsupported)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(f'{field}:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MiB (None where unsupported).
+
+    Prefers VmHWM, the peak of the process's own address space, which a
+    spawned child starts afresh; ru_maxrss carries the parent's peak over
+    through fork and exec on Linux.
+    """
+    peak = _memory_mb('VmHWM')
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _request(recommender, algorithm, user_id, seed_movie, k, top_rated_min_reviews):
+    """Issue one recommendation request; returns the recommended movieIds."""
+    if algorithm == 'popularity':
+        movies = recommender.get_top_rated_movies(
+            min_reviews=top_rated_min_reviews, limit=k, bayesian=True)
+        return movies['movieId'].tolist()
+    if algorithm == 'content':
+        title = recommender._titles[recommender._movie_rows.get_loc(seed_movie)]
+        results = recommender.content_based_recommendations(title, num_recommendations=k)
+    elif algorithm == 'collaborative':
+        results = recommender.collaborative_recommendations(user_id, num_recommendations=k)
+    else:
+        results = recommender.hybrid_recommendations(user_id, num_recommendations=k)
+    return [result['movieId'] for result in results]
+
+
+def evaluate_algorithm(recommender, algorithm, relevant, seeds, k=10,
+                       top_rated_min_reviews=10):
+    """Average ranking quality, catalog coverage and per-request latency."""
+    precision, recall, ndcg, latencies = [], [], [], []
+    recommended_movies = set()
+    failures = 0
+    for user_id, user_relevant in relevant.items():
+        start = time.perf_counter()
+        try:
+            recommended = _request(recommender, algorithm, user_id, seeds.get(user_id),
+                                   k, top_rated_min_reviews)
+        except ValueError:
+            recommended = []
+            failures += 1
+        latencies.append(time.perf_counter() - start)
+        recommended_movies.update(recommended)
+        user_precision, user_recall, user_ndcg = ranking_metrics(recommended, user_relevant, k)
+        precision.append(user_precision)
+        recall.append(user_recall)
+        ndcg.append(user_ndcg)
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'users': len(relevant),
+        'failures': failures,
+        'precision': float(np.mean(precision)) if precision else 0.0,
+        'recall': float(np.mean(recall)) if recall else 0.0,
+        'ndcg': float(np.mean(ndcg)) if ndcg else 0.0,
+        'coverage': len(recommended_movies) / len(recommender.movies),
+        'latency_p50_ms': float(np.percentile(latencies_ms, 50)) if len(latencies) else 0.0,
+        'latency_p99_ms': float(np.percentile(latencies_ms, 99)) if len(latencies) else 0.0,
+    }
+
+
+def benchmark_model(movies_path, train, relevant, seeds, options, algorithms, k=10):
+    """Build one recommender from ``train`` and evaluate ``algorithms`` on it.
+
+    Besides build time, reports the process's peak RSS and its RSS just
+    before the build (interpreter, libraries and the training split).
+    """
+    baseline_rss_mb = _memory_mb('VmRSS')
+    start = time.perf_counter()
+    recommender = MovieRecommender(movies_path, train, **options)
+    build_seconds = time.perf_counter() - start
+    results = {algorithm: evaluate_algorithm(recommender, algorithm, relevant, seeds, k=k)
+               for algorithm in algorithms}
+    return {'build_seconds': build_seconds, 'peak_rss_mb': _peak_rss_mb(),
+            'baseline_rss_mb': baseline_rss_mb}, results
+
+
+def _run(function, *args, isolate=True):
+    """Run ``function`` in a fresh child process so peak RSS is measured per model.
+
+    The child is spawned rather than forked: a forked child shares, and
+    counts, everything the parent already loaded.
+    """
+    if not isolate:
+        return function(*args)
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(function, *args).result()
+
+
+def run_benchmark(movies_path, ratings_path, models=('item_knn', 'als'), algorithms=ALGORITHMS,
+                  k=10, test_fraction=0.2, relevant_rating=4.0, max_users=1000, seed=0,
+                  options=None, isolate=True):
+    """Evaluate every algorithm against a time-based split of ``ratings_path``.
+
+    Each collaborative backend in ``models`` is built from the training
+    split with ``options`` (``MovieRecommender`` keyword arguments) in its
+    own spawned process when ``isolate`` is set, so build time and peak RSS
+    are per model. Backend-independent algorithms are only run with the first
+    model.
+    Returns a JSON-serializable report.
+    """
+    ratings = load_ratings(ratings_path, with_timestamps=True)
+    train, test, cutoff = time_split(ratings, test_fraction)
+    relevant, seeds = evaluation_users(train, test, relevant_rating, max_users, seed)
+    train = train[['userId', 'movieId', 'rating']]
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'dataset': {
+            'movies': movies_path,
+            'ratings': ratings_path,
+            'train_ratings': len(train),
+            'test_ratings': len(test),
+            'cutoff_timestamp': cutoff,
+            'users': len(relevant),
+        },
+        'settings': {'k': k, 'test_fraction': test_fraction,
+                     'relevant_rating': relevant_rating, 'seed': seed},
+        'builds': {},
+        'results': {},
+    }
+    for index, model in enumerate(models):
+        model_algorithms = [algorithm for algorithm in algorithms
+                            if index == 0 or algorithm in BACKEND_ALGORITHMS]
+        model_options = {**(options or {}), 'collaborative_backend': model}
+        build, results = _run(benchmark_model, movies_path, train, relevant, seeds,
+                              model_options, model_algorithms, k, isolate=isolate)
+        report['builds'][model] = build
+        for algorithm, metrics in results.items():
+            name = algorithm if algorithm not in BACKEND_ALGORITHMS else f'{algorithm}:{model}'
+            report['results'][name] = metrics
+    return report
+
+
+def compare_reports(report, baseline, quality_tolerance=0.02, cost_tolerance=0.25):
+    """List metrics that regressed against ``baseline``.
+
+    Quality metrics regress when they drop by more than ``quality_tolerance``
+    (relative); latency, build time and memory when they grow by more than
+    ``cost_tolerance``. Entries missing from either report are skipped.
+    """
+    sections = [(name, report['results'][name], baseline['results'][name])
+                for name in report['results'] if name in baseline.get('results', {})]
+    sections += [(f'build:{name}', report['builds'][name], baseline['builds'][name])
+                 for name in report['builds'] if name in baseline.get('builds', {})]
+
+    regressions = []
+    for name, current, previous in sections:
+        for metric in QUALITY_METRICS + COST_METRICS:
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            if metric in QUALITY_METRICS:
+                regressed = new < old * (1 - quality_tolerance)
+            else:
+                regressed = new > old * (1 + cost_tolerance)
+            if regressed:
+                regressions.append({'name': name, 'metric': metric,
+                                    'baseline': old, 'current': new})
+    return regressions
+
+
+def main():
+    """Command-line entry point: run the benchmark and write a JSON report."""
+    parser = argparse.ArgumentParser(
+        description='Evaluate recommendation quality and speed on a time-based split.')
+    parser.add_argument('--movies', help='Path to movies.csv (default: MOVIES_DATASET)')
+    parser.add_argument('--ratings', help='Path to ratings.csv (default: RATINGS_DATASET)')
+    parser.add_argument('--output', default='benchmark.json', help='Report path')
+    parser.add_argument('--baseline', help='Earlier report to compare against')
+    parser.add_argument('--models', default='item_knn,als',
+                        help='Comma-separated collaborative backends')
+    parser.add_argument('--algorithms', default=','.join(ALGORITHMS),
+                        help='Comma-separated algorithms to evaluate')
+    parser.add_argument('-k', type=int, default=10, help='Recommendations per request')
+    parser.add_argument('--test-fraction', type=float, default=0.2,
+                        help='Latest share of ratings held out for testing')
+    parser.add_argument('--users', type=int, default=1000,
+                        help='Users evaluated (0 for every eligible user)')
+    parser.add_argument('--seed', type=int, default=0, help='User sampling seed')
+    parser.add_argument('--quality-tolerance', type=float, default=0.02,
+                        help='Relative quality drop reported as a regression')
+    parser.add_argument('--cost-tolerance', type=float, default=0.25,
+                        help='Relative latency, build time or memory growth reported '
+                             'as a regression')
+    parser.add_argument('--no-isolate', action='store_true',
+                        help='Build every model in this process')
+    args = parser.parse_args()
+
+    from config import Config
+
+    options = Config.recommender_options()
+    options.pop('data_cache_dir')
+    report = run_benchmark(
+        args.movies or Config.MOVIES_DATASET, args.ratings or Config.RATINGS_DATASET,
+        models=args.models.split(','), algorithms=args.algorithms.split(','), k=args.k,
+        test_fraction=args.test_fraction, max_users=args.users, seed=args.seed,
+        options=options, isolate=not args.no_isolate)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_reports(report, json.load(f), args.quality_tolerance,
+                                          args.cost_tolerance)
+        report['baseline'] = args.baseline
+        report['regressions'] = regressions
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, metrics in report['results'].items():
+        print(f"{name:<24} P@{args.k} {metrics['precision']:.4f}  R@{args.k} "
+              f"{metrics['recall']:.4f}  NDCG {metrics['ndcg']:.4f}  "
+              f"coverage {metrics['coverage']:.3f}  p50 {metrics['latency_p50_ms']:.2f}ms  "
+              f"p99 {metrics['latency_p99_ms']:.2f}ms")
+    for name, build in report['builds'].items():
+        print(f"build {name:<18} {build['build_seconds']:.1f}s  "
+              f"peak RSS {build['peak_rss_mb'] or 0:.0f} MiB "
+              f"(before build {build.get('baseline_rss_mb') or 0:.0f} MiB)")
+    for regression in regressions:
+        print(f"REGRESSION {regression['name']} {regression['metric']}: "
+              f"{regression['baseline']:.4g} -> {regression['current']:.4g}")
+    print(f"Report written to {args.output}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
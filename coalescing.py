@@ -0,0 +1,115 @@
+import asyncio
+
+from metrics import BATCH_SIZE, COALESCED_REQUESTS
+
+
+class RequestCoalescer:
+    """Share one in-flight computation among concurrent identical requests.
+
+    The first request for a key (the leader) starts ``compute()``; requests
+    with the same key that arrive before it finishes (followers) await the
+    same result instead of computing it again. The key is forgotten as soon
+    as the computation finishes, so later requests start afresh (and usually
+    hit the result cache). Every caller gets the same result object, so
+    callers must not modify it. A caller that is cancelled, e.g. because its
+    client disconnected, does not cancel the shared computation.
+
+    Not thread-safe: use one coalescer per event loop.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._inflight = {}
+
+    def __len__(self):
+        return len(self._inflight)
+
+    async def run(self, key, compute):
+        """Return the result of ``compute()`` (a coroutine function) for ``key``."""
+        task = self._inflight.get(key)
+        if task is None:
+            COALESCED_REQUESTS.inc(coalescer=self.name, role='leader')
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            COALESCED_REQUESTS.inc(coalescer=self.name, role='follower')
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the error as seen even if every caller has gone away
+            task.exception()
+
+
+class MicroBatcher:
+    """Process concurrent single-item requests together in one batch call.
+
+    ``submit(item)`` queues an item and waits for its result. Queued items
+    are passed together to ``process(items)`` once ``max_batch`` of them are
+    waiting or ``max_wait`` seconds after the first one arrived. ``process``
+    runs on a worker thread and returns one result per item; an exception
+    instance in place of a result fails only that item.
+
+    At most ``max_inflight`` batches run at a time. Items arriving meanwhile
+    keep queueing, so under load batches grow instead of piling up as many
+    small ones.
+
+    Not thread-safe: use one batcher per event loop.
+    """
+
+    def __init__(self, process, name, max_batch=64, max_wait=0.002, max_inflight=2):
+        self.process = process
+        self.name = name
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_inflight = max_inflight
+        self._queue = []
+        self._timer = None
+        self._inflight = 0
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((item, future))
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # With every slot busy, the next batch to finish flushes again
+        while self._queue and self._inflight < self.max_inflight:
+            batch = self._queue[:self.max_batch]
+            del self._queue[:self.max_batch]
+            self._inflight += 1
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        try:
+            # Skip items whose caller has already given up
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                return
+            BATCH_SIZE.observe(len(batch), batcher=self.name)
+            try:
+                results = await asyncio.to_thread(self.process, [item for item, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self._inflight -= 1
+            if self._queue:
+                self._flush()
@@ -10,28 +10,127 @@ class Config:
     FLASK_ENV = os.getenv('FLASK_ENV', 'production')
     DEBUG = os.getenv('FLASK_DEBUG', '0') == '1'
     
-    # API Keys
+    # API Keys. Without a TMDB key (https://www.themoviedb.org/settings/api)
+    # recommendations are served without posters and overviews.
     TMDB_API_KEY = os.getenv('TMDB_API_KEY')
-    if not TMDB_API_KEY or TMDB_API_KEY == 'your_api_key_here':
-        raise ValueError(
-            'TMDB_API_KEY not set! Please set it in your .env file. '
-            'Get your API key from https://www.themoviedb.org/settings/api'
-        )
+    if TMDB_API_KEY == 'your_api_key_here':
+        TMDB_API_KEY = None
+    
+    # Token for POST /admin/reload (the endpoint is disabled when unset)
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
     
     # Cache
     CACHE_TYPE = os.getenv('CACHE_TYPE', 'SimpleCache')
     CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 300))
     
-    # Dataset paths
-    MOVIES_DATASET = 'movies.csv'
-    RATINGS_DATASET = 'ratings.csv'
+    # Recommendation result cache: 'memory' (per process) or 'sqlite' (shared by workers)
+    RESULT_CACHE_BACKEND = os.getenv('RESULT_CACHE_BACKEND', 'memory')
+    RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH', '.cache/results.sqlite3')
+    RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', 10000))
+    RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', 300))
+    
+    # Dataset paths (CSV files or a MovieLens zip archive)
+    MOVIES_DATASET = os.getenv('MOVIES_DATASET', 'movies.csv')
+    RATINGS_DATASET = os.getenv('RATINGS_DATASET', 'ratings.csv')
+    LINKS_DATASET = os.getenv('LINKS_DATASET', 'links.csv')
+    # Optional content signals; used when the files exist
+    TAGS_DATASET = os.getenv('TAGS_DATASET', 'tags.csv')
+    GENOME_SCORES_DATASET = os.getenv('GENOME_SCORES_DATASET', 'genome-scores.csv')
+    DATA_CACHE_DIR = os.getenv('DATA_CACHE_DIR', '.cache/data')
+    
+    # Precomputed model artifacts (built with `python artifacts.py build`)
+    MODEL_ARTIFACTS_DIR = os.getenv('MODEL_ARTIFACTS_DIR', 'models')
+    # Seconds between checks for a newer artifact version to hot-swap in (0 disables)
+    MODEL_RELOAD_INTERVAL = float(os.getenv('MODEL_RELOAD_INTERVAL', 60))
     
     # Recommendation settings
     DEFAULT_NUM_RECOMMENDATIONS = 5
+    RECOMMENDATIONS_MAX_LIMIT = 50
     MIN_REVIEWS_FOR_TOP_RATED = 100
+    TOP_RATED_LIMIT = 10
+    TOP_RATED_MAX_LIMIT = 100
+    CONTENT_TOP_K = int(os.getenv('CONTENT_TOP_K', 50))
+    CONTENT_OPTIONS = {
+        'field_weights': {
+            'genres': float(os.getenv('CONTENT_GENRES_WEIGHT', 1.0)),
+            'tags': float(os.getenv('CONTENT_TAGS_WEIGHT', 0.3)),
+            'genome': float(os.getenv('CONTENT_GENOME_WEIGHT', 0.8)),
+            'year': float(os.getenv('CONTENT_YEAR_WEIGHT', 0.3)),
+        },
+        'year_bucket': int(os.getenv('CONTENT_YEAR_BUCKET', 5)),
+        'min_tag_movies': int(os.getenv('CONTENT_MIN_TAG_MOVIES', 2)),
+        'genome_min_relevance': float(os.getenv('CONTENT_GENOME_MIN_RELEVANCE', 0.5)),
+    }
+    COLLABORATIVE_NEIGHBORS = int(os.getenv('COLLABORATIVE_NEIGHBORS', 50))
+    COLLABORATIVE_SHRINKAGE = float(os.getenv('COLLABORATIVE_SHRINKAGE', 1.0))
+    
+    # Collaborative backend: 'item_knn' or 'als' (matrix factorization)
+    COLLABORATIVE_BACKEND = os.getenv('COLLABORATIVE_BACKEND', 'item_knn')
+    ALS_OPTIONS = {
+        'factors': int(os.getenv('ALS_FACTORS', 64)),
+        'regularization': float(os.getenv('ALS_REGULARIZATION', 0.1)),
+        'iterations': int(os.getenv('ALS_ITERATIONS', 15)),
+        'implicit': os.getenv('ALS_IMPLICIT', '0') == '1',
+        'alpha': float(os.getenv('ALS_ALPHA', 40.0)),
+        'num_threads': int(os.getenv('ALS_THREADS', 0)) or None,
+    }
+    
+    # Approximate nearest-neighbor retrieval (IVF); more probes = higher recall
+    ANN_OPTIONS = {
+        'n_lists': int(os.getenv('ANN_N_LISTS', 0)) or None,
+        'n_probe': int(os.getenv('ANN_N_PROBE', 8)),
+    } if os.getenv('ANN_ENABLED', '0') == '1' else None
+    AUTOCOMPLETE_LIMIT = 10
+    AUTOCOMPLETE_MAX_LIMIT = 50
+    
+    # Hybrid recommendations: signal weights and the candidate pool scored per request
+    HYBRID_WEIGHTS = {
+        'content': float(os.getenv('HYBRID_CONTENT_WEIGHT', 0.4)),
+        'collaborative': float(os.getenv('HYBRID_COLLABORATIVE_WEIGHT', 0.4)),
+        'popularity': float(os.getenv('HYBRID_POPULARITY_WEIGHT', 0.2)),
+    }
+    HYBRID_MAX_CANDIDATES = int(os.getenv('HYBRID_MAX_CANDIDATES', 2000))
+    
+    # Async server (asgi.py): concurrent collaborative requests are scored
+    # together in batches of up to this many users, waiting at most this long
+    ASYNC_BATCH_MAX_SIZE = int(os.getenv('ASYNC_BATCH_MAX_SIZE', 64))
+    ASYNC_BATCH_MAX_WAIT = float(os.getenv('ASYNC_BATCH_MAX_WAIT', 0.002))
+    
+    # Share of MovieRecommender calls profiled with cProfile (0 disables; see /profile)
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    
+    # Incremental rating ingestion (POST /rate)
+    RATING_BATCH_SIZE = int(os.getenv('RATING_BATCH_SIZE', 1000))
+    RATING_FLUSH_INTERVAL = float(os.getenv('RATING_FLUSH_INTERVAL', 1.0))
+    RATING_COMPACTION_INTERVAL = float(os.getenv('RATING_COMPACTION_INTERVAL', 300))
     
     # TMDB API settings
+    TMDB_API_BASE_URL = os.getenv('TMDB_API_BASE_URL', 'https://api.themoviedb.org/3')
+    TMDB_MAX_WORKERS = int(os.getenv('TMDB_MAX_WORKERS', 8))
+    TMDB_REQUEST_TIMEOUT = float(os.getenv('TMDB_REQUEST_TIMEOUT', 3.0))
+    TMDB_BATCH_TIMEOUT = float(os.getenv('TMDB_BATCH_TIMEOUT', 5.0))
+    
+    # Durable TMDB metadata cache keyed by movieId (seeded from LINKS_DATASET)
+    TMDB_CACHE_PATH = os.getenv('TMDB_CACHE_PATH', '.cache/tmdb.sqlite3')
+    TMDB_CACHE_TTL = int(os.getenv('TMDB_CACHE_TTL', 7 * 24 * 3600))
     TMDB_IMAGE_BASE_URL = 'https://image.tmdb.org/t/p/'
     TMDB_POSTER_SIZE = 'w500'
     TMDB_BACKDROP_SIZE = 'original'
     TMDB_PROFILE_SIZE = 'w185'
+    
+    @classmethod
+    def recommender_options(cls):
+        """Keyword arguments for building a MovieRecommender from the datasets."""
+        return {
+            'content_top_k': cls.CONTENT_TOP_K,
+            'tags_path': cls.TAGS_DATASET if os.path.exists(cls.TAGS_DATASET) else None,
+            'genome_path': (cls.GENOME_SCORES_DATASET
+                            if os.path.exists(cls.GENOME_SCORES_DATASET) else None),
+            'content_options': cls.CONTENT_OPTIONS,
+            'item_neighbors': cls.COLLABORATIVE_NEIGHBORS,
+            'shrinkage': cls.COLLABORATIVE_SHRINKAGE,
+            'collaborative_backend': cls.COLLABORATIVE_BACKEND,
+            'als_options': cls.ALS_OPTIONS,
+            'ann_options': cls.ANN_OPTIONS,
+            'data_cache_dir': cls.DATA_CACHE_DIR,
+        }
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from movie_recommender import MovieRecommender
+
+GENRES = ['Action', 'Animation', 'Comedy', 'Drama', 'Horror', 'Romance', 'Sci-Fi', 'Thriller']
+
+
+def make_movielens(directory, num_movies=120, num_users=40, seed=0):
+    """Write a small synthetic MovieLens ``movies.csv`` and ``ratings.csv``.
+
+    Movies get one or two genres out of a few, so many share a genre
+    profile and tie on content similarity. Every user prefers two genres
+    and rates those movies higher, in half stars. Returns the two paths.
+    """
+    rng = np.random.default_rng(seed)
+    genres = ['|'.join(sorted(rng.choice(GENRES, size=rng.integers(1, 3), replace=False)))
+              for _ in range(num_movies)]
+    movies = pd.DataFrame({
+        'movieId': np.arange(1, num_movies + 1) * 10,
+        'title': [f'Movie {i} ({1980 + i % 30})' for i in range(num_movies)],
+        'genres': genres,
+    })
+
+    ratings = []
+    for user_id in range(1, num_users + 1):
+        liked = set(rng.choice(GENRES, size=2, replace=False))
+        for movie in rng.choice(num_movies, size=rng.integers(10, 40), replace=False):
+            bonus = 1.5 if liked & set(genres[movie].split('|')) else 0.0
+            rating = np.clip(np.round((2.5 + bonus + rng.normal(0, 0.8)) * 2) / 2, 0.5, 5.0)
+            ratings.append((user_id, movies['movieId'][movie], rating, 1_000_000 + len(ratings)))
+    ratings = pd.DataFrame(ratings, columns=['userId', 'movieId', 'rating', 'timestamp'])
+
+    movies_path = str(directory / 'movies.csv')
+    ratings_path = str(directory / 'ratings.csv')
+    movies.to_csv(movies_path, index=False)
+    ratings.to_csv(ratings_path, index=False)
+    return movies_path, ratings_path
+
+
+@pytest.fixture(scope='session')
+def movielens(tmp_path_factory):
+    """Paths of a synthetic ``(movies.csv, ratings.csv)`` pair shared by the session."""
+    return make_movielens(tmp_path_factory.mktemp('movielens'))
+
+
+@pytest.fixture(scope='session')
+def build_recommender(movielens):
+    """Build a MovieRecommender on the synthetic data, once per set of options.
+
+    Recommenders are shared between tests; tests that add ratings build
+    their own.
+    """
+    built = {}
+
+    def build(**options):
+        key = repr(sorted(options.items()))
+        if key not in built:
+            built[key] = MovieRecommender(*movielens, **options)
+        return built[key]
+    return build
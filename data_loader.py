@@ -0,0 +1,175 @@
+import hashlib
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+# Compact on-disk/in-memory dtypes for the MovieLens CSV columns
+MOVIE_DTYPES = {'movieId': np.int32, 'title': str, 'genres': str}
+RATING_DTYPES = {'userId': np.int32, 'movieId': np.int32, 'rating': np.float32,
+                 'timestamp': np.uint32}
+# tmdbId is missing for a few movies, hence the nullable integer type
+LINK_DTYPES = {'movieId': np.int32, 'imdbId': str, 'tmdbId': 'Int64'}
+TAG_DTYPES = {'movieId': np.int32, 'tag': str}
+GENOME_DTYPES = {'movieId': np.int32, 'tagId': np.int32, 'relevance': np.float32}
+
+# Bump when the cached column layout changes
+CACHE_FORMAT = 1
+
+
+def _open_source(path, member_name):
+    """Open ``path`` for reading, looking inside it if it is a zip archive.
+
+    For archives such as ``ml-latest-small.zip`` the member whose file name
+    is ``member_name`` is used, wherever it sits inside the archive.
+    """
+    if not zipfile.is_zipfile(path):
+        return open(path, 'rb')
+
+    archive = zipfile.ZipFile(path)
+    for member in archive.namelist():
+        if os.path.basename(member) == member_name:
+            return archive.open(member)
+    archive.close()
+    raise FileNotFoundError(f"'{member_name}' not found in archive '{path}'")
+
+
+def file_digest(path, chunk_size=2 ** 20):
+    """Return the BLAKE2b hex digest of a file's contents."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_movies(path):
+    """Read the MovieLens movies table with compact dtypes.
+
+    ``path`` may be ``movies.csv`` itself or a MovieLens zip archive.
+    """
+    with _open_source(path, 'movies.csv') as f:
+        movies = pd.read_csv(f, dtype=MOVIE_DTYPES, usecols=list(MOVIE_DTYPES))
+    movies['genres'] = movies['genres'].fillna('')
+    return movies
+
+
+def load_links(path):
+    """Read the MovieLens links table (movieId -> imdbId/tmdbId).
+
+    ``path`` may be ``links.csv`` itself or a MovieLens zip archive.
+    """
+    with _open_source(path, 'links.csv') as f:
+        return pd.read_csv(f, dtype=LINK_DTYPES, usecols=list(LINK_DTYPES))
+
+
+def load_tags(path):
+    """Read the MovieLens user tags table (movieId, tag).
+
+    ``path`` may be ``tags.csv`` itself or a MovieLens zip archive. Tags are
+    stripped and lowercased, and empty tags dropped.
+    """
+    with _open_source(path, 'tags.csv') as f:
+        tags = pd.read_csv(f, dtype=TAG_DTYPES, usecols=list(TAG_DTYPES))
+    tags['tag'] = tags['tag'].fillna('').str.strip().str.lower()
+    return tags[tags['tag'] != ''].reset_index(drop=True)
+
+
+def load_genome_scores(path, min_relevance=0.0, chunk_size=1_000_000):
+    """Read the MovieLens tag genome (movieId, tagId, relevance).
+
+    ``path`` may be ``genome-scores.csv`` itself or a MovieLens zip archive.
+    The genome is dense (every movie scores every tag), so it is read in
+    chunks and only relevances of at least ``min_relevance`` are kept.
+    """
+    with _open_source(path, 'genome-scores.csv') as f:
+        chunks = [chunk[chunk['relevance'] >= min_relevance]
+                  for chunk in pd.read_csv(f, dtype=GENOME_DTYPES, usecols=list(GENOME_DTYPES),
+                                           chunksize=chunk_size)]
+    if not chunks:
+        return pd.DataFrame({column: pd.Series(dtype=dtype)
+                             for column, dtype in GENOME_DTYPES.items()})
+    return pd.concat(chunks, ignore_index=True)
+
+
+def load_ratings(path, with_timestamps=False, cache_dir=None):
+    """Read the MovieLens ratings table with compact dtypes.
+
+    ``path`` may be ``ratings.csv`` itself or a MovieLens zip archive. Ids
+    are int32 and ratings float32; the timestamp column is only returned
+    when ``with_timestamps`` is set.
+
+    With ``cache_dir``, the parsed columns are kept there as ``.npy`` files
+    keyed by a hash of the source file (ratings stored as uint8 half-stars),
+    and later loads of the same file skip CSV parsing entirely.
+    """
+    columns = ['userId', 'movieId', 'rating'] + (['timestamp'] if with_timestamps else [])
+    if cache_dir is None:
+        return _read_ratings_csv(path, columns)
+
+    entry = os.path.join(cache_dir, f'ratings-v{CACHE_FORMAT}-{file_digest(path)}')
+    if not os.path.isdir(entry):
+        _write_ratings_cache(_read_ratings_csv(path, list(RATING_DTYPES)), entry)
+    return _read_ratings_cache(entry, columns)
+
+
+def iter_ratings(path, chunk_size=100_000):
+    """Yield the ratings in ``path`` as DataFrames of up to ``chunk_size`` rows.
+
+    Reads ``ratings.csv`` (or a MovieLens zip) incrementally with the same
+    compact dtypes as ``load_ratings``, for feeding ``add_ratings``.
+    """
+    columns = ['userId', 'movieId', 'rating']
+    with _open_source(path, 'ratings.csv') as f:
+        yield from pd.read_csv(f, usecols=columns, chunksize=chunk_size,
+                               dtype={name: RATING_DTYPES[name] for name in columns})
+
+
+def _read_ratings_csv(path, columns):
+    with _open_source(path, 'ratings.csv') as f:
+        return pd.read_csv(f, usecols=columns,
+                           dtype={name: RATING_DTYPES[name] for name in columns})
+
+
+def _write_ratings_cache(ratings, entry):
+    """Write ratings columns to ``entry`` atomically (staged, then renamed)."""
+    staging = f'{entry}.{os.getpid()}.tmp'
+    os.makedirs(staging, exist_ok=True)
+    np.save(os.path.join(staging, 'userId.npy'), ratings['userId'].to_numpy())
+    np.save(os.path.join(staging, 'movieId.npy'), ratings['movieId'].to_numpy())
+    np.save(os.path.join(staging, 'timestamp.npy'), ratings['timestamp'].to_numpy())
+
+    # Half-star ratings fit a byte; anything else keeps float32
+    half_stars = ratings['rating'].to_numpy() * 2
+    if (np.all(half_stars == np.round(half_stars))
+            and half_stars.min(initial=0) >= 0 and half_stars.max(initial=0) <= 255):
+        np.save(os.path.join(staging, 'rating_half_stars.npy'), half_stars.astype(np.uint8))
+    else:
+        np.save(os.path.join(staging, 'rating.npy'), ratings['rating'].to_numpy())
+
+    try:
+        os.replace(staging, entry)
+    except OSError:
+        # Another process populated the same entry first
+        if not os.path.isdir(entry):
+            raise
+        for name in os.listdir(staging):
+            os.remove(os.path.join(staging, name))
+        os.rmdir(staging)
+
+
+def _read_ratings_cache(entry, columns):
+    def column(name):
+        return np.load(os.path.join(entry, f'{name}.npy'), mmap_mode='r')
+
+    data = {}
+    for name in columns:
+        if name == 'rating':
+            if os.path.exists(os.path.join(entry, 'rating_half_stars.npy')):
+                data['rating'] = column('rating_half_stars').astype(np.float32) / 2
+            else:
+                data['rating'] = np.array(column('rating'))
+        else:
+            data[name] = np.array(column(name))
+    return pd.DataFrame(data)
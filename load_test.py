@@ -0,0 +1,258 @@
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from data_loader import load_movies, load_ratings
+
+ENDPOINTS = ('movie', 'user', 'hybrid')
+# Series read from the server's /metrics before and after the run
+METRIC_PATTERN = re.compile(
+    r'^(coalesced_requests_total\{coalescer="recommendations",role="(?P<role>\w+)"\}'
+    r'|recommender_batch_size_(?P<stat>sum|count)\{batcher="collaborative"\}) (?P<value>\S+)$')
+
+
+def popular_seeds(movies_path, ratings_path, num_seeds=200):
+    """Return the ``num_seeds`` most rated titles and most active user ids, most popular first."""
+    movies = load_movies(movies_path)
+    ratings = load_ratings(ratings_path)
+    top_movies = ratings['movieId'].value_counts().index[:num_seeds]
+    titles = movies.set_index('movieId').loc[top_movies, 'title'].tolist()
+    users = ratings['userId'].value_counts().index[:num_seeds].astype(int).tolist()
+    return titles, users
+
+
+def skewed_picker(num_items, skew, rng):
+    """Draw item positions with a Zipf-like skew: position 0 is the most popular."""
+    weights = 1.0 / np.arange(1, num_items + 1) ** skew
+    probabilities = weights / weights.sum()
+    return lambda: int(rng.choice(num_items, p=probabilities))
+
+
+def make_request(endpoint, titles, users, pick_title, pick_user):
+    """Return ``(path, form)`` for one request to ``endpoint``."""
+    if endpoint == 'movie':
+        return '/recommend_by_movie', {'movie_title': titles[pick_title()]}
+    if endpoint == 'user':
+        return '/recommend_by_user', {'user_id': str(users[pick_user()])}
+    return '/recommend_hybrid', {'user_id': str(users[pick_user()]),
+                                 'movie_title': titles[pick_title()]}
+
+
+class HTTPConnection:
+    """One keep-alive HTTP/1.1 connection for a load-test client.
+
+    Much cheaper per request than a full HTTP client library, so on a shared
+    host the load generator leaves the CPU to the server under test.
+    Reconnects after the server closes the connection or a request fails.
+    """
+
+    def __init__(self, host, port, timeout=30.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader = self._writer = None
+
+    async def request(self, method, path, form=None):
+        """Send one request and return ``(status, body)``."""
+        try:
+            return await asyncio.wait_for(self._request(method, path, form), self.timeout)
+        except BaseException:
+            self.close()
+            raise
+
+    async def _request(self, method, path, form):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        body = urlencode(form or {}).encode()
+        head = (f'{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n'
+                f'Content-Type: application/x-www-form-urlencoded\r\n'
+                f'Content-Length: {len(body)}\r\n\r\n')
+        self._writer.write(head.encode() + body)
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionError('Server closed the connection')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip().lower()
+
+        if headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self._reader.readline()).split(b';')[0], 16)
+                chunks.append(await self._reader.readexactly(size + 2))
+                if size == 0:
+                    break
+            body = b''.join(chunk[:-2] for chunk in chunks)
+        elif 'content-length' in headers:
+            body = await self._reader.readexactly(int(headers['content-length']))
+        else:
+            body = await self._reader.read()
+            headers['connection'] = 'close'
+        if headers.get('connection') == 'close' or status_line.startswith(b'HTTP/1.0'):
+            self.close()
+        return status, body
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+async def scrape_server_metrics(host, port, timeout=30.0):
+    """Read the coalescing and batching counters of the server process, or None."""
+    connection = HTTPConnection(host, port, timeout)
+    try:
+        status, body = await connection.request('GET', '/metrics')
+    except (OSError, ValueError, asyncio.TimeoutError):
+        return None
+    finally:
+        connection.close()
+    if status != 200:
+        return None
+    values = {'leader': 0.0, 'follower': 0.0, 'sum': 0.0, 'count': 0.0}
+    for line in body.decode().splitlines():
+        match = METRIC_PATTERN.match(line)
+        if match:
+            values[match.group('role') or match.group('stat')] = float(match.group('value'))
+    return values
+
+
+async def run_load(url, endpoints, titles, users, concurrency=64, duration=30.0,
+                   skew=1.1, timeout=30.0, seed=0):
+    """Send requests from ``concurrency`` concurrent clients for ``duration`` seconds.
+
+    Each client sends its next request as soon as the last one returns.
+    Seeds are drawn with a Zipf-like skew, so popular movies and users are
+    requested much more often, as in production traffic.
+    """
+    rng = np.random.default_rng(seed)
+    pick_title = skewed_picker(len(titles), skew, rng)
+    pick_user = skewed_picker(len(users), skew, rng)
+    latencies = {endpoint: [] for endpoint in endpoints}
+    statuses = {}
+    address = urlsplit(url)
+    host, port = address.hostname, address.port or 80
+
+    before = await scrape_server_metrics(host, port, timeout)
+    stop_at = time.perf_counter() + duration
+
+    async def worker():
+        connection = HTTPConnection(host, port, timeout)
+        while time.perf_counter() < stop_at:
+            endpoint = endpoints[int(rng.integers(len(endpoints)))]
+            path, form = make_request(endpoint, titles, users, pick_title, pick_user)
+            start = time.perf_counter()
+            try:
+                status, _ = await connection.request('POST', path, form)
+            except (OSError, ValueError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+            latencies[endpoint].append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+        connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    after = await scrape_server_metrics(host, port, timeout)
+
+    every = np.concatenate([np.asarray(values) for values in latencies.values()])
+    report = {
+        'url': url,
+        'concurrency': concurrency,
+        'duration_seconds': elapsed,
+        'requests': len(every),
+        'throughput_rps': len(every) / elapsed,
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        'endpoints': {endpoint: latency_summary(values)
+                      for endpoint, values in latencies.items() if values},
+        **latency_summary(every),
+    }
+    if before is not None and after is not None:
+        delta = {name: after[name] - before[name] for name in after}
+        coalesced = delta['leader'] + delta['follower']
+        report['coalesced_share'] = delta['follower'] / coalesced if coalesced else 0.0
+        report['mean_batch_size'] = delta['sum'] / delta['count'] if delta['count'] else None
+    return report
+
+
+def latency_summary(latencies):
+    latencies = np.asarray(latencies) * 1000
+    if len(latencies) == 0:
+        return {}
+    return {
+        'latency_p50_ms': float(np.percentile(latencies, 50)),
+        'latency_p90_ms': float(np.percentile(latencies, 90)),
+        'latency_p99_ms': float(np.percentile(latencies, 99)),
+        'latency_max_ms': float(latencies.max()),
+    }
+
+
+def main():
+    """Command-line entry point: load-test a running server and print a summary."""
+    parser = argparse.ArgumentParser(
+        description='Send concurrent recommendation requests to a running server.')
+    parser.add_argument('--url', default='http://127.0.0.1:8000',
+                        help='Server base URL (plain HTTP)')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                        help='Comma-separated mix of: ' + ', '.join(ENDPOINTS))
+    parser.add_argument('--concurrency', type=int, default=64, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run')
+    parser.add_argument('--seeds', type=int, default=200,
+                        help='Distinct seed movies and users to draw from')
+    parser.add_argument('--skew', type=float, default=1.1,
+                        help='Zipf exponent of seed popularity (0 for uniform)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Request timeout')
+    parser.add_argument('--movies', help='Path to movies.csv (default: MOVIES_DATASET)')
+    parser.add_argument('--ratings', help='Path to ratings.csv (default: RATINGS_DATASET)')
+    parser.add_argument('--output', help='Also write the report to this JSON file')
+    args = parser.parse_args()
+
+    if urlsplit(args.url).scheme != 'http':
+        parser.error('Only http:// URLs are supported')
+    endpoints = args.endpoints.split(',')
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    from config import Config
+
+    titles, users = popular_seeds(args.movies or Config.MOVIES_DATASET,
+                                  args.ratings or Config.RATINGS_DATASET, args.seeds)
+    report = asyncio.run(run_load(args.url, endpoints, titles, users,
+                                  concurrency=args.concurrency, duration=args.duration,
+                                  skew=args.skew, timeout=args.timeout))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    print(f"{report['requests']} requests in {report['duration_seconds']:.1f}s: "
+          f"{report['throughput_rps']:.1f} req/s")
+    for name, summary in [('all', report)] + list(report['endpoints'].items()):
+        print(f"{name:<8} p50 {summary['latency_p50_ms']:.1f}ms  "
+              f"p90 {summary['latency_p90_ms']:.1f}ms  p99 {summary['latency_p99_ms']:.1f}ms  "
+              f"max {summary['latency_max_ms']:.1f}ms")
+    print('statuses ' + ', '.join(f'{status}: {count}'
+                                  for status, count in report['statuses'].items()))
+    if 'coalesced_share' in report:
+        mean_batch = report['mean_batch_size']
+        print(f"server: {report['coalesced_share']:.1%} of requests coalesced, mean "
+              f"collaborative batch {f'{mean_batch:.1f}' if mean_batch else 'n/a'}")
+    failed = sum(count for status, count in report['statuses'].items()
+                 if not status.startswith('2'))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
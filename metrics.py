@@ -0,0 +1,231 @@
+import bisect
+import cProfile
+import functools
+import io
+import pstats
+import random
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _Timer:
+    """Context manager that observes its elapsed time into a histogram."""
+
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, one series per label combination."""
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), then sum and count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        """Time a ``with`` block into this histogram."""
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(key, list(counts), total, count)
+                      for key, (counts, total, count) in sorted(self._series.items())]
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.label_names, key, [('le', le)])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {total!r}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter, one value per label combination."""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f'{self.name}{_format_labels(self.label_names, key)} {value}'
+                     for key, value in values)
+        return lines
+
+
+class Registry:
+    """Named metrics of this process, rendered in the Prometheus text format.
+
+    Metrics are per process: with several web workers each one exports its
+    own series, which Prometheus aggregates across scrape targets.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_class, name, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"Metric '{name}' is already registered as a "
+                                 f"{type(metric).__name__.lower()}")
+            return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, labels, buckets)
+
+    def counter(self, name, help_text, labels=()):
+        return self._get_or_create(Counter, name, help_text, labels)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'recommender_stage_seconds', 'Time spent in each recommendation stage.', ('stage',))
+CACHE_LOOKUPS = REGISTRY.counter(
+    'recommender_cache_lookups_total', 'Cache lookups by cache and result.',
+    ('cache', 'result'))
+TMDB_REQUESTS = REGISTRY.counter(
+    'tmdb_requests_total', 'TMDB HTTP requests by outcome.', ('outcome',))
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_seconds', 'Web request latency by endpoint, method and status.',
+    ('endpoint', 'method', 'status'))
+COALESCED_REQUESTS = REGISTRY.counter(
+    'coalesced_requests_total',
+    'Requests that started a computation (leader) or joined an identical one in '
+    'flight (follower).', ('coalescer', 'role'))
+BATCH_SIZE = REGISTRY.histogram(
+    'recommender_batch_size', 'Requests scored together in one micro-batch.', ('batcher',),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+
+def span(stage):
+    """Time a ``with`` block as one stage of serving a recommendation.
+
+    Stages: seed_lookup, candidates, scoring, top_k, format, enrichment,
+    tmdb_io. A span costs two clock reads and one locked bucket increment.
+    """
+    return STAGE_SECONDS.time(stage=stage)
+
+
+class SamplingProfiler:
+    """Profile a random sample of calls to selected methods with cProfile.
+
+    Each call of an instrumented method is profiled with probability
+    ``sample_rate``; at most one call is profiled at a time, so concurrent
+    requests are never slowed by more than the sampled call. The statistics
+    of every profiled call are merged and can be read with ``report``.
+    """
+
+    def __init__(self, sample_rate=0.01):
+        self.sample_rate = sample_rate
+        self.samples = 0
+        self._stats = None
+        self._busy = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def instrument(self, cls, method_names):
+        """Wrap ``method_names`` of ``cls``, so every instance is sampled."""
+        for name in method_names:
+            method = getattr(cls, name)
+            if getattr(method, '_sampling_profiler', None) is not None:
+                continue
+            setattr(cls, name, self._wrap(method))
+
+    def _wrap(self, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if random.random() >= self.sample_rate or not self._busy.acquire(blocking=False):
+                return method(*args, **kwargs)
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(method, *args, **kwargs)
+            finally:
+                self._busy.release()
+                self._add(profile)
+        wrapper._sampling_profiler = self
+        return wrapper
+
+    def _add(self, profile):
+        with self._stats_lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.samples += 1
+
+    def report(self, limit=30, sort='cumulative'):
+        """Return the merged statistics as text, top ``limit`` functions."""
+        with self._stats_lock:
+            if self._stats is None:
+                return 'No calls sampled yet.\n'
+            output = io.StringIO()
+            self._stats.stream = output
+            self._stats.sort_stats(sort).print_stats(limit)
+        return f'{self.samples} sampled calls\n' + output.getvalue()
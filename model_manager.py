@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ModelNotReady(Exception):
+    """Raised when a request needs the model before it has finished loading."""
+
+
+class ModelManager:
+    """Loads the recommender on a background thread and hot-swaps new versions.
+
+    ``loader()`` builds and returns a model. ``start`` runs it once on a
+    background thread, so the process answers health checks while the model
+    loads, and ``get`` returns the live model or raises ``ModelNotReady``.
+
+    ``reload`` runs the loader again in the background and swaps the result
+    in with one reference assignment: requests already running finish on the
+    old model and later ones get the new one. ``on_swap(old, new)`` runs
+    just before each swap (``old`` is None the first time) to carry state
+    such as caches over. A failed reload keeps serving the old model.
+
+    With ``version_source`` (a callable returning the newest available
+    version) and ``watch_interval`` seconds, the loader thread keeps polling
+    and reloads whenever a new version appears.
+    """
+
+    def __init__(self, loader, on_swap=None, version_source=None, watch_interval=0):
+        self.loader = loader
+        self.on_swap = on_swap
+        self.version_source = version_source
+        self.watch_interval = watch_interval
+        self.state = 'idle'
+        self.reloading = False
+        self.error = None
+        self.loaded_version = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self._model = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @property
+    def ready(self):
+        return self._model is not None
+
+    def get(self):
+        """Return the live model; raises ModelNotReady until the first load succeeds."""
+        model = self._model
+        if model is None:
+            raise ModelNotReady(f"The recommendation model is {self.state}; try again shortly.")
+        return model
+
+    def start(self):
+        """Begin loading in the background; later calls do nothing."""
+        if self.state != 'idle':
+            return self
+        with self._lock:
+            if self.state != 'idle':
+                return self
+            self.state = 'loading'
+        threading.Thread(target=self._run, name='model-loader', daemon=True).start()
+        return self
+
+    def reload(self):
+        """Load a fresh model in the background and swap it in.
+
+        Returns False when a load is already running.
+        """
+        with self._lock:
+            if self.state == 'loading' or self.reloading:
+                return False
+            if self._model is None:
+                self.state = 'loading'
+            self.reloading = True
+        threading.Thread(target=self._load, name='model-reloader', daemon=True).start()
+        return True
+
+    def stop(self):
+        """Stop watching for new versions."""
+        self._stop.set()
+
+    def status(self):
+        model = self._model
+        return {
+            'state': self.state,
+            'ready': model is not None,
+            'reloading': self.reloading,
+            'model_version': getattr(model, 'model_version', None),
+            'loaded_at': self.loaded_at,
+            'load_seconds': self.load_seconds,
+            'error': self.error,
+        }
+
+    def _run(self):
+        self._load()
+        if not self.version_source or self.watch_interval <= 0:
+            return
+        while not self._stop.wait(self.watch_interval):
+            try:
+                version = self.version_source()
+            except Exception as e:
+                logger.error(f"Failed to check for a new model version: {str(e)}")
+                continue
+            if version is not None and version != self.loaded_version:
+                logger.info(f"Model version {version} is available; reloading")
+                if self.reload():
+                    # Wait for this reload before polling again
+                    while self.reloading and not self._stop.wait(0.1):
+                        pass
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            version = self.version_source() if self.version_source else None
+            model = self.loader()
+            old = self._model
+            if self.on_swap is not None:
+                self.on_swap(old, model)
+            self._model = model
+            self.loaded_version = version
+            self.loaded_at = time.time()
+            self.load_seconds = time.perf_counter() - start
+            self.error = None
+            self.state = 'ready'
+            logger.info(f"Model {getattr(model, 'model_version', None) or 'built from datasets'} "
+                        f"{'swapped in' if old is not None else 'loaded'} "
+                        f"in {self.load_seconds:.1f}s")
+        except Exception as e:
+            self.error = str(e)
+            if self._model is None:
+                self.state = 'failed'
+            logger.error(f"Failed to load the recommendation model: {str(e)}")
+        finally:
+            self.reloading = False
@@ -1,141 +1,1206 @@
+import os
+import threading
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import matplotlib.pyplot as plt
-import seaborn as sns
+from scipy import sparse
+from sklearn.preprocessing import normalize
+from similarity import (block_rows, top_k_cosine_neighbors, top_k_indices, top_k_per_row,
+                        top_k_rows)
+from metrics import span
+from title_index import TitleIndex
+from als import ALSModel
+from ann_index import IVFIndex
+from content_features import NO_GENRES, YEAR_PATTERN, build_content_features
+from data_loader import load_movies, load_ratings, load_tags, load_genome_scores
+from artifacts import (save_arrays, load_arrays, sparse_arrays, load_sparse,
+                       encode_strings, decode_strings)
+from pagination import decode_cursor
+
+COLLABORATIVE_BACKENDS = ('item_knn', 'als')
+# Leaderboards kept ranked per (min_reviews, genre, bayesian) combination
+LEADERBOARD_CACHE_SIZE = 64
+# Recommendation filters and the movie masks kept per filter combination
+FILTER_NAMES = ('genres', 'year_range', 'exclude_ids', 'min_ratings')
+FILTER_MASK_CACHE_SIZE = 64
+# Neighbor table entries this close to the table's weakest score may rank
+# below movies outside the table once rescored exactly
+TABLE_SCORE_MARGIN = 1e-4
+# Default blend of the hybrid recommender's signals
+HYBRID_WEIGHTS = {'content': 0.4, 'collaborative': 0.4, 'popularity': 0.2}
+# Ratings at or above this mark a movie the user liked
+LIKED_RATING = 4.0
+# At most this many liked movies join the hybrid content profile
+MAX_PROFILE_MOVIES = 20
+# Popular candidates come from the Bayesian leaderboard at this minimum
+POPULAR_MIN_REVIEWS = 10
 
 class MovieRecommender:
-    def __init__(self, movies_path, ratings_path):
-        """Initialize the recommender system with movie and rating data paths."""
+    def __init__(self, movies_path, ratings_path, content_top_k=50, item_neighbors=50,
+                 shrinkage=1.0, collaborative_backend='item_knn', als_options=None,
+                 ann_options=None, data_cache_dir=None, tags_path=None, genome_path=None,
+                 content_options=None):
+        """Initialize the recommender system with movie and rating data paths.
+
+        Either path may also point at a MovieLens zip archive, and
+        ``ratings_path`` may be an already loaded ratings DataFrame (such as
+        a training split). With ``data_cache_dir`` the parsed ratings are
+        cached there in a columnar binary form, so later starts skip CSV
+        parsing.
+
+        ``content_top_k`` is the number of content neighbors kept per movie;
+        pages that the table cannot answer (large, deep or narrowly filtered
+        ones) are scored against the whole catalog instead.
+        Content features combine genres and release years with the user tags
+        in ``tags_path`` (``tags.csv``) and the tag genome in ``genome_path``
+        (``genome-scores.csv``) when given; ``content_options`` are keyword
+        arguments of ``build_content_features`` such as ``field_weights``.
+        ``item_neighbors`` is the number of rating-based neighbors kept per
+        movie for collaborative filtering, and ``shrinkage`` pulls predictions
+        that are backed by only a few similar movies toward the user's mean
+        rating.
+
+        ``collaborative_backend`` selects the collaborative model: 'item_knn'
+        for item-item neighbors or 'als' for matrix factorization, configured
+        through the ``als_options`` keyword arguments of ``ALSModel``.
+
+        ``ann_options`` (keyword arguments of ``IVFIndex``, e.g. ``n_lists`` and
+        ``n_probe``) switches on approximate nearest-neighbor retrieval: the
+        content neighbor table is built from an IVF index instead of a full
+        scan, and with the ALS backend users are answered from an IVF index
+        over the item factors.
+        """
+        if collaborative_backend not in COLLABORATIVE_BACKENDS:
+            raise ValueError(
+                f"Unknown collaborative backend '{collaborative_backend}'. "
+                f"Choose one of: {', '.join(COLLABORATIVE_BACKENDS)}")
         try:
-            self.movies = pd.read_csv(movies_path)
-            self.ratings = pd.read_csv(ratings_path)
-            self.content_similarity = None
-            self.user_similarity = None
+            self.movies = load_movies(movies_path)
+            if isinstance(ratings_path, pd.DataFrame):
+                self._ratings = ratings_path[['userId', 'movieId', 'rating']].reset_index(drop=True)
+            else:
+                self._ratings = load_ratings(ratings_path, cache_dir=data_cache_dir)
+            self.model_version = None
+            self.content_top_k = content_top_k
+            self.tags_path = tags_path
+            self.genome_path = genome_path
+            self.content_options = content_options or {}
+            self.content_neighbors = None
+            self.content_scores = None
+            self.item_neighbors = item_neighbors
+            self.shrinkage = shrinkage
+            self.item_similarity = None
+            self.collaborative_backend = collaborative_backend
+            self.als_options = als_options or {}
+            self.als_model = None
+            self.ann_options = ann_options
+            self.item_index = None
+            # Optional rec_cache.RecommendationCache for finished result lists
+            self.result_cache = None
+            self._prepare_lookup_columns()
+            self._prepare_title_index()
             self._prepare_content_based()
             self._prepare_collaborative()
+            self._prepare_rating_updates()
         except Exception as e:
             raise Exception(f"Failed to initialize MovieRecommender: {str(e)}")
 
+    @property
+    def ratings(self):
+        """Ratings as a DataFrame; rebuilt from the rating matrix for loaded or updated models."""
+        if self._ratings is None:
+            matrix = self._live_rating_matrix().tocoo()
+            self._ratings = pd.DataFrame({
+                'userId': self.user_ids[matrix.row],
+                'movieId': self.movies['movieId'].to_numpy()[matrix.col],
+                'rating': matrix.data,
+            })
+        return self._ratings
+
+    def save(self, root):
+        """Persist the precomputed model as a new artifact version under ``root``.
+
+        Returns the version directory. Load it back with ``MovieRecommender.load``.
+        """
+        try:
+            # Fold pending rating updates into the saved matrix
+            self.compact_ratings()
+            title_blob, title_offsets = encode_strings(self._titles)
+            genre_blob, genre_offsets = encode_strings(self._genres)
+            arrays = {
+                'movies.movie_id': self.movies['movieId'].to_numpy(),
+                'movies.title_blob': title_blob,
+                'movies.title_offsets': title_offsets,
+                'movies.genres_blob': genre_blob,
+                'movies.genres_offsets': genre_offsets,
+                'content.neighbors': self.content_neighbors,
+                'content.scores': self.content_scores,
+                'ratings.user_ids': self.user_ids,
+                **sparse_arrays('content.features', self.content_features),
+                **sparse_arrays('ratings.matrix', self.rating_matrix),
+            }
+            arrays.update({f'title_index.{name}': array
+                           for name, array in self.title_index.arrays().items()})
+            if self.item_similarity is not None:
+                arrays.update(sparse_arrays('item_similarity', self.item_similarity))
+            if self.als_model is not None:
+                arrays['als.user_factors'] = self.als_model.user_factors
+                arrays['als.item_factors'] = self.als_model.item_factors
+            if self.item_index is not None:
+                arrays['ann.centroids'] = self.item_index.centroids
+                arrays['ann.list_offsets'] = self.item_index.list_offsets
+                arrays['ann.list_ids'] = self.item_index.list_ids
+
+            metadata = {
+                'content_top_k': self.content_top_k,
+                'content_options': self.content_options,
+                'item_neighbors': self.item_neighbors,
+                'shrinkage': self.shrinkage,
+                'collaborative_backend': self.collaborative_backend,
+                'als_options': self.als_options,
+                'als_global_mean': self.als_model.global_mean if self.als_model else None,
+                'ann_options': self.ann_options,
+            }
+            version_dir = save_arrays(root, arrays, metadata)
+            self.model_version = os.path.basename(version_dir)
+            return version_dir
+        except Exception as e:
+            raise Exception(f"Failed to save MovieRecommender: {str(e)}")
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Load a model saved with ``save`` without recomputing anything.
+
+        ``path`` is the artifact root (the latest version is used) or a
+        version directory. Large arrays are memory-mapped read-only, so
+        workers loading the same version share their pages.
+        """
+        try:
+            arrays, manifest = load_arrays(path, mmap_mode=mmap_mode)
+            metadata = manifest['metadata']
+
+            recommender = cls.__new__(cls)
+            recommender.model_version = manifest['version']
+            recommender._ratings = None
+            recommender.result_cache = None
+            recommender.content_top_k = metadata['content_top_k']
+            recommender.content_options = metadata.get('content_options') or {}
+            recommender.tags_path = None
+            recommender.genome_path = None
+            recommender.item_neighbors = metadata['item_neighbors']
+            recommender.shrinkage = metadata['shrinkage']
+            recommender.collaborative_backend = metadata['collaborative_backend']
+            recommender.als_options = metadata['als_options']
+            recommender.ann_options = metadata['ann_options']
+
+            recommender.movies = pd.DataFrame({
+                'movieId': arrays['movies.movie_id'],
+                'title': decode_strings(arrays['movies.title_blob'],
+                                        arrays['movies.title_offsets']),
+                'genres': decode_strings(arrays['movies.genres_blob'],
+                                         arrays['movies.genres_offsets']),
+            })
+            recommender._prepare_lookup_columns()
+            recommender.title_index = TitleIndex.from_arrays({
+                name[len('title_index.'):]: array for name, array in arrays.items()
+                if name.startswith('title_index.')})
+
+            recommender.content_features = load_sparse(arrays, 'content.features')
+            recommender.content_neighbors = arrays['content.neighbors']
+            recommender.content_scores = arrays['content.scores']
+
+            recommender.user_ids = arrays['ratings.user_ids']
+            recommender._user_rows = pd.Index(recommender.user_ids)
+            recommender.rating_matrix = load_sparse(arrays, 'ratings.matrix')
+            recommender.item_similarity = None
+            recommender.als_model = None
+            recommender.item_index = None
+            if 'item_similarity.data' in arrays:
+                recommender.item_similarity = load_sparse(arrays, 'item_similarity')
+            if 'als.user_factors' in arrays:
+                recommender.als_model = ALSModel(**recommender.als_options)
+                recommender.als_model.user_factors = arrays['als.user_factors']
+                recommender.als_model.item_factors = arrays['als.item_factors']
+                recommender.als_model.global_mean = metadata['als_global_mean']
+            if 'ann.centroids' in arrays:
+                recommender.item_index = IVFIndex(metric='ip', **recommender.ann_options)
+                recommender.item_index.vectors = recommender.als_model.item_factors
+                recommender.item_index.centroids = arrays['ann.centroids']
+                recommender.item_index.list_offsets = arrays['ann.list_offsets']
+                recommender.item_index.list_ids = arrays['ann.list_ids']
+            recommender._item_table = None
+            recommender._prepare_rating_updates()
+            return recommender
+        except Exception as e:
+            raise Exception(f"Failed to load MovieRecommender from '{path}': {str(e)}")
+
+    def _prepare_lookup_columns(self):
+        """Extract the columns used to assemble results into plain arrays."""
+        self._movie_ids = self.movies['movieId'].to_numpy()
+        self._titles = self.movies['title'].to_numpy(dtype=object)
+        self._genres = self.movies['genres'].to_numpy(dtype=object)
+        self._movie_rows = pd.Index(self._movie_ids)
+
+        # One bit per genre, so genre filters are a single vectorized AND
+        genre_lists = [genres.split('|') if genres else [] for genres in self._genres]
+        self.genre_names = sorted({genre for genres in genre_lists for genre in genres}
+                                  - {NO_GENRES})
+        self._genre_bits = {genre.lower(): bit for bit, genre in enumerate(self.genre_names)}
+        self.genre_masks = np.zeros(len(self._genres), dtype=np.uint64)
+        for row, genres in enumerate(genre_lists):
+            for genre in genres:
+                bit = self._genre_bits.get(genre.lower())
+                if bit is not None:
+                    self.genre_masks[row] |= np.uint64(1 << bit)
+
+        # Release year from the title, 0 when the title has none
+        years = pd.Series(self._titles, dtype=object).str.extract(YEAR_PATTERN)[0]
+        self.release_years = years.fillna(0).astype(np.int16).to_numpy()
+
+    def _format_recommendations(self, indices, scores, score_key):
+        """Build result dicts for movie row ``indices`` from the columnar arrays."""
+        with span('format'):
+            return [
+                {'movieId': movie_id, 'title': title, 'genres': genres, score_key: score}
+                for movie_id, title, genres, score in zip(
+                    self._movie_ids[indices].tolist(),
+                    self._titles[indices].tolist(),
+                    self._genres[indices].tolist(),
+                    np.asarray(scores, dtype=np.float64).tolist())
+            ]
+
+    def _prepare_title_index(self):
+        """Build the title lookup index, ranking equal matches by rating count."""
+        rating_counts = self.ratings['movieId'].value_counts()
+        popularity = rating_counts.reindex(self.movies['movieId'], fill_value=0)
+        self.title_index = TitleIndex(self._titles, popularity=popularity.to_numpy())
+
+    def _find_movie_index(self, movie_title):
+        """Return the movie row index of the best title match for ``movie_title``."""
+        with span('seed_lookup'):
+            idx = self.title_index.resolve(movie_title)
+        if idx is None:
+            raise ValueError(f"Movie '{movie_title}' not found in the database.")
+        return idx
+
+    def search_titles(self, query, limit=10):
+        """Search movie titles, returning ranked matches with a relevance score."""
+        matches = self.title_index.search(query, limit=limit)
+        rows = np.array([row for row, _ in matches], dtype=np.int64)
+        return self._format_recommendations(
+            rows, [score for _, score in matches], 'match_score')
+
+    def autocomplete(self, prefix, limit=10):
+        """Return titles starting with ``prefix`` (or with a word that does)."""
+        rows = self.title_index.autocomplete(prefix, limit=limit)
+        return self._titles[rows].tolist()
+
     def _prepare_content_based(self):
         """Prepare the content-based recommendation system."""
-        # Create a bag of words for genres
-        self.movies['genres'] = self.movies['genres'].fillna('')
-        vectorizer = CountVectorizer(tokenizer=lambda x: x.split('|'))
-        genre_matrix = vectorizer.fit_transform(self.movies['genres'])
-        self.content_similarity = cosine_similarity(genre_matrix, genre_matrix)
+        # Sparse, L2-normalized TF-IDF space over genres, tags, years and genome
+        tags = load_tags(self.tags_path) if self.tags_path else None
+        genome_scores = None
+        if self.genome_path:
+            genome_scores = load_genome_scores(
+                self.genome_path,
+                min_relevance=self.content_options.get('genome_min_relevance', 0.5))
+        self.content_features = build_content_features(
+            self.movies, tags=tags, genome_scores=genome_scores, **self.content_options)
+
+        # Keep only the top-k neighbors per movie instead of the dense N x N
+        # similarity matrix, so memory grows as N * k
+        if self.ann_options:
+            content_index = IVFIndex(metric='cosine', **self.ann_options)
+            self.content_neighbors, self.content_scores = content_index.fit(
+                self.content_features).neighbor_table(self.content_top_k)
+        else:
+            self.content_neighbors, self.content_scores = top_k_cosine_neighbors(
+                self.content_features, self.content_top_k)
 
     def _prepare_collaborative(self):
         """Prepare the collaborative filtering system."""
-        # Create user-movie matrix
-        self.user_movie_matrix = self.ratings.pivot(
-            index='userId', 
-            columns='movieId', 
-            values='rating'
-        ).fillna(0)
-        
-        # Compute user similarity
-        self.user_similarity = cosine_similarity(self.user_movie_matrix)
-        self.user_similarity_df = pd.DataFrame(
-            self.user_similarity,
-            index=self.user_movie_matrix.index,
-            columns=self.user_movie_matrix.index
+        # Contiguous user rows; item columns follow the movies table order
+        self.user_ids = np.unique(self.ratings['userId'].to_numpy())
+        self._user_rows = pd.Index(self.user_ids)
+        user_rows = self._user_rows.get_indexer(self.ratings['userId'])
+        item_rows = self._movie_rows.get_indexer(self.ratings['movieId'])
+        known = item_rows >= 0
+
+        # Sparse user-movie rating matrix, one stored value per rating
+        self.rating_matrix = sparse.csr_matrix(
+            (self.ratings['rating'].to_numpy(dtype=np.float32)[known],
+             (user_rows[known], item_rows[known])),
+            shape=(len(self.user_ids), len(self.movies)),
+            dtype=np.float32
         )
 
-    def content_based_recommendations(self, movie_title, num_recommendations=5):
-        """Get content-based recommendations based on movie genres."""
+        self._item_table = None
+        if self.collaborative_backend == 'als':
+            self.als_model = ALSModel(**self.als_options).fit(self.rating_matrix)
+            if self.ann_options:
+                self.item_index = IVFIndex(metric='ip', **self.ann_options).fit(
+                    self.als_model.item_factors)
+            return
+
+        # Item-item cosine neighbors over the rating columns. Row i of
+        # item_similarity holds s(j, i) for every movie j that has i among its
+        # top-k neighbors, so a user's rated rows gather all contributions.
+        neighbors, scores = top_k_cosine_neighbors(
+            self.rating_matrix.T, self.item_neighbors)
+        self._item_table = (neighbors, scores)
+        self.item_similarity = _neighbor_matrix(neighbors, scores)
+
+    def _collaborative_scores(self, user_row):
+        """Predict ratings for every movie for one rating-matrix row.
+
+        With the item-item backend each prediction is the similarity-weighted
+        average of the user's ratings on the movie's neighbors, shrunk toward
+        the user's mean rating (see ``_shrunk_average``) and computed with
+        two sparse mat-vec products; with ALS it is one product of the user's
+        factors with the item factors. Already-rated movies and movies with no
+        rated neighbor score -inf.
+        """
+        ratings = self._user_ratings(user_row)
+        if self.als_model is not None:
+            scores = self.als_model.score(user_row).astype(np.float64)
+            scores[ratings.indices] = -np.inf
+            return scores
+
+        weighted = (ratings @ self.item_similarity).toarray().ravel()
+        rated = ratings.copy()
+        rated.data[:] = 1
+        support = (rated @ self.item_similarity).toarray().ravel()
+
+        scores = _shrunk_average(weighted, support, self.shrinkage,
+                                 _mean_ratings(ratings)[0]).astype(np.float64)
+        scores[ratings.indices] = -np.inf
+        return scores
+
+    def _collaborative_top_k(self, user_row, k):
+        """Return ``(movie_rows, predicted_ratings)`` of a user's top k unseen movies."""
+        return self._collaborative_page(user_row, k)
+
+    def _collaborative_page(self, user_row, k, mask=None, after=None):
+        """Return ``(movie_rows, predicted_ratings)`` of one page of a user's unseen movies.
+
+        With an ANN index, unfiltered rankings cover only the movies in the
+        user's probed lists, on every page; filtered rankings, and every
+        ranking without an index, cover the whole catalog. Either way the
+        pages of one query cut a single ranking.
+        """
+        with span('scoring'):
+            if self.item_index is not None and mask is None:
+                rows = self._probed_rows(user_row)
+                scores = self.als_model.score(user_row, rows).astype(np.float64)
+                scores[np.isin(rows, self._user_ratings(user_row).indices)] = -np.inf
+            else:
+                scores = self._collaborative_scores(user_row)
+                rows = np.arange(len(scores))
+        with span('top_k'):
+            return _ranked_page(rows, scores, k, mask, after)
+
+    def _probed_rows(self, user_row):
+        """Movie rows in the ANN lists probed for a user, in ascending order."""
+        return np.sort(self.item_index.candidates(self.als_model.user_factors[user_row]))
+
+    def _user_ratings_block(self, user_rows):
+        """Return the current ratings of ``user_rows`` as one CSR matrix."""
+        user_rows = np.asarray(user_rows, dtype=np.int64)
+        if not self._delta_rows and (len(user_rows) == 0
+                                     or user_rows.max() < self.rating_matrix.shape[0]):
+            return self.rating_matrix[user_rows]
+        return sparse.vstack([self._user_ratings(row) for row in user_rows.tolist()],
+                             format='csr')
+
+    def _collaborative_top_k_block(self, user_rows, k, probed_only=False):
+        """Top-k unseen movies for a block of users, from blocked matrix products.
+
+        Returns ``(movie_rows, scores)`` arrays of shape (len(user_rows), k),
+        best first; slots without a prediction score -inf. Scores and order
+        are those of ``_collaborative_page`` over the whole catalog, even
+        when an ANN index is configured; with ``probed_only`` each user is
+        limited to their probed lists, as an unfiltered single-user page is.
+        """
+        with span('scoring'):
+            ratings = self._user_ratings_block(user_rows)
+            if self.als_model is not None:
+                scores = self.als_model.score_block(user_rows)
+                if probed_only and self.item_index is not None:
+                    probed = np.zeros(scores.shape, dtype=bool)
+                    for i, user_row in enumerate(user_rows):
+                        probed[i, self._probed_rows(user_row)] = True
+                    scores[~probed] = -np.inf
+            else:
+                weighted = (ratings @ self.item_similarity).toarray()
+                rated = ratings.copy()
+                rated.data[:] = 1
+                support = (rated @ self.item_similarity).toarray()
+                scores = _shrunk_average(weighted, support, self.shrinkage,
+                                         _mean_ratings(ratings)[:, None])
+
+            seen_rows = np.repeat(np.arange(len(user_rows)), np.diff(ratings.indptr))
+            scores[seen_rows, ratings.indices] = -np.inf
+        with span('top_k'):
+            return top_k_per_row(scores, min(k, scores.shape[1]))
+
+    def _cached_recommendations(self, algorithm, seed, k, compute):
+        """Serve a recommendation list from ``result_cache`` when one is attached.
+
+        Entries are keyed by the current ``model_version``, so they stop
+        matching once artifacts are reloaded or ratings are added.
+        """
+        if self.result_cache is None:
+            return compute()
+        return self.result_cache.get_or_compute(
+            algorithm, seed, k, self.model_version or 'live', compute)
+
+    def _content_page(self, idx, k, mask=None, after=None):
+        """Return ``(movie_rows, similarities)`` of one page of movie ``idx``'s neighbors.
+
+        Candidates are scored exactly against the seed's feature row. The
+        neighbor table holds every movie scoring above its weakest entry, so
+        when at least ``k`` entries clearly above it pass ``mask`` and rank
+        after ``after``, only those are scored; otherwise (narrow filters,
+        deep pages, ties running past the end of the table) the whole
+        catalog is.
+        """
+        seed = self.content_features[idx].toarray().ravel()
+        with span('candidates'):
+            neighbors = np.asarray(self.content_neighbors[idx])
+            table_scores = np.asarray(self.content_scores[idx])
+            complete = len(neighbors) >= len(self.movies) - 1
+            found = np.isfinite(table_scores)
+            if not complete and found.all():
+                found &= table_scores > table_scores[-1] + TABLE_SCORE_MARGIN
+            rows = neighbors[found].astype(np.int64)
+        with span('scoring'):
+            scores = self.content_features[rows] @ seed
+        with span('top_k'):
+            rows, scores = _ranked_page(rows, scores, k, mask, after)
+        if len(rows) >= k or complete:
+            return rows, scores
+
+        with span('scoring'):
+            scores = self.content_features @ seed
+            scores[idx] = -np.inf
+        with span('top_k'):
+            return _ranked_page(np.arange(len(scores)), scores, k, mask, after)
+
+    def content_based_recommendations(self, movie_title, num_recommendations=5, filters=None,
+                                      cursor=None):
+        """Get content-based recommendations based on movie genres.
+
+        ``filters`` restricts which movies are recommended (see
+        ``filter_mask``) and ``cursor`` (from ``pagination.next_cursor``)
+        continues after the last recommendation of an earlier page. Both are
+        applied inside the top-k selection, so a deep or narrowly filtered
+        page costs no more than scoring the catalog once.
+        """
         try:
-            # Find movies matching the title
-            matching_movies = self.movies[self.movies['title'].str.contains(
-                movie_title, case=False, na=False)]
-            
-            if matching_movies.empty:
-                raise ValueError(f"Movie '{movie_title}' not found in the database.")
-            
-            # Get the first matching movie
-            idx = matching_movies.index[0]
-            movie = matching_movies.iloc[0]
+            idx = self._find_movie_index(movie_title)
+            filter_key = self._filter_key(filters)
+            mask = self._filter_mask(filter_key)
+            after = self._cursor_position(cursor)
             
-            # Get similarity scores
-            sim_scores = list(enumerate(self.content_similarity[idx]))
-            sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
+            def compute():
+                rows, scores = self._content_page(idx, num_recommendations, mask, after)
+                return self._format_recommendations(rows, scores, 'similarity')
             
-            # Get recommendations
-            recommendations = []
-            for i in sim_scores[1:num_recommendations+1]:
-                movie_data = {
-                    'title': self.movies.iloc[i[0]]['title'],
-                    'genres': self.movies.iloc[i[0]]['genres'],
-                    'similarity': float(i[1])  # Convert numpy float to Python float
-                }
-                recommendations.append(movie_data)
-            
-            return recommendations
+            # Keyed by the resolved movie, so every spelling of a title shares an entry
+            seed = int(self._movie_ids[idx])
+            if filter_key is not None or after is not None:
+                seed = {'movie': seed, 'filters': filter_key, 'cursor': cursor}
+            return self._cached_recommendations('content', seed, num_recommendations, compute)
             
         except ValueError as e:
             raise e
         except Exception as e:
             raise Exception(f"Error getting content-based recommendations: {str(e)}")
 
-    def collaborative_recommendations(self, user_id, num_recommendations=5):
-        """Get collaborative filtering recommendations for a user."""
+    def content_based_recommendations_batch(self, movie_titles, num_recommendations=5):
+        """Get content-based recommendations for many seed titles in one call.
+
+        Each title gets the list (and cache entry) of
+        ``content_based_recommendations``: its neighbor row is rescored
+        exactly and the catalog is scanned when the row runs short. Repeated
+        titles are served once. Returns one recommendation list per title,
+        in the same order.
+        """
         try:
-            if user_id not in self.user_movie_matrix.index:
+            seeds = [self._find_movie_index(title) for title in movie_titles]
+            lists = {}
+            for idx in seeds:
+                if idx in lists:
+                    continue
+                # Bind this seed, not the loop variable's last value
+                def compute(idx=idx):
+                    rows, scores = self._content_page(idx, num_recommendations)
+                    return self._format_recommendations(rows, scores, 'similarity')
+                lists[idx] = self._cached_recommendations(
+                    'content', int(self._movie_ids[idx]), num_recommendations, compute)
+            return [lists[idx] for idx in seeds]
+
+        except ValueError as e:
+            raise e
+        except Exception as e:
+            raise Exception(f"Error getting content-based recommendations: {str(e)}")
+
+    def collaborative_recommendations(self, user_id, num_recommendations=5, filters=None,
+                                      cursor=None):
+        """Get collaborative filtering recommendations for a user.
+
+        ``filters`` and ``cursor`` work as in ``content_based_recommendations``.
+        With an ANN index, unfiltered pages rank the movies in the user's
+        probed lists and filtered pages rank the whole catalog.
+        """
+        try:
+            if user_id not in self._user_rows:
                 raise ValueError(f"User {user_id} not found in the database.")
+            filter_key = self._filter_key(filters)
+            mask = self._filter_mask(filter_key)
+            after = self._cursor_position(cursor)
 
-            # Get user's similarity scores and weighted ratings
-            user_scores = self.user_similarity_df[user_id]
-            weighted_ratings = (user_scores.dot(self.user_movie_matrix) / 
-                              user_scores.sum())
-            
-            # Exclude movies the user has already rated
-            user_seen = self.user_movie_matrix.loc[user_id] > 0
-            recommendations = weighted_ratings[~user_seen].sort_values(
-                ascending=False).head(num_recommendations)
-            
-            # Format recommendations
-            rec_list = []
-            for movie_id, pred_rating in recommendations.items():
-                movie_info = self.movies[self.movies['movieId'] == movie_id].iloc[0]
-                rec_list.append({
-                    'title': movie_info['title'],
-                    'genres': movie_info['genres'],
-                    'predicted_rating': float(pred_rating)  # Convert numpy float to Python float
-                })
+            def compute():
+                # Predicted ratings for the user's top unseen movies
+                top, scores = self._collaborative_page(
+                    self._user_rows.get_loc(user_id), num_recommendations, mask, after)
+                return self._format_recommendations(top, scores, 'predicted_rating')
             
-            return rec_list
+            seed = int(user_id)
+            if filter_key is not None or after is not None:
+                seed = {'user': seed, 'filters': filter_key, 'cursor': cursor}
+            return self._cached_recommendations(
+                f'collaborative:{self.collaborative_backend}', seed,
+                num_recommendations, compute)
             
         except ValueError as e:
             raise e
         except Exception as e:
             raise Exception(f"Error getting collaborative recommendations: {str(e)}")
 
-    def get_top_rated_movies(self, min_reviews=100):
-        """Get top-rated movies with a minimum number of reviews."""
+    def collaborative_recommendations_batch(self, user_ids, num_recommendations=5):
+        """Get collaborative recommendations for many users in one call.
+
+        Users are scored together with one matrix product per block instead
+        of one product per user, and get the same lists (and cache entries)
+        as ``collaborative_recommendations``. With a ``result_cache``
+        attached, cached lists are reused and only the other users are
+        scored. Returns one recommendation list per user id, in the same
+        order.
+        """
         try:
-            # Calculate average ratings and number of ratings per movie
-            movie_stats = self.ratings.groupby('movieId').agg({
-                'rating': ['count', 'mean']
-            }).reset_index()
-            
-            movie_stats.columns = ['movieId', 'rating_count', 'rating_mean']
-            
-            # Filter movies with minimum number of reviews
-            qualified = movie_stats[movie_stats['rating_count'] >= min_reviews]
-            
-            # Merge with movie information
-            top_movies = qualified.merge(self.movies, on='movieId')
-            top_movies = top_movies.sort_values('rating_mean', ascending=False)
+            user_rows = self._user_rows.get_indexer(user_ids)
+            if (user_rows < 0).any():
+                missing = np.asarray(user_ids)[user_rows < 0][0]
+                raise ValueError(f"User {missing} not found in the database.")
+
+            algorithm = f'collaborative:{self.collaborative_backend}'
+            version = self.model_version or 'live'
+            results = [None] * len(user_rows)
+            if self.result_cache is not None:
+                results = [self.result_cache.get(algorithm, int(user_id), num_recommendations,
+                                                 version) for user_id in user_ids]
+            pending = [i for i, result in enumerate(results) if result is None]
+            if not pending:
+                return results
+
+            top, scores = self._collaborative_top_k_block(user_rows[pending], num_recommendations,
+                                                          probed_only=True)
+            for i, row_top, row_scores in zip(pending, top, scores):
+                results[i] = self._format_recommendations(row_top[np.isfinite(row_scores)],
+                                                          row_scores[np.isfinite(row_scores)],
+                                                          'predicted_rating')
+                if self.result_cache is not None:
+                    self.result_cache.set(algorithm, int(user_ids[i]), num_recommendations,
+                                          version, results[i])
+            return results
+
+        except ValueError as e:
+            raise e
+        except Exception as e:
+            raise Exception(f"Error getting collaborative recommendations: {str(e)}")
+
+    def hybrid_recommendations(self, user_id=None, seed_titles=None, weights=None,
+                               num_recommendations=5, max_candidates=2000):
+        """Get recommendations that blend content, collaborative and popularity signals.
+
+        The content signal is a movie's best cosine similarity to the
+        ``seed_titles`` and the user's liked movies in the content feature
+        space (genres, release years and, when loaded, tags and the tag
+        genome; see ``build_content_features``), the collaborative signal
+        is the user's predicted rating and the popularity prior is the log of
+        the movie's rating count. Each signal is scaled to [0, 1] and mixed
+        with ``weights`` (keys from ``HYBRID_WEIGHTS``; missing keys keep
+        their defaults). A signal that does not apply, such as collaborative
+        scores for an unknown user, drops out and the other weights are
+        rescaled, so cold-start users and obscure seeds still get results.
+
+        Only a pre-filtered candidate pool is scored, in one vectorized pass:
+        the profile movies' content neighbors, the user's top
+        ``max_candidates // 2`` predictions and the ``max_candidates // 4``
+        most popular movies. Seeds and already-rated movies are excluded.
+        """
+        try:
+            weights = self._hybrid_weights(weights)
+            seeds = np.array([self._find_movie_index(title) for title in seed_titles or []],
+                             dtype=np.int64)
+            if user_id is None and len(seeds) == 0:
+                raise ValueError("Provide a user id, seed titles or both.")
+            user_row = (self._user_rows.get_loc(user_id)
+                        if user_id is not None and user_id in self._user_rows else None)
+
+            def compute():
+                candidates, scores = self._hybrid_scores(user_row, seeds, weights, max_candidates)
+                with span('top_k'):
+                    top = top_k_indices(scores, num_recommendations)
+                return self._format_recommendations(candidates[top], scores[top], 'hybrid_score')
+
+            seed = {
+                'user': None if user_row is None else int(self.user_ids[user_row]),
+                'seeds': sorted(self._movie_ids[seeds].tolist()),
+                'weights': [weights[name] for name in HYBRID_WEIGHTS],
+            }
+            return self._cached_recommendations(
+                f'hybrid:{self.collaborative_backend}', seed, num_recommendations, compute)
+
+        except ValueError as e:
+            raise e
+        except Exception as e:
+            raise Exception(f"Error getting hybrid recommendations: {str(e)}")
+
+    @staticmethod
+    def _hybrid_weights(weights):
+        """Merge ``weights`` over ``HYBRID_WEIGHTS`` and validate them."""
+        unknown = set(weights or {}) - set(HYBRID_WEIGHTS)
+        if unknown:
+            raise ValueError(f"Unknown hybrid weight '{sorted(unknown)[0]}'. Choose from: "
+                             f"{', '.join(HYBRID_WEIGHTS)}")
+        merged = {name: float((weights or {}).get(name, default))
+                  for name, default in HYBRID_WEIGHTS.items()}
+        if any(not np.isfinite(value) or value < 0 for value in merged.values()) \
+                or sum(merged.values()) <= 0:
+            raise ValueError("Hybrid weights must be non-negative and not all zero.")
+        return merged
+
+    def _hybrid_scores(self, user_row, seeds, weights, max_candidates):
+        """Return ``(candidate_rows, blended_scores)`` for ``hybrid_recommendations``."""
+        ratings = self._user_ratings(user_row) if user_row is not None else None
+        rated = ratings.indices if ratings is not None else np.empty(0, dtype=np.int64)
+        liked = np.empty(0, dtype=np.int64)
+        if ratings is not None:
+            liked_rows = ratings.data >= LIKED_RATING
+            order = np.argsort(-ratings.data[liked_rows], kind='stable')[:MAX_PROFILE_MOVIES]
+            liked = ratings.indices[liked_rows][order]
+        profile = np.union1d(seeds, liked).astype(np.int64)
+        use_content = weights['content'] > 0 and len(profile) > 0
+        use_collaborative = weights['collaborative'] > 0 and len(rated) > 0
+
+        # Candidate pool: content neighbors, collaborative head, popularity head
+        with span('candidates'):
+            pools = [self._leaderboard_rows(POPULAR_MIN_REVIEWS, 0, True)[:max_candidates // 4]]
+            if use_content:
+                neighbors = self.content_neighbors[profile]
+                pools.append(neighbors[np.isfinite(self.content_scores[profile])])
+            if use_collaborative:
+                pools.append(self._collaborative_top_k(user_row, max_candidates // 2)[0])
+            candidates = np.unique(np.concatenate(pools).astype(np.int64))
+            candidates = candidates[~np.isin(candidates, np.concatenate([seeds, rated]))]
+
+        with span('scoring'):
+            counts = self.rating_counts[candidates]
+            signals = {'popularity': np.log1p(counts)
+                       / np.log1p(max(self.rating_counts.max(), 1))}
+            if use_content:
+                similarity = (normalize(self.content_features[candidates])
+                              @ normalize(self.content_features[profile]).T)
+                signals['content'] = similarity.max(axis=1).toarray().ravel()
+            if use_collaborative:
+                signals['collaborative'] = _unit_scale(
+                    self._collaborative_candidate_scores(user_row, ratings, candidates))
+
+        total = sum(weights[name] for name in signals)
+        if total <= 0:
+            # Only zero-weighted signals apply: rank by popularity alone
+            return candidates, signals['popularity']
+        scores = np.zeros(len(candidates))
+        for name, values in signals.items():
+            scores += (weights[name] / total) * values
+        return candidates, scores
+
+    def _collaborative_candidate_scores(self, user_row, ratings, candidates):
+        """Predict ratings for the ``candidates`` movie rows only; -inf without support."""
+        if self.als_model is not None:
+            scores = self.als_model.item_factors[candidates] @ self.als_model.user_factors[user_row]
+            return scores.astype(np.float64) + self.als_model.global_mean
+
+        # Similarities from the user's rated movies to each candidate
+        similarity = self.item_similarity[ratings.indices][:, candidates]
+        weighted = similarity.T @ ratings.data.astype(np.float64)
+        support = np.asarray(similarity.sum(axis=0), dtype=np.float64).ravel()
+        return _shrunk_average(weighted, support, self.shrinkage, _mean_ratings(ratings)[0])
+
+    def _prepare_rating_updates(self):
+        """Set up the state that lets ratings be added without a rebuild.
+
+        New ratings live as whole replacement rows in ``_delta_rows`` (user
+        row -> 1 x movies CSR) on top of ``rating_matrix``, which may be a
+        read-only memory map, until ``compact_ratings`` folds them in.
+        Per-movie rating counts and sums are kept current alongside.
+        """
+        self._update_lock = threading.RLock()
+        self._delta_rows = {}
+        self.revision = 0
+        n_movies = len(self.movies)
+        indices = self.rating_matrix.indices
+        values = np.asarray(self.rating_matrix.data, dtype=np.float64)
+        self.rating_counts = np.bincount(indices, minlength=n_movies).astype(np.int64)
+        self.rating_sums = np.bincount(indices, weights=values, minlength=n_movies)
+        self._rating_square_sums = np.bincount(indices, weights=values ** 2, minlength=n_movies)
+        self._leaderboards = {}
+        self._filter_masks = {}
+
+    def _user_ratings(self, user_row):
+        """Return one user's current ratings as a 1 x movies CSR row."""
+        ratings = self._delta_rows.get(user_row)
+        if ratings is not None:
+            return ratings
+        if user_row >= self.rating_matrix.shape[0]:
+            return sparse.csr_matrix((1, len(self.movies)), dtype=np.float32)
+        return self.rating_matrix[user_row]
+
+    def _live_rating_matrix(self):
+        """Return ``rating_matrix`` with every pending rating update applied."""
+        with self._update_lock:
+            delta_rows = dict(self._delta_rows)
+            n_users = len(self.user_ids)
+            base = self.rating_matrix
+        return _apply_delta_rows(base, delta_rows, n_users)
+
+    def add_ratings(self, batch):
+        """Add or update ratings without rebuilding the model.
+
+        ``batch`` is a DataFrame with userId, movieId and rating columns, or
+        an iterable of ``(userId, movieId, rating)`` tuples; the last entry
+        wins when a user rates a movie twice. Unknown users are added and
+        ratings for movies outside the catalog are ignored.
+
+        The cost follows the batch, not the dataset: only the touched users'
+        rows are rewritten, the ALS backend folds those users in again
+        against the fixed item factors, and the item-item backend refreshes
+        the neighbors of the rated movies. Each call bumps ``revision`` and
+        ``model_version``.
+
+        Returns counts of ``added``, ``updated`` and ``ignored`` ratings and
+        of ``new_users``.
+        """
+        try:
+            if not isinstance(batch, pd.DataFrame):
+                batch = pd.DataFrame(list(batch), columns=['userId', 'movieId', 'rating'])
+            user_ids = batch['userId'].to_numpy(dtype=np.int64)
+            items = self._movie_rows.get_indexer(batch['movieId'])
+            values = batch['rating'].to_numpy(dtype=np.float32)
+            # Zero would read as "not rated" in the sparse matrix
+            if not np.all(values > 0):
+                raise ValueError("Ratings must be positive numbers.")
+
+            known = items >= 0
+            ignored = int(np.count_nonzero(~known))
+            user_ids, items, values = user_ids[known], items[known], values[known]
+            if len(items) == 0:
+                return {'added': 0, 'updated': 0, 'ignored': ignored, 'new_users': 0}
+
+            with self._update_lock:
+                # Unseen users get rows after the existing ones
+                rows = self._user_rows.get_indexer(user_ids)
+                new_users = np.unique(user_ids[rows < 0])
+                if len(new_users):
+                    self.user_ids = np.concatenate(
+                        (self.user_ids, new_users.astype(self.user_ids.dtype)))
+                    self._user_rows = pd.Index(self.user_ids)
+                    rows = self._user_rows.get_indexer(user_ids)
+
+                # Keep the last rating per (user, movie) pair
+                keys = rows.astype(np.int64) * len(self.movies) + items
+                _, last = np.unique(keys[::-1], return_index=True)
+                last = len(keys) - 1 - last
+                rows, items, values = rows[last], items[last], values[last]
+
+                # Rewrite the touched users' rows: old ratings with the batch applied
+                touched = np.unique(rows)
+                local = np.searchsorted(touched, rows)
+                old_rows = sparse.vstack([self._user_ratings(row) for row in touched.tolist()],
+                                         format='csr')
+                old_values = np.asarray(old_rows[local, items], dtype=np.float32).ravel()
+                present = old_values > 0
+                new_rows = (old_rows
+                            - sparse.csr_matrix((old_values, (local, items)), shape=old_rows.shape)
+                            + sparse.csr_matrix((values, (local, items)), shape=old_rows.shape)
+                            ).tocsr()
+                new_rows.eliminate_zeros()
+                for i, row in enumerate(touched.tolist()):
+                    self._delta_rows[row] = new_rows[i]
+
+                n_movies = len(self.movies)
+                old_values = old_values.astype(np.float64)
+                self.rating_counts += np.bincount(items[~present], minlength=n_movies)
+                self.rating_sums += np.bincount(items, weights=values - old_values,
+                                                minlength=n_movies)
+                self._rating_square_sums += np.bincount(
+                    items, weights=values.astype(np.float64) ** 2 - old_values ** 2,
+                    minlength=n_movies)
+                # Masks with a minimum rating count depend on the counts
+                self._filter_masks = {}
+
+                if self.als_model is not None:
+                    self._fold_in_users(touched, new_rows)
+                if self.item_similarity is not None:
+                    self._update_item_neighbors(np.unique(items))
+
+                self._ratings = None
+                self.revision += 1
+                base_version = (self.model_version or 'live').split('+')[0]
+                self.model_version = f"{base_version}+{self.revision}"
+
+            return {
+                'added': int(np.count_nonzero(~present)),
+                'updated': int(np.count_nonzero(present)),
+                'ignored': ignored,
+                'new_users': len(new_users),
+            }
+
+        except ValueError as e:
+            raise e
+        except Exception as e:
+            raise Exception(f"Error adding ratings: {str(e)}")
+
+    def _fold_in_users(self, user_rows, rating_rows):
+        """Re-solve the ALS factors of ``user_rows`` from their current ratings."""
+        factors = self.als_model.user_factors
+        if len(factors) < len(self.user_ids):
+            padding = np.zeros((len(self.user_ids) - len(factors), factors.shape[1]),
+                               dtype=np.float32)
+            factors = np.vstack((factors, padding))
+        elif not factors.flags.writeable:
+            # Memory-mapped factors are read-only; update a private copy
+            factors = np.array(factors)
+        factors[user_rows] = self.als_model.recalculate_rows(
+            rating_rows, current=factors[user_rows])
+        self.als_model.user_factors = factors
+
+    def _item_neighbor_table(self):
+        """Return the writable ``(neighbors, scores)`` table behind ``item_similarity``.
+
+        Models loaded from artifacts only store the sparse matrix, so the
+        table is rebuilt from its columns on first use.
+        """
+        if self._item_table is None:
+            by_target = sparse.csc_matrix(self.item_similarity)
+            n = by_target.shape[0]
+            counts = np.diff(by_target.indptr)
+            k = min(max(self.item_neighbors, int(counts.max(initial=0))), max(n - 1, 0))
+            columns = np.repeat(np.arange(n), counts)
+            order = np.lexsort((-by_target.data, columns))
+            rank = np.arange(by_target.nnz) - np.repeat(by_target.indptr[:-1], counts)
+
+            neighbors = np.repeat(np.arange(n, dtype=np.int32)[:, None], k, axis=1)
+            scores = np.zeros((n, k), dtype=np.float32)
+            neighbors[columns, rank] = by_target.indices[order]
+            scores[columns, rank] = by_target.data[order]
+            self._item_table = (neighbors, scores)
+        return self._item_table
+
+    def _update_item_neighbors(self, changed, max_block_elements=2 ** 25):
+        """Refresh item-item neighbors after the ratings of ``changed`` movies moved.
+
+        Only similarities that involve a changed movie can differ, so the
+        changed movies' live rating columns are multiplied against the live
+        rating matrix; the cost follows the ratings of the users who rated
+        them. Their own neighbor lists are recomputed exactly. Every other
+        list gets its score for a changed movie updated, or the movie
+        inserted when it now beats the list's weakest entry; movies that fall
+        out of a list are only backfilled by the next full rebuild.
+        """
+        neighbors, scores = self._item_neighbor_table()
+        n_movies, k = neighbors.shape
+        if k == 0:
+            return
+        norms = np.sqrt(np.maximum(self._rating_square_sums, 0)).astype(np.float32)
+        is_changed = np.zeros(n_movies, dtype=bool)
+        is_changed[changed] = True
+
+        # Live ratings = base rows not overridden + pending delta rows
+        base = self.rating_matrix
+        delta_users = np.fromiter(self._delta_rows, dtype=np.int64, count=len(self._delta_rows))
+        delta = sparse.vstack([self._delta_rows[row] for row in delta_users.tolist()],
+                              format='csr')
+        keep = np.ones(base.shape[0], dtype=np.float32)
+        keep[delta_users[delta_users < base.shape[0]]] = 0
+        keep = sparse.diags(keep)
+
+        block_size = block_rows(max_block_elements, n_movies)
+        for start in range(0, len(changed), block_size):
+            block = changed[start:start + block_size]
+            gram = (keep @ base[:, block]).T @ base + delta[:, block].T @ delta
+            similarity = np.asarray(gram.toarray(), dtype=np.float32)
+            denominator = norms[block][:, None] * norms[None, :]
+            np.divide(similarity, denominator, out=similarity, where=denominator > 0)
+            similarity[np.arange(len(block)), block] = -np.inf
+
+            neighbors[block], scores[block] = top_k_per_row(similarity, k)
+            for movie, movie_similarity in zip(block.tolist(), similarity):
+                self._patch_neighbor_lists(movie, movie_similarity, is_changed)
+
+        self.item_similarity = _neighbor_matrix(neighbors, scores)
+
+    def _patch_neighbor_lists(self, movie, similarity, is_changed):
+        """Apply ``movie``'s new similarities to the neighbor lists of unchanged movies."""
+        neighbors, scores = self._item_table
+        k = neighbors.shape[1]
+        weakest = np.maximum(scores[:, -1], 0)
+        # Lists that beat their weakest entry, plus lists that already hold the movie
+        matrix = self.item_similarity
+        holders = matrix.indices[matrix.indptr[movie]:matrix.indptr[movie + 1]]
+        rows = np.union1d(np.flatnonzero(similarity > weakest), holders)
+        rows = rows[~is_changed[rows]]
+        if len(rows) == 0:
+            return
+
+        slots = (neighbors[rows] == movie) & (scores[rows] > 0)
+        held = slots.any(axis=1)
+        update = held | (similarity[rows] > weakest[rows])
+        rows = rows[update]
+        position = np.where(held, slots.argmax(axis=1), k - 1)[update]
+        neighbors[rows, position] = movie
+        scores[rows, position] = similarity[rows]
+
+        order = np.argsort(-scores[rows], axis=1, kind='stable')
+        neighbors[rows] = np.take_along_axis(neighbors[rows], order, axis=1)
+        scores[rows] = np.take_along_axis(scores[rows], order, axis=1)
+
+    def compact_ratings(self):
+        """Fold pending rating updates into ``rating_matrix``.
+
+        The merged matrix is built outside the update lock, so ratings keep
+        flowing meanwhile; rows updated again during the merge stay pending.
+        Returns the number of user rows folded in.
+        """
+        with self._update_lock:
+            delta_rows = dict(self._delta_rows)
+            n_users = len(self.user_ids)
+            base = self.rating_matrix
+        if not delta_rows and n_users == base.shape[0]:
+            return 0
+
+        merged = _apply_delta_rows(base, delta_rows, n_users)
+        with self._update_lock:
+            self.rating_matrix = merged
+            for row, ratings in delta_rows.items():
+                if self._delta_rows.get(row) is ratings:
+                    del self._delta_rows[row]
+        return len(delta_rows)
+
+    @property
+    def pending_rating_rows(self):
+        """Number of user rows waiting for ``compact_ratings``."""
+        return len(self._delta_rows)
+
+    def has_movie(self, movie_id):
+        """Whether ``movie_id`` is in the catalog (``add_ratings`` ignores other movies)."""
+        return movie_id in self._movie_rows
+
+    def genre_mask(self, genre):
+        """Return the bitmask for a genre name (case-insensitive)."""
+        bit = self._genre_bits.get(str(genre).strip().lower())
+        if bit is None:
+            raise ValueError(f"Unknown genre '{genre}'. Choose one of: "
+                             f"{', '.join(self.genre_names)}")
+        return np.uint64(1 << bit)
+
+    def filter_mask(self, filters):
+        """Return the boolean movie mask for ``filters``, or None if nothing is filtered.
+
+        ``filters`` is a dict with any of:
+
+        - ``genres``: genre names (or a bitmask from ``genre_mask``); movies
+          need at least one of them
+        - ``year_range``: ``(first, last)`` release years, inclusive, either
+          of them None for an open end; movies without a year in the title
+          are left out
+        - ``exclude_ids``: movieIds to leave out
+        - ``min_ratings``: minimum number of ratings
+        """
+        return self._filter_mask(self._filter_key(filters))
+
+    def _filter_key(self, filters):
+        """Validate ``filters`` into a JSON-friendly tuple; None if nothing is filtered.
+
+        Raises ValueError for anything malformed, so callers can report it
+        as a client error.
+        """
+        if not filters:
+            return None
+        if not isinstance(filters, dict):
+            raise ValueError("Filters must be a dict of filter names to values.")
+        unknown = sorted(set(filters) - set(FILTER_NAMES), key=str)
+        if unknown:
+            raise ValueError(f"Unknown filter '{unknown[0]}'. Choose from: "
+                             f"{', '.join(FILTER_NAMES)}")
+
+        genres = filters.get('genres')
+        if _is_integer(genres):
+            genre_mask = int(genres)
+            every_genre = (1 << len(self.genre_names)) - 1
+            if genre_mask < 0 or genre_mask & ~every_genre:
+                raise ValueError("The genre bitmask has bits for unknown genres.")
+        else:
+            genre_mask = 0
+            for genre in _filter_values(genres, 'genres'):
+                genre_mask |= int(self.genre_mask(genre))
+
+        year_range = filters.get('year_range')
+        if year_range is None:
+            year_range = (None, None)
+        if not isinstance(year_range, (list, tuple, np.ndarray)) or len(year_range) != 2:
+            raise ValueError("year_range must be a (first, last) pair of years.")
+        first, last = (None if year is None else _filter_int(year, 'year_range')
+                       for year in year_range)
+        if first is not None and last is not None and first > last:
+            raise ValueError("The year range must not end before it starts.")
+
+        exclude_ids = sorted({_filter_int(movie_id, 'exclude_ids')
+                              for movie_id in _filter_values(filters.get('exclude_ids'),
+                                                             'exclude_ids')})
+        min_ratings = filters.get('min_ratings')
+        min_ratings = 0 if min_ratings is None else _filter_int(min_ratings, 'min_ratings')
+        if not (genre_mask or first is not None or last is not None or exclude_ids
+                or min_ratings > 0):
+            return None
+        return genre_mask, first, last, min_ratings, exclude_ids
+
+    def _filter_mask(self, key):
+        """Boolean movie mask for a key from ``_filter_key``.
+
+        The genre, year and rating-count part is one vectorized pass over
+        the precomputed genre bitmasks, release years and rating counts,
+        kept per combination; exclusions are applied to a copy.
+        """
+        if key is None:
+            return None
+        genre_mask, first, last, min_ratings, exclude_ids = key
+        base_key = (genre_mask, first, last, min_ratings)
+        # Held while building too, so a mask never outlives the counts it used
+        with self._update_lock:
+            mask = self._filter_masks.get(base_key)
+            if mask is None:
+                mask = np.ones(len(self.movies), dtype=bool)
+                if genre_mask:
+                    mask &= (self.genre_masks & np.uint64(genre_mask)) != 0
+                if first is not None:
+                    mask &= self.release_years >= first
+                if last is not None:
+                    mask &= (self.release_years <= last) & (self.release_years > 0)
+                if min_ratings > 0:
+                    mask &= self.rating_counts >= min_ratings
+                if len(self._filter_masks) >= FILTER_MASK_CACHE_SIZE:
+                    self._filter_masks.pop(next(iter(self._filter_masks)), None)
+                self._filter_masks[base_key] = mask
+        if exclude_ids:
+            rows = self._movie_rows.get_indexer(exclude_ids)
+            mask = mask.copy()
+            mask[rows[rows >= 0]] = False
+        return mask
+
+    def _cursor_position(self, cursor):
+        """Return the ``(score, movie_row)`` position of a page cursor, or None."""
+        if not cursor:
+            return None
+        score, movie_id = decode_cursor(cursor)
+        row = self._movie_rows.get_indexer([movie_id])[0]
+        if row < 0:
+            raise ValueError("Invalid pagination cursor.")
+        return score, int(row)
+
+    def _leaderboard_scores(self, rows, min_reviews, bayesian):
+        """Mean rating of ``rows``, or its Bayesian average when ``bayesian``.
+
+        The Bayesian average pulls each mean toward the global mean as if
+        every movie had ``min_reviews`` extra ratings at that mean, so movies
+        with few ratings cannot top the board on a handful of votes.
+        """
+        counts = self.rating_counts[rows]
+        sums = self.rating_sums[rows]
+        if not bayesian:
+            return np.divide(sums, counts, out=np.zeros(len(rows)), where=counts > 0)
+        prior_weight = max(min_reviews, 1)
+        total = self.rating_counts.sum()
+        global_mean = self.rating_sums.sum() / total if total else 0.0
+        return (sums + prior_weight * global_mean) / (counts + prior_weight)
+
+    def _rank_leaderboard(self, min_reviews, genre_mask, bayesian):
+        """Return qualifying movie rows sorted by descending score."""
+        qualified = self.rating_counts >= max(min_reviews, 1)
+        if genre_mask:
+            qualified &= (self.genre_masks & genre_mask) != 0
+        rows = np.flatnonzero(qualified)
+        scores = self._leaderboard_scores(rows, min_reviews, bayesian)
+        return rows[np.argsort(-scores, kind='stable')]
+
+    def _leaderboard_rows(self, min_reviews, genre_mask, bayesian):
+        """Return the ranked rows of a leaderboard, ranking it on first use.
+
+        Boards remember the ``revision`` they were ranked at; adding ratings
+        leaves them stale and the next read ranks them again, so ingest
+        costs nothing per cached board.
+        """
+        key = (int(min_reviews), int(genre_mask), bool(bayesian))
+        # Request threads share the cache and the aggregates with add_ratings
+        with self._update_lock:
+            revision, rows = self._leaderboards.get(key, (None, None))
+            if revision != self.revision:
+                rows = self._rank_leaderboard(*key)
+                if (key not in self._leaderboards
+                        and len(self._leaderboards) >= LEADERBOARD_CACHE_SIZE):
+                    self._leaderboards.pop(next(iter(self._leaderboards)))
+                self._leaderboards[key] = (self.revision, rows)
+        return rows
+
+    def get_top_rated_movies(self, min_reviews=100, limit=None, genre=None, bayesian=False):
+        """Get top-rated movies with a minimum number of reviews.
+
+        ``genre`` restricts the board to one genre, ``limit`` caps its length
+        and ``bayesian`` ranks by Bayesian average instead of the raw mean.
+        Each leaderboard is ranked once and again on the first call after
+        ratings are added, so other calls only slice the first ``limit`` rows.
+        """
+        try:
+            genre_mask = int(self.genre_mask(genre)) if genre else 0
+            rows = self._leaderboard_rows(min_reviews, genre_mask, bayesian)
+            if limit is not None:
+                rows = rows[:limit]
             
-            return top_movies[['title', 'genres', 'rating_count', 'rating_mean']]
+            counts = self.rating_counts[rows]
+            top_movies = pd.DataFrame({
+                'movieId': self._movie_ids[rows],
+                'title': self._titles[rows],
+                'genres': self._genres[rows],
+                'rating_count': counts,
+                'rating_mean': self.rating_sums[rows] / np.maximum(counts, 1),
+            })
+            if bayesian:
+                top_movies['bayesian_rating'] = self._leaderboard_scores(rows, min_reviews, True)
+            return top_movies
             
+        except ValueError as e:
+            raise e
         except Exception as e:
             raise Exception(f"Error getting top rated movies: {str(e)}")
 
     def visualize_ratings_distribution(self):
         """Visualize the distribution of movie ratings."""
         try:
+            # Plotting libraries are slow to import and only needed here
+            import matplotlib.pyplot as plt
+            import seaborn as sns
+
             plt.figure(figsize=(10, 6))
             sns.histplot(data=self.ratings, x='rating', bins=10)
             plt.title('Distribution of Movie Ratings')
@@ -145,6 +1210,111 @@ class MovieRecommender:
         except Exception as e:
             raise Exception(f"Error visualizing ratings distribution: {str(e)}")
 
+def _unit_scale(values):
+    """Min-max scale finite ``values`` to [0, 1]; non-finite values become 0."""
+    scaled = np.zeros(len(values))
+    finite = np.isfinite(values)
+    if finite.any():
+        low, high = values[finite].min(), values[finite].max()
+        scaled[finite] = (values[finite] - low) / (high - low) if high > low else 1.0
+    return scaled
+
+def _mean_ratings(ratings):
+    """Mean stored rating of each row of a CSR ratings matrix, float32; 0 for empty rows."""
+    counts = np.diff(ratings.indptr)
+    sums = np.bincount(np.repeat(np.arange(len(counts)), counts), weights=ratings.data,
+                       minlength=len(counts))
+    means = np.divide(sums, counts, out=np.zeros(len(counts)), where=counts > 0)
+    return means.astype(np.float32)
+
+def _shrunk_average(weighted, support, shrinkage, baseline):
+    """Similarity-weighted average rating ``weighted / support``, shrunk toward ``baseline``.
+
+    ``shrinkage`` counts as that much extra similarity on a rating of
+    ``baseline``, so a prediction backed by few similar movies stays near
+    the user's own mean instead of sinking toward 0. Entries without support
+    are -inf.
+    """
+    scores = np.full(np.shape(weighted), -np.inf, dtype=np.result_type(weighted, baseline))
+    np.divide(weighted + shrinkage * baseline, support + shrinkage, out=scores,
+              where=support > 0)
+    return scores
+
+def _ranked_page(rows, scores, k, mask=None, after=None):
+    """Return the ``k`` best ``(rows, scores)`` that pass ``mask`` and rank after ``after``.
+
+    The ranking is by descending score, then ascending row; ``after`` is a
+    ``(score, row)`` position in it, whose own row never qualifies again.
+    Non-finite scores never qualify.
+    """
+    keep = np.isfinite(scores)
+    if mask is not None:
+        keep &= mask[rows]
+    if after is not None:
+        score, row = after
+        keep &= ((scores < score) | ((scores == score) & (rows > row))) & (rows != row)
+    return top_k_rows(rows[keep], scores[keep], k)
+
+def _is_integer(value):
+    return isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_))
+
+def _filter_int(value, name):
+    """Parse one integer filter value (an int, integral float or numeric string)."""
+    try:
+        if isinstance(value, str):
+            value = int(value.strip())
+        elif isinstance(value, (float, np.floating)) and float(value).is_integer():
+            value = int(value)
+    except ValueError:
+        pass
+    if not _is_integer(value) or not -2 ** 63 <= value < 2 ** 63:
+        raise ValueError(f"{name} must hold integers, got {value!r}.")
+    return int(value)
+
+def _filter_values(values, name):
+    """A filter's values as a list: None is empty and a single value is a list of one."""
+    if values is None:
+        return []
+    if isinstance(values, (str, int, float, np.integer, np.floating)):
+        return [values]
+    if isinstance(values, (list, tuple, set, frozenset, np.ndarray, pd.Index, pd.Series)):
+        return list(values)
+    raise ValueError(f"{name} must be a value or a list of values.")
+
+def _neighbor_matrix(neighbors, scores):
+    """Sparse movies x movies matrix whose column i holds movie i's neighbor scores.
+
+    Row j then lists every movie that has j among its neighbors, so a user's
+    rated rows gather all contributions. Non-positive scores are dropped.
+    """
+    keep = scores > 0
+    indptr = np.concatenate(([0], np.cumsum(keep.sum(axis=1))))
+    by_target = sparse.csc_matrix((scores[keep], neighbors[keep], indptr),
+                                  shape=(len(neighbors), len(neighbors)), dtype=np.float32)
+    return by_target.tocsr()
+
+
+def _apply_delta_rows(base, delta_rows, n_users):
+    """Return ``base`` grown to ``n_users`` rows with ``delta_rows`` replacing whole rows."""
+    base = sparse.csr_matrix(base)
+    if n_users > base.shape[0]:
+        padding = sparse.csr_matrix((n_users - base.shape[0], base.shape[1]), dtype=base.dtype)
+        base = sparse.vstack((base, padding), format='csr')
+    if not delta_rows:
+        return base
+
+    rows = np.fromiter(delta_rows, dtype=np.int64, count=len(delta_rows))
+    keep = np.ones(n_users, dtype=base.dtype)
+    keep[rows] = 0
+    placement = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=base.dtype), (rows, np.arange(len(rows)))),
+        shape=(n_users, len(rows)))
+    replacement = sparse.vstack([delta_rows[row] for row in rows.tolist()], format='csr')
+    merged = (sparse.diags(keep) @ base + placement @ replacement).tocsr()
+    merged.eliminate_zeros()
+    merged.sort_indices()
+    return merged
+
 # Example usage:
 if __name__ == "__main__":
     try:
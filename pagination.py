@@ -0,0 +1,30 @@
+import base64
+import json
+
+
+def encode_cursor(score, movie_id):
+    """Opaque cursor for the ranking position of one recommendation.
+
+    A page requested with this cursor starts right after that position:
+    with a lower score, or the same score and a later movie in the catalog.
+    """
+    payload = json.dumps([float(score), int(movie_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the ``(score, movie_id)`` of a cursor from ``encode_cursor``."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        score, movie_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(score), int(movie_id)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid pagination cursor.")
+
+
+def next_cursor(recommendations, score_key, limit):
+    """Cursor of the page after ``recommendations``, or None on the last page."""
+    if len(recommendations) < limit or not recommendations:
+        return None
+    last = recommendations[-1]
+    return encode_cursor(last[score_key], last['movieId'])
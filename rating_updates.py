@@ -0,0 +1,113 @@
+import logging
+import queue
+import threading
+import time
+
+import pandas as pd
+
+from data_loader import iter_ratings
+
+logger = logging.getLogger(__name__)
+
+RATING_COLUMNS = ['userId', 'movieId', 'rating']
+
+
+class RatingUpdater:
+    """Background feeder that streams new ratings into a live MovieRecommender.
+
+    Ratings are queued with ``submit`` (or ``feed_file``) from any thread. A
+    single worker thread drains the queue into batches of up to
+    ``batch_size`` ratings, waiting at most ``flush_interval`` seconds for a
+    batch to fill, and applies each with ``add_ratings``. The same thread
+    compacts the recommender's pending updates every
+    ``compaction_interval`` seconds, or sooner once ``compaction_rows`` user
+    rows are pending.
+    """
+
+    def __init__(self, recommender, batch_size=1000, flush_interval=1.0,
+                 compaction_interval=300.0, compaction_rows=10000):
+        self.recommender = recommender
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compaction_interval = compaction_interval
+        self.compaction_rows = compaction_rows
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_compaction = time.monotonic()
+
+    def submit(self, user_id, movie_id, rating):
+        """Queue one rating."""
+        self._queue.put((user_id, movie_id, rating))
+
+    def submit_many(self, ratings):
+        """Queue an iterable of ``(userId, movieId, rating)`` tuples or a DataFrame."""
+        if isinstance(ratings, pd.DataFrame):
+            ratings = ratings[RATING_COLUMNS].itertuples(index=False, name=None)
+        for rating in ratings:
+            self._queue.put(tuple(rating))
+
+    def feed_file(self, path, chunk_size=100_000):
+        """Apply every rating in a ratings CSV (or MovieLens zip), one chunk at a time.
+
+        Runs on the calling thread and returns the total number of ratings
+        applied. Compaction still happens on the worker thread if running.
+        """
+        applied = 0
+        for chunk in iter_ratings(path, chunk_size=chunk_size):
+            result = self.recommender.add_ratings(chunk)
+            applied += result['added'] + result['updated']
+        return applied
+
+    def start(self):
+        """Start the worker thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='rating-updater', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Apply what is still queued, then stop the worker thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._next_batch()
+            if batch:
+                try:
+                    result = self.recommender.add_ratings(
+                        pd.DataFrame(batch, columns=RATING_COLUMNS))
+                    if result['ignored']:
+                        logger.warning(f"Ignored {result['ignored']} ratings for movies "
+                                       f"outside the catalog")
+                except Exception as e:
+                    logger.error(f"Failed to apply {len(batch)} ratings: {str(e)}")
+            self._maybe_compact()
+
+    def _next_batch(self):
+        """Collect up to ``batch_size`` queued ratings within ``flush_interval``."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _maybe_compact(self):
+        due = time.monotonic() - self._last_compaction >= self.compaction_interval
+        if due or self.recommender.pending_rating_rows >= self.compaction_rows:
+            try:
+                rows = self.recommender.compact_ratings()
+                if rows:
+                    logger.info(f"Compacted {rows} updated user rows")
+            except Exception as e:
+                logger.error(f"Rating compaction failed: {str(e)}")
+            self._last_compaction = time.monotonic()
@@ -0,0 +1,205 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import CACHE_LOOKUPS
+
+BACKENDS = ('memory', 'sqlite')
+
+
+class _MemoryStore:
+    """Per-process LRU store with per-entry expiry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _SQLiteStore:
+    """LRU store in a SQLite file shared by every worker process on the host."""
+
+    # Enforce the size limit every this many writes rather than on each one
+    TRIM_EVERY = 100
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self.evictions = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, value TEXT, expires_at REAL, accessed_at REAL)')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute(
+            'SELECT value FROM results WHERE key = ? AND expires_at >= ?', (key, now)).fetchone()
+        if row is None:
+            return None
+        with connection:
+            connection.execute('UPDATE results SET accessed_at = ? WHERE key = ?', (now, key))
+        return row[0]
+
+    def set(self, key, value, ttl):
+        connection = self._connection()
+        now = time.time()
+        with connection:
+            connection.execute(
+                'INSERT INTO results (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value, '
+                'expires_at = excluded.expires_at, accessed_at = excluded.accessed_at',
+                (key, value, now + ttl, now))
+        self._writes += 1
+        if self._writes % max(1, min(self.TRIM_EVERY, self.max_entries // 10)) == 0:
+            self._trim(now)
+
+    def _trim(self, now):
+        """Drop expired entries, then the least recently used beyond ``max_entries``."""
+        connection = self._connection()
+        with connection:
+            expired = connection.execute(
+                'DELETE FROM results WHERE expires_at < ?', (now,)).rowcount
+            excess = connection.execute('SELECT COUNT(*) FROM results').fetchone()[0] \
+                - self.max_entries
+            if excess > 0:
+                connection.execute(
+                    'DELETE FROM results WHERE key IN '
+                    '(SELECT key FROM results ORDER BY accessed_at LIMIT ?)', (excess,))
+        self.evictions += expired + max(excess, 0)
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM results')
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+
+class RecommendationCache:
+    """Cache of recommendation lists keyed by (algorithm, seed, k, model version).
+
+    The model version is part of every key, so reloading artifacts or
+    ingesting ratings (both change ``MovieRecommender.model_version``)
+    invalidates earlier results without any explicit purge. Entries of
+    versions no longer served are never read again, so they are the first
+    to go once the store is full, while versions served side by side (during
+    a hot swap, say) keep theirs. Entries expire after ``ttl`` seconds and
+    the least recently used are evicted beyond ``max_entries``.
+
+    The ``'sqlite'`` backend keeps entries in a local file at ``path`` so
+    every worker process on the host shares one cache.
+
+    Values are stored serialized and returned as fresh copies, so callers
+    may modify the lists they get back.
+    """
+
+    def __init__(self, backend='memory', max_entries=10000, ttl=300, path=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown cache backend '{backend}'. Choose one of: "
+                             f"{', '.join(BACKENDS)}")
+        if backend == 'sqlite':
+            if not path:
+                raise ValueError("The sqlite cache backend needs a file path.")
+            self._store = _SQLiteStore(path, max_entries)
+        else:
+            self._store = _MemoryStore(max_entries)
+        self.backend = backend
+        self.ttl = ttl
+        self.model_version = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(algorithm, seed, k, model_version):
+        return json.dumps([algorithm, seed, k, model_version], separators=(',', ':'))
+
+    def get(self, algorithm, seed, k, model_version):
+        """Return the cached result for the key, or None."""
+        self.model_version = model_version
+        cached = self._store.get(self.make_key(algorithm, seed, k, model_version))
+        if cached is not None:
+            self.hits += 1
+            CACHE_LOOKUPS.inc(cache='recommendations', result='hit')
+            return json.loads(cached)
+
+        self.misses += 1
+        CACHE_LOOKUPS.inc(cache='recommendations', result='miss')
+        return None
+
+    def set(self, algorithm, seed, k, model_version, result):
+        self.model_version = model_version
+        self._store.set(self.make_key(algorithm, seed, k, model_version),
+                        json.dumps(result), self.ttl)
+
+    def get_or_compute(self, algorithm, seed, k, model_version, compute):
+        """Return the cached result for the key, or ``compute()`` it and cache it."""
+        result = self.get(algorithm, seed, k, model_version)
+        if result is None:
+            result = compute()
+            self.set(algorithm, seed, k, model_version, result)
+        return result
+
+    def clear(self):
+        self._store.clear()
+
+    def stats(self):
+        """Hit/miss counters of this process, plus the store's size."""
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.backend,
+            'entries': len(self._store),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self._store.evictions,
+            'model_version': self.model_version,
+        }
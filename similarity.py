@@ -0,0 +1,196 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+
+def top_k_indices(scores, k):
+    """Return the indices of the ``k`` largest ``scores``, best first.
+
+    ``argpartition`` selects the k candidates in linear time and only those
+    get sorted, instead of sorting the whole score vector.
+    """
+    scores = np.asarray(scores)
+    n = scores.shape[0]
+    k = max(0, min(k, n))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def top_k_rows(rows, scores, k):
+    """Return ``(rows, scores)`` of the ``k`` best entries, best first.
+
+    Entries are ranked by descending score and ties by ascending row, a
+    total order: a ranking cut into pages can be resumed exactly after any
+    ``(score, row)`` position. ``scores`` are aligned with ``rows``.
+    """
+    rows = np.asarray(rows)
+    scores = np.asarray(scores)
+    k = max(0, k)
+    if len(rows) > k:
+        # Everything above the k-th best score, then the lowest rows tied with it
+        threshold = np.partition(scores, len(rows) - k)[len(rows) - k] if k else np.inf
+        above = scores > threshold
+        tied = np.flatnonzero(scores == threshold)
+        tied = tied[np.argsort(rows[tied], kind='stable')[:k - np.count_nonzero(above)]]
+        keep = np.concatenate((np.flatnonzero(above), tied))
+        rows, scores = rows[keep], scores[keep]
+    order = np.lexsort((rows, -scores))
+    return rows[order], scores[order]
+
+
+# Bytes held per score while a block is ranked by ``top_k_per_row``: the
+# float32 score, its negated copy, argpartition's int64 index and a tie flag
+SELECTION_BYTES_PER_SCORE = 4 + 4 + 8 + 1
+
+
+def block_rows(max_block_elements, width, num_blocks=1):
+    """Rows per block for ranking ``num_blocks`` blocks of ``width`` scores at once.
+
+    The blocks and the temporaries of ``top_k_per_row`` together take at
+    most the memory of ``max_block_elements`` float32 scores, apart from a
+    single row wider than that budget.
+    """
+    budget = 4 * max_block_elements // (SELECTION_BYTES_PER_SCORE * max(width, 1) * num_blocks)
+    return max(1, budget)
+
+
+def top_k_cosine_neighbors(features, k, max_block_elements=2 ** 25, num_threads=None):
+    """Build a fixed-width top-k cosine neighbor table for every row.
+
+    The rows of ``features`` (dense or scipy sparse) are L2-normalized and
+    multiplied against the whole matrix one block of rows at a time. Blocks
+    are sized with ``block_rows``, so the scores being ranked and the
+    selection temporaries stay within the memory of ``max_block_elements``
+    float32 scores rather than the full N x N similarity matrix; narrow
+    features also keep a dense transpose of at most that many elements. A
+    row is never its own neighbor.
+
+    Blocks are scored on ``num_threads`` threads (default: one per core);
+    the sparse and dense products and the top-k selection release the GIL.
+    The budget is shared between threads, so peak memory is the same.
+
+    Returns ``(neighbors, scores)``: int32 and float32 arrays of shape
+    (N, k), each row sorted by descending similarity.
+    """
+    features = normalize(sparse.csr_matrix(features, dtype=np.float32))
+    n = features.shape[0]
+    k = max(0, min(k, n - 1))
+
+    neighbors = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    if n == 0 or k == 0:
+        return neighbors, scores
+
+    # Identical rows hash to identical random projections; when most rows
+    # are duplicates, rank the distinct profiles instead
+    projection = np.random.default_rng(0).random((features.shape[1], 2))
+    _, first, inverse = np.unique(features @ projection, axis=0,
+                                  return_index=True, return_inverse=True)
+    if len(first) <= n // 2 and len(first) * features.shape[1] <= max_block_elements:
+        return _grouped_neighbors(features[first].toarray(), inverse.ravel(), k,
+                                  max_block_elements)
+
+    # Narrow feature spaces (e.g. genres only) are cheaper to score against a
+    # dense transpose; wide sparse vocabularies stay sparse
+    if features.shape[1] * n <= max_block_elements:
+        features_t = features.T.toarray()
+    else:
+        features_t = features.T.tocsc()
+    num_threads = max(1, num_threads or os.cpu_count() or 1)
+    block_size = min(n, block_rows(max_block_elements, n, num_threads))
+
+    def score_block(start):
+        stop = min(start + block_size, n)
+        block = features[start:stop] @ features_t
+        if sparse.issparse(block):
+            block = block.toarray()
+        block = np.asarray(block, dtype=np.float32)
+
+        # Push each row's self-similarity below any real score
+        rows = np.arange(stop - start)
+        block[rows, rows + start] = -np.inf
+
+        neighbors[start:stop], scores[start:stop] = top_k_per_row(block, k)
+
+    starts = range(0, n, block_size)
+    if num_threads == 1 or len(starts) == 1:
+        for start in starts:
+            score_block(start)
+    else:
+        with ThreadPoolExecutor(max_workers=num_threads) as pool:
+            # Each block writes its own rows of the output tables
+            list(pool.map(score_block, starts))
+
+    return neighbors, scores
+
+
+def top_k_per_row(block, k):
+    """Return ``(columns, scores)`` of the ``k`` best entries of each row, best first.
+
+    Partial selection of the k best columns per row, then only those get
+    sorted. Ties are broken by ascending column, the order of
+    ``top_k_rows``, so each row matches ranking that row on its own.
+
+    Ranking holds about ``SELECTION_BYTES_PER_SCORE`` bytes per score of
+    ``block``, the block included; size blocks with ``block_rows``.
+    """
+    # Copy the k selected columns out so the full index array is released
+    part = np.argpartition(-block, k - 1, axis=1)[:, :k].copy()
+    part_scores = np.take_along_axis(block, part, axis=1)
+    # Rows whose k-th score ties with columns that were left out select again
+    threshold = part_scores.min(axis=1, initial=np.inf)[:, None]
+    cut_ties = (np.count_nonzero(block == threshold, axis=1)
+                > np.count_nonzero(part_scores == threshold, axis=1))
+    columns = np.arange(block.shape[1])
+    for row in np.flatnonzero(cut_ties):
+        part[row], part_scores[row] = top_k_rows(columns, block[row], k)
+    order = np.lexsort((part, -part_scores), axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+def _grouped_neighbors(profiles, inverse, k, max_block_elements):
+    """Neighbor table for catalogs where many rows share an identical profile.
+
+    Genre-only features collapse tens of thousands of movies onto a few
+    thousand distinct profiles, so profiles are ranked against each other
+    once and every member of a profile reuses that ranking. Profiles are
+    scored in blocks sized with ``block_rows``, and only the k + 1 best
+    profiles of each are kept: every profile has at least one member, so
+    they hold enough movies. Ties are broken by catalog order.
+    """
+    n = inverse.shape[0]
+    neighbors = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+
+    # Movie indices grouped by profile, in catalog order within each group
+    members = np.argsort(inverse, kind='stable').astype(np.int32)
+    sizes = np.bincount(inverse, minlength=len(profiles))
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+
+    num_profiles = len(profiles)
+    block_size = block_rows(max_block_elements, num_profiles)
+    for start in range(0, num_profiles, block_size):
+        block = profiles[start:start + block_size] @ profiles.T
+        best, best_scores = top_k_per_row(block, min(k + 1, num_profiles))
+        for p, ranked, ranked_scores in zip(range(start, start + len(block)), best, best_scores):
+            # Walk profiles best first until k + 1 movies are collected (one
+            # of them may be the query movie itself)
+            cut = np.searchsorted(np.cumsum(sizes[ranked]), k + 1) + 1
+            ranked, ranked_scores = ranked[:cut], ranked_scores[:cut]
+            candidates = np.concatenate(
+                [members[offsets[q]:offsets[q + 1]] for q in ranked])[:k + 1]
+            candidate_scores = np.repeat(ranked_scores, sizes[ranked])[:k + 1]
+
+            group = members[offsets[p]:offsets[p + 1]]
+            keep = candidates[None, :] != group[:, None]
+            # Members that fell outside the first k + 1 drop the last candidate
+            keep[keep.all(axis=1), -1] = False
+            neighbors[group] = np.broadcast_to(candidates, keep.shape)[keep].reshape(-1, k)
+            scores[group] = np.broadcast_to(candidate_scores, keep.shape)[keep].reshape(-1, k)
+
+    return neighbors, scores
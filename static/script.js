@@ -71,6 +71,28 @@ function showMovieDetails(movieId) {
         .catch(error => console.error('Error:', error));
 }
 
+// Suggest titles from our dataset while typing
+let autocompleteTimer = null;
+document.getElementById('movieTitle').addEventListener('input', function() {
+    const query = this.value.trim();
+    clearTimeout(autocompleteTimer);
+    if (query.length < 2) {
+        return;
+    }
+    autocompleteTimer = setTimeout(() => {
+        fetch(`/autocomplete?q=${encodeURIComponent(query)}`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    document.getElementById('movieTitleSuggestions').innerHTML = data.titles
+                        .map(title => `<option value="${title.replace(/"/g, '&quot;')}">`)
+                        .join('');
+                }
+            })
+            .catch(error => console.error('Error:', error));
+    }, 150);
+});
+
 document.getElementById('movieForm').addEventListener('submit', function(e) {
     e.preventDefault();
     const movieTitle = document.getElementById('movieTitle').value;
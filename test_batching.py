@@ -0,0 +1,66 @@
+import pytest
+
+from rec_cache import RecommendationCache
+
+BACKENDS = {
+    'item_knn': {'collaborative_backend': 'item_knn'},
+    'als': {'collaborative_backend': 'als'},
+    'als_ann': {'collaborative_backend': 'als', 'ann_options': {'n_lists': 8, 'n_probe': 3}},
+}
+
+
+@pytest.mark.parametrize('k', [5, 30])
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_batch_matches_single_path(build_recommender, backend, k):
+    recommender = build_recommender(**BACKENDS[backend])
+    user_ids = recommender.user_ids.tolist()
+    batched = recommender.collaborative_recommendations_batch(user_ids, k)
+    assert batched == [recommender.collaborative_recommendations(user_id, k)
+                       for user_id in user_ids]
+
+
+@pytest.mark.parametrize('k', [5, 25])
+def test_content_batch_matches_single_path(build_recommender, k):
+    # A neighbor table narrower than k, so some lists need a catalog scan
+    recommender = build_recommender(content_top_k=10)
+    titles = recommender.movies['title'].tolist()
+    batched = recommender.content_based_recommendations_batch(titles + titles[:3], k)
+    expected = [recommender.content_based_recommendations(title, k) for title in titles]
+    assert batched == expected + expected[:3]
+    assert all(len(recommendations) == k for recommendations in batched)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_batch_and_single_path_share_cache_entries(build_recommender, backend):
+    recommender = build_recommender(**BACKENDS[backend])
+    user_ids = recommender.user_ids.tolist()
+    expected = [recommender.collaborative_recommendations(user_id, 5) for user_id in user_ids]
+
+    recommender.result_cache = RecommendationCache()
+    try:
+        # Half the users cached by the single path, then every user batched
+        for user_id in user_ids[::2]:
+            recommender.collaborative_recommendations(user_id, 5)
+        assert recommender.collaborative_recommendations_batch(user_ids, 5) == expected
+        hits = recommender.result_cache.hits
+        assert [recommender.collaborative_recommendations(user_id, 5)
+                for user_id in user_ids] == expected
+        assert recommender.result_cache.hits == hits + len(user_ids)
+    finally:
+        recommender.result_cache = None
+
+
+def test_async_micro_batch_matches_single_path(build_recommender, monkeypatch):
+    pytest.importorskip('starlette')
+    pytest.importorskip('a2wsgi')
+    import asgi
+
+    recommender = build_recommender(collaborative_backend='als')
+    monkeypatch.setattr(asgi.model_manager, 'get', lambda: recommender)
+    items = [(1, 5), (2, 10), (-1, 5), (3, 5), (2, 5)]
+    results = asgi.recommend_users(items)
+
+    assert isinstance(results[2], ValueError)
+    for (user_id, k), result in zip(items, results):
+        if user_id > 0:
+            assert result == recommender.collaborative_recommendations(user_id, k)
@@ -0,0 +1,11 @@
+def test_item_knn_predictions_stay_on_the_users_rating_scale(build_recommender):
+    # Shrinkage pulls sparse predictions toward the user's mean, so every
+    # prediction is a blend of the user's own ratings
+    recommender = build_recommender(shrinkage=5.0)
+    ratings = recommender.ratings
+    for user_id in recommender.user_ids.tolist():
+        own = ratings.loc[ratings['userId'] == user_id, 'rating']
+        recommendations = recommender.collaborative_recommendations(user_id, 20)
+        assert recommendations
+        for rec in recommendations:
+            assert own.min() - 1e-4 <= rec['predicted_rating'] <= own.max() + 1e-4
@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+
+from pagination import decode_cursor, encode_cursor, next_cursor
+from similarity import top_k_per_row, top_k_rows
+
+BACKENDS = {
+    'item_knn': {'collaborative_backend': 'item_knn'},
+    'als': {'collaborative_backend': 'als'},
+    'als_ann': {'collaborative_backend': 'als', 'ann_options': {'n_lists': 8, 'n_probe': 3}},
+}
+FILTERS = [
+    None,
+    {'genres': ['Comedy', 'Horror']},
+    {'year_range': (1985, 1999), 'min_ratings': 3},
+    {'genres': 'Drama', 'exclude_ids': [10, 20, 30]},
+]
+SEED_TITLE = 'Movie 7 (1987)'
+
+
+def paginate(fetch, score_key, page_size, max_items=500):
+    """Follow ``next_cursor`` from the first page; return every page."""
+    pages, cursor = [], None
+    while sum(len(page) for page in pages) < max_items:
+        page = fetch(page_size, cursor)
+        pages.append(page)
+        cursor = next_cursor(page, score_key, page_size)
+        if cursor is None:
+            break
+    return pages
+
+
+def movie_ids(recommendations):
+    return [rec['movieId'] for rec in recommendations]
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(3.25, 42)) == (3.25, 42)
+    with pytest.raises(ValueError):
+        decode_cursor('not a cursor')
+
+
+def test_block_ranking_matches_single_row_ranking():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        n = int(rng.integers(1, 30))
+        k = int(rng.integers(1, n + 1))
+        # Few distinct values, so ties straddle the k-th place
+        block = rng.integers(0, 4, size=(6, n)).astype(np.float32)
+        block[rng.random(block.shape) < 0.3] = -np.inf
+        columns, scores = top_k_per_row(block, k)
+        for row in range(len(block)):
+            expected_columns, expected_scores = top_k_rows(np.arange(n), block[row], k)
+            assert columns[row].tolist() == expected_columns.tolist()
+            assert scores[row].tolist() == expected_scores.tolist()
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+@pytest.mark.parametrize('page_size', [1, 7])
+def test_content_pages_are_slices_of_the_full_ranking(build_recommender, filters, page_size):
+    # A small neighbor table, so deep and filtered pages fall back to a full scan
+    recommender = build_recommender(content_top_k=10)
+    full = recommender.content_based_recommendations(SEED_TITLE, 200, filters=filters)
+    pages = paginate(lambda k, cursor: recommender.content_based_recommendations(
+        SEED_TITLE, k, filters=filters, cursor=cursor), 'similarity', page_size)
+
+    for i, page in enumerate(pages):
+        assert page == full[i * page_size:(i + 1) * page_size]
+    assert sum(len(page) for page in pages) == len(full)
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_collaborative_pages_are_slices_of_the_full_ranking(build_recommender, backend,
+                                                            filters):
+    recommender = build_recommender(**BACKENDS[backend])
+    for user_id in recommender.user_ids[:10].tolist():
+        full = recommender.collaborative_recommendations(user_id, 200, filters=filters)
+        pages = paginate(lambda k, cursor: recommender.collaborative_recommendations(
+            user_id, k, filters=filters, cursor=cursor), 'predicted_rating', 5)
+
+        assert [rec for page in pages for rec in page] == full
+        assert len(set(movie_ids(full))) == len(full)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_batched_first_page_continues_on_the_single_path(build_recommender, backend):
+    # The async server serves first pages in micro-batches and later pages one by one
+    recommender = build_recommender(**BACKENDS[backend])
+    user_ids = recommender.user_ids.tolist()
+    first_pages = recommender.collaborative_recommendations_batch(user_ids, 5)
+    for user_id, first_page in zip(user_ids, first_pages):
+        full = recommender.collaborative_recommendations(user_id, 15)
+        assert first_page == full[:5]
+        cursor = next_cursor(first_page, 'predicted_rating', 5)
+        if cursor is None:
+            continue
+        second_page = recommender.collaborative_recommendations(user_id, 5, cursor=cursor)
+        assert second_page == full[5:10]
+
+
+def test_filters_restrict_recommendations(build_recommender):
+    recommender = build_recommender()
+    filters = {'genres': ['Comedy'], 'year_range': (1990, 1999), 'exclude_ids': [10],
+               'min_ratings': 2}
+    movies = recommender.movies.set_index('movieId')
+    counts = dict(zip(recommender.movies['movieId'], recommender.rating_counts))
+
+    recommendations = (recommender.content_based_recommendations(SEED_TITLE, 50, filters=filters)
+                       + recommender.collaborative_recommendations(1, 50, filters=filters))
+    assert recommendations
+    for rec in recommendations:
+        assert 'Comedy' in movies.at[rec['movieId'], 'genres'].split('|')
+        assert 1990 <= int(rec['title'][-5:-1]) <= 1999
+        assert rec['movieId'] != 10
+        assert counts[rec['movieId']] >= 2
+
+
+@pytest.mark.parametrize('filters', [
+    {'unknown': 1},
+    ['genres'],
+    {'genres': 3.5},
+    {'genres': {'Comedy': True}},
+    {'genres': ['Nope']},
+    {'genres': 1 << 70},
+    {'genres': -1},
+    {'year_range': 1990},
+    {'year_range': '1990-1999'},
+    {'year_range': (1999, 1990)},
+    {'year_range': ('x', None)},
+    {'exclude_ids': 'abc'},
+    {'exclude_ids': [10, 'x']},
+    {'exclude_ids': [1 << 70]},
+    {'min_ratings': 'many'},
+])
+def test_invalid_filters_raise_value_error(build_recommender, filters):
+    recommender = build_recommender()
+    with pytest.raises(ValueError):
+        recommender.content_based_recommendations(SEED_TITLE, 5, filters=filters)
+    with pytest.raises(ValueError):
+        recommender.collaborative_recommendations(1, 5, filters=filters)
+
+
+def test_filter_values_are_normalized(build_recommender):
+    recommender = build_recommender()
+    expected = recommender.filter_mask({'genres': ['Comedy'], 'exclude_ids': [10],
+                                        'year_range': (1990, None)})
+    for filters in [{'genres': 'comedy', 'exclude_ids': 10, 'year_range': ['1990', None]},
+                    {'genres': int(recommender.genre_mask('Comedy')), 'exclude_ids': '10',
+                     'year_range': (1990.0, None)}]:
+        assert (recommender.filter_mask(filters) == expected).all()
@@ -0,0 +1,212 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loader import load_ratings
+from movie_recommender import MovieRecommender
+from rec_cache import RecommendationCache
+
+BACKENDS = ['item_knn', 'als']
+
+
+def rating_batch(recommender):
+    """New ratings for an existing user, updates of existing ratings and a new user."""
+    existing = recommender.ratings.iloc[[0, 5, 17]]
+    unseen = np.setdiff1d(recommender.movies['movieId'],
+                          recommender.ratings.loc[recommender.ratings['userId'] == 1, 'movieId'])
+    return pd.DataFrame(
+        [(1, movie_id, 4.5) for movie_id in unseen[:5]]
+        + [(user_id, movie_id, 6.0 - rating) for user_id, movie_id, rating
+           in existing[['userId', 'movieId', 'rating']].itertuples(index=False)]
+        + [(999, movie_id, 3.0 + i % 3) for i, movie_id in enumerate(unseen[10:25])]
+        + [(999, -1, 4.0)],
+        columns=['userId', 'movieId', 'rating'])
+
+
+def apply_batch(ratings, batch):
+    """The ratings table a full rebuild would see after ``batch``: the last rating wins."""
+    combined = pd.concat([ratings[['userId', 'movieId', 'rating']], batch], ignore_index=True)
+    combined = combined.drop_duplicates(['userId', 'movieId'], keep='last')
+    return combined[combined['movieId'] > 0].reset_index(drop=True)
+
+
+def sorted_ratings(recommender):
+    ratings = recommender.ratings[['userId', 'movieId', 'rating']]
+    return ratings.sort_values(['userId', 'movieId']).reset_index(drop=True).astype(
+        {'userId': np.int64, 'movieId': np.int64, 'rating': np.float32})
+
+
+@pytest.fixture(params=BACKENDS)
+def updated(request, movielens):
+    """``(incremental, rebuilt)`` recommenders after the same rating batch."""
+    movies_path, ratings_path = movielens
+    recommender = MovieRecommender(movies_path, ratings_path,
+                                   collaborative_backend=request.param)
+    batch = rating_batch(recommender)
+    result = recommender.add_ratings(batch)
+    assert result == {'added': 20, 'updated': 3, 'ignored': 1, 'new_users': 1}
+
+    rebuilt = MovieRecommender(movies_path, apply_batch(load_ratings(ratings_path), batch),
+                               collaborative_backend=request.param)
+    return recommender, rebuilt
+
+
+def test_ratings_and_aggregates_match_a_rebuild(updated):
+    recommender, rebuilt = updated
+    pd.testing.assert_frame_equal(sorted_ratings(recommender), sorted_ratings(rebuilt))
+    np.testing.assert_array_equal(recommender.rating_counts, rebuilt.rating_counts)
+    np.testing.assert_allclose(recommender.rating_sums, rebuilt.rating_sums)
+
+    for bayesian in (False, True):
+        for genre in (None, 'Comedy'):
+            pd.testing.assert_frame_equal(
+                recommender.get_top_rated_movies(min_reviews=3, genre=genre,
+                                                 bayesian=bayesian),
+                rebuilt.get_top_rated_movies(min_reviews=3, genre=genre, bayesian=bayesian))
+
+
+def test_new_ratings_are_used_for_recommendations(updated):
+    recommender, _ = updated
+    rated = set(recommender.ratings.loc[recommender.ratings['userId'] == 1, 'movieId'])
+    recommendations = recommender.collaborative_recommendations(1, 50)
+    assert recommendations
+    assert not rated & {rec['movieId'] for rec in recommendations}
+    assert recommender.collaborative_recommendations(999, 5)
+
+
+def test_changed_item_neighbors_match_a_rebuild(movielens):
+    movies_path, ratings_path = movielens
+    recommender = MovieRecommender(movies_path, ratings_path)
+    batch = rating_batch(recommender)
+    recommender.add_ratings(batch)
+    rebuilt = MovieRecommender(movies_path, apply_batch(load_ratings(ratings_path), batch))
+
+    changed = recommender._movie_rows.get_indexer(batch['movieId'][batch['movieId'] > 0])
+    for movie in np.unique(changed):
+        # Rebuilt lists recompute the same cosines in another order: compare scores
+        np.testing.assert_allclose(recommender._item_table[1][movie],
+                                   rebuilt._item_table[1][movie], atol=1e-5)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_compaction_keeps_ratings_and_recommendations(movielens, backend):
+    recommender = MovieRecommender(*movielens, collaborative_backend=backend)
+    recommender.add_ratings(rating_batch(recommender))
+    before = sorted_ratings(recommender)
+    recommendations = [recommender.collaborative_recommendations(user_id, 10)
+                       for user_id in (1, 2, 999)]
+    assert recommender.pending_rating_rows > 0
+
+    assert recommender.compact_ratings() > 0
+    assert recommender.pending_rating_rows == 0
+    assert recommender.rating_matrix.shape == (len(recommender.user_ids), len(recommender.movies))
+    recommender._ratings = None
+    pd.testing.assert_frame_equal(sorted_ratings(recommender), before)
+    assert [recommender.collaborative_recommendations(user_id, 10)
+            for user_id in (1, 2, 999)] == recommendations
+    assert recommender.compact_ratings() == 0
+
+
+def test_cached_leaderboards_are_re_ranked_on_the_next_read(movielens, monkeypatch):
+    recommender = MovieRecommender(*movielens)
+    boards = [{'min_reviews': 3}, {'min_reviews': 3, 'genre': 'Comedy', 'bayesian': True}]
+    for board in boards:
+        recommender.get_top_rated_movies(**board)
+
+    ranked = []
+    rank = recommender._rank_leaderboard
+    monkeypatch.setattr(recommender, '_rank_leaderboard',
+                        lambda *key: ranked.append(key) or rank(*key))
+    batch = rating_batch(recommender)
+    recommender.add_ratings(batch)
+    assert ranked == []
+
+    rebuilt = MovieRecommender(movielens[0], apply_batch(load_ratings(movielens[1]), batch))
+    for board in boards:
+        pd.testing.assert_frame_equal(recommender.get_top_rated_movies(**board),
+                                      rebuilt.get_top_rated_movies(**board))
+        recommender.get_top_rated_movies(**board)
+    assert len(ranked) == len(boards)
+
+
+def test_adding_ratings_invalidates_cached_recommendations(movielens):
+    recommender = MovieRecommender(*movielens)
+    recommender.result_cache = RecommendationCache()
+    first = recommender.collaborative_recommendations(1, 5)
+    assert recommender.collaborative_recommendations(1, 5) == first
+    assert recommender.result_cache.hits == 1
+
+    version = recommender.model_version
+    top_movie = first[0]['movieId']
+    recommender.add_ratings([(1, top_movie, 1.0)])
+    assert recommender.model_version != version
+
+    misses = recommender.result_cache.misses
+    after = recommender.collaborative_recommendations(1, 5)
+    assert recommender.result_cache.misses == misses + 1
+    assert top_movie not in {rec['movieId'] for rec in after}
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_cache_entries_are_scoped_to_the_model_version(tmp_path, backend):
+    cache = RecommendationCache(backend=backend, path=str(tmp_path / 'results.sqlite3'))
+    cache.set('content', 1, 5, 'v1', [{'movieId': 10}])
+    assert cache.get('content', 1, 5, 'v1') == [{'movieId': 10}]
+    assert cache.get('content', 1, 5, 'v2') is None
+    assert cache.get_or_compute('content', 1, 5, 'v2', lambda: [{'movieId': 20}]) == \
+        [{'movieId': 20}]
+    assert cache.get('content', 1, 5, 'v2') == [{'movieId': 20}]
+
+
+def test_concurrent_reads_do_not_break_rating_updates(movielens):
+    recommender = MovieRecommender(*movielens)
+    movie_ids = recommender.movies['movieId'].to_numpy()
+    done = threading.Event()
+    errors = []
+
+    def read():
+        # More distinct boards and masks than the caches hold, so reads also evict
+        min_reviews = 0
+        try:
+            while not done.is_set():
+                recommender.get_top_rated_movies(min_reviews=min_reviews % 100, limit=5)
+                recommender.collaborative_recommendations(
+                    1, 5, filters={'min_ratings': min_reviews % 100})
+                min_reviews += 1
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    try:
+        for i in range(30):
+            recommender.add_ratings([(2, int(movie_ids[i]), 4.0)])
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+
+    assert not errors
+    assert recommender.revision == 30
+    assert recommender.model_version.endswith('+30')
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_versions_served_side_by_side_keep_their_entries(tmp_path, backend):
+    cache = RecommendationCache(backend=backend, max_entries=4,
+                                path=str(tmp_path / 'results.sqlite3'))
+    for version in ('v1', 'v2'):
+        cache.set('content', 1, 5, version, [{'movieId': version}])
+    assert cache.get('content', 1, 5, 'v1') == [{'movieId': 'v1'}]
+    assert cache.get('content', 1, 5, 'v2') == [{'movieId': 'v2'}]
+
+    if backend == 'memory':
+        # Once v1 is no longer served, its entry is the first evicted
+        for seed in range(2, 5):
+            cache.get('content', 1, 5, 'v2')
+            cache.set('content', seed, 5, 'v2', [])
+        assert cache.get('content', 1, 5, 'v1') is None
+        assert cache.get('content', 1, 5, 'v2') == [{'movieId': 'v2'}]
@@ -11,7 +11,7 @@ def main():
     for rec in recommendations:
         print(f"Movie: {rec['title']}")
         print(f"Genres: {rec['genres']}")
-        print(f"Similarity Score: {rec['similarity_score']}%\n")
+        print(f"Similarity Score: {int(rec['similarity'] * 100)}%\n")
     
     # Test collaborative filtering
     print("\n2. Collaborative filtering recommendations for user 1:")
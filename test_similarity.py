@@ -0,0 +1,59 @@
+import tracemalloc
+
+import numpy as np
+from scipy import sparse
+
+from similarity import top_k_cosine_neighbors
+
+
+def duplicated_profiles(num_rows, num_profiles, width=12, seed=0):
+    """Sparse binary features where rows repeat ``num_profiles`` distinct profiles."""
+    rng = np.random.default_rng(seed)
+    profiles = np.zeros((num_profiles, width), dtype=np.float32)
+    for profile in profiles:
+        profile[rng.choice(width, size=rng.integers(1, 4), replace=False)] = 1
+    profiles = np.unique(profiles, axis=0)
+    rows = np.concatenate((np.arange(len(profiles)),
+                           rng.integers(0, len(profiles), num_rows - len(profiles))))
+    return sparse.csr_matrix(profiles[rng.permutation(rows)])
+
+
+def check_neighbors(features, neighbors, scores, k):
+    """Every row holds its exact top-k cosine scores over other rows, best first."""
+    dense = features.toarray()
+    dense /= np.linalg.norm(dense, axis=1, keepdims=True)
+    similarity = dense @ dense.T
+    np.fill_diagonal(similarity, -np.inf)
+    expected = -np.sort(-similarity, axis=1)[:, :k]
+
+    assert neighbors.shape == scores.shape == (len(dense), k)
+    assert (neighbors != np.arange(len(dense))[:, None]).all()
+    assert (np.diff(scores, axis=1) <= 0).all()
+    np.testing.assert_allclose(scores, expected, atol=1e-5)
+    np.testing.assert_allclose(np.take_along_axis(similarity, neighbors, axis=1), scores,
+                               atol=1e-5)
+    for row in neighbors:
+        assert len(set(row.tolist())) == k
+
+
+def test_shared_profiles_match_exact_ranking():
+    features = duplicated_profiles(600, 40)
+    neighbors, scores = top_k_cosine_neighbors(features, 25, max_block_elements=2 ** 10)
+    check_neighbors(features, neighbors, scores, 25)
+
+
+def test_many_distinct_profiles_stay_within_the_block_budget():
+    # Hundreds of distinct profiles: ranking them all against each other at
+    # once would take far more than the block budget
+    features = duplicated_profiles(4000, 1500, width=24)
+    budget = 2 ** 14
+    tracemalloc.start()
+    try:
+        neighbors, scores = top_k_cosine_neighbors(features, 10, max_block_elements=budget)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    output = neighbors.nbytes + scores.nbytes
+    assert peak < output + 4 * budget + 1024 * 1024
+    check_neighbors(features, neighbors, scores, 10)
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+import pytest
+
+from tmdb_cache import TMDBMetadataCache
+from tmdb_client import TMDBClient
+
+SLOW_SECONDS = 0.5
+
+
+def tmdb_movie(tmdb_id, title):
+    return {'id': tmdb_id, 'title': title, 'overview': f'About {title}',
+            'poster_path': f'/{tmdb_id}.jpg', 'release_date': '1999-01-01',
+            'vote_average': 7.5, 'vote_count': 100}
+
+
+class StubTMDB:
+    """A local HTTP server answering the TMDB endpoints the clients use.
+
+    ``/movie/101`` is found, ``/movie/102`` is not (404), ``/movie/103``
+    answers after ``SLOW_SECONDS``, and title searches find one movie.
+    Every request path is recorded in ``requests``.
+    """
+
+    def __init__(self):
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                stub.requests.append(url.path)
+                if url.path == '/movie/103':
+                    time.sleep(SLOW_SECONDS)
+                if url.path == '/movie/102':
+                    self.respond(404, {'status_message': 'Not found'})
+                elif url.path.startswith('/movie/'):
+                    tmdb_id = int(url.path.rsplit('/', 1)[1])
+                    self.respond(200, tmdb_movie(tmdb_id, f'Movie {tmdb_id}'))
+                elif url.path == '/search/movie':
+                    query = parse_qs(url.query)['query'][0]
+                    self.respond(200, {'results': [tmdb_movie(900, query)]})
+                else:
+                    self.respond(404, {})
+
+            def respond(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def count(self, path):
+        return self.requests.count(path)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubTMDB()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def metadata_cache(tmp_path):
+    cache = TMDBMetadataCache(str(tmp_path / 'tmdb.sqlite3'))
+    # MovieLens movies 1-3 link to TMDB 101-103; movie 4 has no link
+    cache.seed_links(pd.DataFrame({'movieId': [1, 2, 3], 'tmdbId': [101, 102, 103]}))
+    return cache
+
+
+@pytest.fixture
+def client(stub, metadata_cache):
+    return TMDBClient('test-key', base_url=stub.url, max_workers=4, request_timeout=2.0,
+                      batch_timeout=2.0, metadata_cache=metadata_cache)
+
+
+def wait_for_entry(cache, movie_id, timeout=5.0):
+    """Wait until a background lookup has written ``movie_id`` to the cache."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        entry = cache.get_many([movie_id]).get(movie_id)
+        if entry is not None and entry['fetched']:
+            return entry
+        time.sleep(0.02)
+    raise AssertionError(f'movie {movie_id} was never cached')
+
+
+def test_summaries_are_fetched_once_and_cached(client, stub):
+    summaries = client.get_movie_summaries([1, 4], ['Movie 1', 'Search Me'])
+    assert summaries[0]['id'] == 101
+    assert summaries[1]['title'] == 'Search Me'
+
+    assert client.get_movie_summaries([1, 4], ['Movie 1', 'Search Me']) == summaries
+    assert stub.count('/movie/101') == 1
+    assert stub.count('/search/movie') == 1
+
+
+def test_movies_missing_on_tmdb_are_cached_as_misses(client, stub, metadata_cache):
+    assert client.get_movie_summaries([2]) == [None]
+    entry = wait_for_entry(metadata_cache, 2)
+    assert entry['payload'] is None
+
+    assert client.get_movie_summaries([2]) == [None]
+    assert stub.count('/movie/102') == 1
+
+
+def test_lookups_past_the_batch_timeout_are_cached_when_they_finish(client, stub,
+                                                                    metadata_cache):
+    start = time.monotonic()
+    assert client.get_movie_summaries([1, 3], timeout=0.1)[1] is None
+    assert time.monotonic() - start < SLOW_SECONDS
+
+    assert wait_for_entry(metadata_cache, 3)['payload']['id'] == 103
+    summaries = client.get_movie_summaries([1, 3], timeout=0.1)
+    assert summaries[1]['id'] == 103
+    assert stub.count('/movie/103') == 1
+
+
+def test_concurrent_lookups_of_a_movie_share_one_request(client, stub):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.get_movie_summaries([3])))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [summaries[0]['id'] for summaries in results] == [103] * 4
+    assert stub.count('/movie/103') == 1
+
+
+def test_async_client_caches_late_lookups(stub, metadata_cache):
+    pytest.importorskip('httpx')
+    from tmdb_async import AsyncTMDBClient
+
+    async def run():
+        client = AsyncTMDBClient('test-key', base_url=stub.url, batch_timeout=2.0,
+                                 metadata_cache=metadata_cache)
+        try:
+            first = await client.get_movie_summaries([1, 3], timeout=0.1)
+            await asyncio.to_thread(wait_for_entry, metadata_cache, 3)
+            second = await client.get_movie_summaries([1, 3], timeout=0.1)
+        finally:
+            await client.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first[0]['id'] == 101 and first[1] is None
+    assert second[1]['id'] == 103
+    assert stub.count('/movie/103') == 1
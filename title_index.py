@@ -0,0 +1,301 @@
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+import numpy as np
+
+from similarity import top_k_indices
+
+_YEAR_PATTERN = re.compile(r'\s*\((\d{4})(?:[-–]\d{0,4})?\)\s*$')
+_PAREN_PATTERN = re.compile(r'\(([^()]*)\)')
+_ARTICLE_PATTERN = re.compile(r'^(.*), (the|a|an|les|la|le|l|el|il|der|die|das|los|las)$')
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+# Relative scores for each kind of match; popularity breaks ties within a kind
+EXACT_TITLE_SCORE = 1.0
+EXACT_ALIAS_SCORE = 0.95
+PREFIX_SCORE = 0.8
+WORD_PREFIX_SCORE = 0.6
+FUZZY_SCORE = 0.5
+YEAR_MATCH_BONUS = 0.04
+# Fuzzy matches below this trigram similarity are treated as no match
+MIN_FUZZY_SIMILARITY = 0.35
+
+_QUERY_YEAR_PATTERN = re.compile(r'^(.*\S)\s+(\d{4})$')
+
+
+def normalize_title(text):
+    """Lowercase, strip accents and collapse punctuation to single spaces."""
+    text = str(text)
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', text.lower()).strip()
+
+
+def _move_article(title):
+    """Turn MovieLens-style 'Matrix, The' into 'The Matrix'."""
+    match = _ARTICLE_PATTERN.match(title.strip())
+    if match:
+        return f"{match.group(2)} {match.group(1)}"
+    return title
+
+
+def title_aliases(title):
+    """Return ``(full, aliases)`` normalized forms of a MovieLens title.
+
+    ``full`` keeps the release year. ``aliases`` holds the year-stripped
+    title, its leading-article and article-less variants, and any
+    alternative titles given in parentheses.
+    """
+    title = str(title)
+    full = normalize_title(title)
+    base = _YEAR_PATTERN.sub('', title)
+
+    names = [_PAREN_PATTERN.sub('', base)]
+    names.extend(_PAREN_PATTERN.findall(base))
+
+    aliases = []
+    for name in names:
+        name = re.sub(r'^a\.k\.a\.\s*', '', name.strip(), flags=re.IGNORECASE)
+        moved = _move_article(name)
+        for variant in (name, moved):
+            normalized = normalize_title(variant)
+            if normalized and normalized not in aliases:
+                aliases.append(normalized)
+        match = _ARTICLE_PATTERN.match(name)
+        if match:
+            stripped = normalize_title(match.group(1))
+            if stripped and stripped not in aliases:
+                aliases.append(stripped)
+    return full, aliases
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Entry kinds in the sorted key table
+FULL_TITLE = 0
+ALIAS = 1
+INNER_WORDS = 2
+
+
+class _SortedKeys:
+    """Read-only sequence view over sorted byte strings stored as blob + offsets.
+
+    Lets ``bisect`` search the key table without materializing one Python
+    string per entry, so the table can live in a memory-mapped file.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+
+class TitleIndex:
+    """Lookup structure for resolving free-text movie titles.
+
+    All normalized titles, their aliases and every word-suffix of an alias
+    ('story' for 'toy story') live in one sorted key table, which serves
+    exact matches and prefix/autocomplete ranges through binary search. A
+    trigram inverted index over the aliases serves fuzzy matches. Matches are
+    ranked by match kind, then by ``popularity`` (e.g. rating counts), then by
+    catalog order.
+
+    The index is held entirely in NumPy arrays (see ``arrays`` and
+    ``from_arrays``) so it can be persisted and memory-mapped.
+    """
+
+    def __init__(self, titles, popularity=None):
+        titles = list(titles)
+        if popularity is None:
+            popularity = np.zeros(len(titles))
+
+        years = np.zeros(len(titles), dtype=np.int16)
+        entries = []
+        gram_postings = defaultdict(list)
+        alias_rows = []
+        alias_gram_counts = []
+
+        for row, title in enumerate(titles):
+            year = _YEAR_PATTERN.search(str(title))
+            if year:
+                years[row] = int(year.group(1))
+            full, aliases = title_aliases(title)
+            entries.append((full, FULL_TITLE, row))
+            for alias in aliases:
+                entries.append((alias, ALIAS, row))
+                # Every inner word start is an entry too, so 'story' finds 'toy story'
+                words = alias.split(' ')
+                for i in range(1, len(words)):
+                    entries.append((' '.join(words[i:]), INNER_WORDS, row))
+
+                alias_id = len(alias_rows)
+                alias_rows.append(row)
+                grams = _trigrams(alias)
+                alias_gram_counts.append(len(grams))
+                for gram in grams:
+                    gram_postings[gram].append(alias_id)
+
+        entries.sort()
+        keys = [key.encode('ascii') for key, _, _ in entries]
+        gram_keys = sorted(gram_postings)
+        postings = [np.array(gram_postings[gram], dtype=np.int32) for gram in gram_keys]
+
+        self._set_arrays({
+            'popularity': np.asarray(popularity, dtype=np.float64),
+            'years': years,
+            'key_blob': np.frombuffer(b''.join(keys), dtype=np.uint8),
+            'key_offsets': np.concatenate(([0], np.cumsum([len(key) for key in keys]))
+                                          ).astype(np.int64),
+            'entry_kinds': np.array([kind for _, kind, _ in entries], dtype=np.uint8),
+            'entry_rows': np.array([row for _, _, row in entries], dtype=np.int32),
+            'alias_rows': np.array(alias_rows, dtype=np.int32),
+            'alias_gram_counts': np.array(alias_gram_counts, dtype=np.int32),
+            'gram_keys': np.array([gram.encode('ascii') for gram in gram_keys], dtype='S3'),
+            'gram_offsets': np.concatenate(([0], np.cumsum([len(p) for p in postings]))
+                                           ).astype(np.int64),
+            'gram_postings': (np.concatenate(postings) if postings
+                              else np.empty(0, dtype=np.int32)),
+        })
+
+    def _set_arrays(self, arrays):
+        self._arrays = arrays
+        self.size = len(arrays['popularity'])
+        self.popularity = arrays['popularity']
+        self.years = arrays['years']
+        self._keys = _SortedKeys(arrays['key_blob'], arrays['key_offsets'])
+        self._entry_kinds = arrays['entry_kinds']
+        self._entry_rows = arrays['entry_rows']
+        self._alias_rows = arrays['alias_rows']
+        self._alias_gram_counts = arrays['alias_gram_counts']
+        self._gram_keys = arrays['gram_keys']
+        self._gram_offsets = arrays['gram_offsets']
+        self._gram_postings = arrays['gram_postings']
+
+    def arrays(self):
+        """Return the arrays that fully describe this index."""
+        return dict(self._arrays)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuild an index from ``arrays()`` output (e.g. memory-mapped)."""
+        index = cls.__new__(cls)
+        index._set_arrays(dict(arrays))
+        return index
+
+    def _equal_range(self, key):
+        key = key.encode('ascii')
+        start = bisect_left(self._keys, key)
+        return start, bisect_right(self._keys, key, lo=start)
+
+    def _prefix_range(self, prefix):
+        prefix = prefix.encode('ascii')
+        start = bisect_left(self._keys, prefix)
+        return start, bisect_left(self._keys, prefix + b'\xff', lo=start)
+
+    def _grams_postings(self, gram):
+        gram = gram.encode('ascii')
+        i = np.searchsorted(self._gram_keys, gram)
+        if i < len(self._gram_keys) and self._gram_keys[i] == gram:
+            return self._gram_postings[self._gram_offsets[i]:self._gram_offsets[i + 1]]
+        return None
+
+    def _fuzzy(self, query, limit):
+        """Rank aliases by trigram Jaccard similarity to ``query``."""
+        grams = _trigrams(query)
+        postings = [p for p in map(self._grams_postings, grams) if p is not None]
+        if not postings:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        overlap = np.bincount(np.concatenate(postings),
+                              minlength=len(self._alias_rows))
+        candidates = np.flatnonzero(overlap)
+        shared = overlap[candidates]
+        jaccard = shared / (len(grams) + self._alias_gram_counts[candidates] - shared)
+        # Reward covering the query as well, so long titles are not penalized
+        # for the words the user left out
+        similarity = (shared / len(grams) + jaccard) / 2
+        # Over-fetch since several aliases can belong to the same movie
+        best = top_k_indices(similarity, limit * 4)
+        best = best[similarity[best] >= MIN_FUZZY_SIMILARITY]
+        return self._alias_rows[candidates[best]], similarity[best]
+
+    def search(self, query, limit=10, fuzzy=True):
+        """Return up to ``limit`` ``(row, score)`` pairs ranked best first.
+
+        A trailing four-digit year in the query ('star wars 1977') is matched
+        against release years rather than title text.
+        """
+        query = normalize_title(query)
+        if not query or limit <= 0:
+            return []
+
+        scores = {}
+        start, stop = self._equal_range(query)
+        kinds = self._entry_kinds[start:stop]
+        exact_rows = self._entry_rows[start:stop][kinds == FULL_TITLE]
+        alias_rows = self._entry_rows[start:stop][kinds == ALIAS]
+        year = None
+        with_year = _QUERY_YEAR_PATTERN.match(query)
+        if with_year:
+            query, year = with_year.group(1), int(with_year.group(2))
+
+        def offer(rows, score):
+            rows = np.unique(np.asarray(rows, dtype=np.int64))
+            # Within one match kind only the most popular rows can make the cut
+            keep = limit + len(scores)
+            if len(rows) > keep:
+                rows = rows[top_k_indices(self.popularity[rows], keep)]
+            for row in rows.tolist():
+                if scores.get(row, -1.0) < score:
+                    scores[row] = score
+
+        offer(exact_rows, EXACT_TITLE_SCORE)
+        offer(alias_rows, EXACT_ALIAS_SCORE)
+        if year is not None:
+            # 'blade runner 2049' is a title of its own, so a match on the
+            # year-stripped text ranks below a match on the full query
+            start, stop = self._equal_range(query)
+            stripped = self._entry_rows[start:stop][self._entry_kinds[start:stop] == ALIAS]
+            offer(stripped, EXACT_ALIAS_SCORE - 2 * YEAR_MATCH_BONUS)
+
+        start, stop = self._prefix_range(query)
+        if stop > start:
+            inner = self._entry_kinds[start:stop] == INNER_WORDS
+            rows = self._entry_rows[start:stop]
+            offer(rows[~inner], PREFIX_SCORE)
+            offer(rows[inner], WORD_PREFIX_SCORE)
+
+        if fuzzy and len(scores) < limit:
+            rows, similarity = self._fuzzy(query, limit)
+            for row, value in zip(rows.tolist(), similarity.tolist()):
+                if row not in scores:
+                    scores[row] = FUZZY_SCORE * value
+
+        if year is not None:
+            for row, score in scores.items():
+                if self.years[row] == year and score < EXACT_TITLE_SCORE:
+                    scores[row] = score + YEAR_MATCH_BONUS
+
+        ranked = sorted(scores.items(),
+                        key=lambda item: (-item[1], -self.popularity[item[0]], item[0]))
+        return ranked[:limit]
+
+    def resolve(self, query):
+        """Return the best matching row for ``query``, or None."""
+        matches = self.search(query, limit=1)
+        return matches[0][0] if matches else None
+
+    def autocomplete(self, prefix, limit=10):
+        """Return up to ``limit`` rows whose title or a title word starts with ``prefix``."""
+        return [row for row, _ in self.search(prefix, limit=limit, fuzzy=False)]
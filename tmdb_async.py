@@ -0,0 +1,160 @@
+import asyncio
+import functools
+import time
+
+import httpx
+
+from coalescing import RequestCoalescer
+from metrics import CACHE_LOOKUPS, TMDB_REQUESTS, span
+from tmdb_client import TMDB_API_BASE_URL, TMDBClient
+
+
+class AsyncTMDBClient:
+    """Non-blocking TMDB lookups for the async server.
+
+    Every request goes through one ``httpx.AsyncClient`` with at most
+    ``max_connections`` keep-alive connections, so a lookup waits on the
+    event loop instead of holding a thread. Concurrent lookups of the same
+    movie or search query share one request.
+
+    ``metadata_cache`` is a TMDBMetadataCache, usually the one of the sync
+    TMDBClient, so both serve and fill the same entries. It is read and
+    written on worker threads.
+    """
+
+    def __init__(self, api_key, base_url=TMDB_API_BASE_URL, max_connections=8,
+                 request_timeout=3.0, batch_timeout=5.0, metadata_cache=None, language='en'):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.language = language
+        self.request_timeout = request_timeout
+        self.batch_timeout = batch_timeout
+        self.metadata_cache = metadata_cache
+        self.http = httpx.AsyncClient(
+            timeout=request_timeout,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections))
+        self._summaries = RequestCoalescer('tmdb_summary')
+        self._searches = RequestCoalescer('tmdb_search')
+        # Strong references to background refreshes until they finish
+        self._background = set()
+
+    async def close(self):
+        await self.http.aclose()
+
+    async def search_movies(self, query, timeout=None):
+        """Search for movies by title; returns [] if the lookup fails or times out."""
+        deadline = time.monotonic() + (self.batch_timeout if timeout is None else timeout)
+        try:
+            return await asyncio.wait_for(
+                self._searches.run(query, functools.partial(self._search_request, query,
+                                                            deadline)),
+                max(0.0, deadline - time.monotonic()))
+        except Exception as e:
+            print(f"Error searching movies for '{query}': {str(e) or type(e).__name__}")
+            return []
+
+    async def get_movie_summaries(self, movie_ids, titles=None, timeout=None):
+        """Return the TMDB summary of each MovieLens movie, or None.
+
+        Behaves like ``TMDBClient.get_movie_summaries``: fresh cache entries
+        are served as they are, stale ones are served and refreshed in the
+        background, and misses are fetched concurrently by TMDB id (or title
+        search) and written back. Lookups still running after ``timeout``
+        seconds (default ``batch_timeout``) come back as None but finish in
+        the background, so the next request finds them cached.
+        """
+        deadline = time.monotonic() + (self.batch_timeout if timeout is None else timeout)
+        movie_ids = [int(movie_id) for movie_id in movie_ids]
+        titles = list(titles) if titles is not None else [None] * len(movie_ids)
+        entries = {}
+        if self.metadata_cache is not None:
+            entries = await asyncio.to_thread(self.metadata_cache.get_many, movie_ids)
+
+        summaries = [None] * len(movie_ids)
+        missing = []
+        for i, (movie_id, title) in enumerate(zip(movie_ids, titles)):
+            entry = entries.get(movie_id)
+            if entry is not None and entry['fetched']:
+                summaries[i] = entry['payload']
+                if entry['stale']:
+                    self._refresh_in_background(movie_id, entry['tmdb_id'], title)
+                CACHE_LOOKUPS.inc(cache='tmdb', result='stale' if entry['stale'] else 'hit')
+            else:
+                missing.append((i, movie_id, entry['tmdb_id'] if entry else None, title))
+                if self.metadata_cache is not None:
+                    CACHE_LOOKUPS.inc(cache='tmdb', result='miss')
+        if not missing:
+            return summaries
+
+        lookups = [asyncio.ensure_future(self._summaries.run(
+            movie_id, functools.partial(self._fetch_summary, movie_id, tmdb_id, title,
+                                        time.monotonic() + self.batch_timeout)))
+            for _, movie_id, tmdb_id, title in missing]
+        await asyncio.wait(lookups, timeout=max(0.0, deadline - time.monotonic()))
+        for (i, movie_id, _, _), lookup in zip(missing, lookups):
+            if not lookup.done():
+                # Only this wait is cancelled; the shared fetch keeps running
+                lookup.cancel()
+                print(f"Error fetching TMDB data for movie {movie_id}: timed out")
+            elif lookup.exception() is not None:
+                print(f"Error fetching TMDB data for movie {movie_id}: {lookup.exception()}")
+            else:
+                summaries[i] = lookup.result()
+        return summaries
+
+    def _refresh_in_background(self, movie_id, tmdb_id, title):
+        """Re-fetch one stale cache entry without blocking the caller."""
+        refresh = asyncio.ensure_future(self._summaries.run(
+            movie_id, functools.partial(self._fetch_summary, movie_id, tmdb_id, title,
+                                        time.monotonic() + self.batch_timeout)))
+        self._background.add(refresh)
+        refresh.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, refresh):
+        self._background.discard(refresh)
+        if not refresh.cancelled() and refresh.exception() is not None:
+            print(f"Error refreshing TMDB data: {refresh.exception()}")
+
+    async def _fetch_summary(self, movie_id, tmdb_id, title, deadline):
+        """Fetch one movie summary and write it to the metadata cache."""
+        summary = await self._summary_request(tmdb_id, title, deadline)
+        if self.metadata_cache is not None:
+            await asyncio.to_thread(self.metadata_cache.put_many,
+                                    [(movie_id, summary['id'] if summary else tmdb_id, summary)])
+        return summary
+
+    async def _get(self, path, deadline, **params):
+        """GET ``path`` through the shared connection pool, bounded by ``deadline``."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError('timed out')
+        params.update(api_key=self.api_key, language=self.language)
+        with span('tmdb_io'):
+            try:
+                response = await self.http.get(f"{self.base_url}{path}", params=params,
+                                               timeout=min(self.request_timeout, remaining))
+            except httpx.TimeoutException:
+                TMDB_REQUESTS.inc(outcome='timeout')
+                raise
+            except httpx.HTTPError:
+                TMDB_REQUESTS.inc(outcome='error')
+                raise
+        TMDB_REQUESTS.inc(outcome=f'{response.status_code // 100}xx')
+        return response
+
+    async def _search_request(self, query, deadline):
+        response = await self._get('/search/movie', deadline, query=query)
+        response.raise_for_status()
+        return [TMDBClient._search_result(movie) for movie in response.json().get('results', [])]
+
+    async def _summary_request(self, tmdb_id, title, deadline):
+        """Fetch one movie summary by TMDB id (or title); None if TMDB has no match."""
+        if tmdb_id is None:
+            results = await self._search_request(title, deadline) if title else []
+            return results[0] if results else None
+        response = await self._get(f'/movie/{int(tmdb_id)}', deadline)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return TMDBClient._search_result(response.json())
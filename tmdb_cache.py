@@ -0,0 +1,142 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from data_loader import file_digest, load_links
+
+# Bump when the table layout changes; older cache files are rebuilt
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    movie_id   INTEGER PRIMARY KEY,
+    tmdb_id    INTEGER,
+    payload    TEXT,
+    fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class TMDBMetadataCache:
+    """Durable SQLite cache of TMDB metadata keyed by MovieLens ``movieId``.
+
+    Each row maps a movieId to its TMDB id (seeded from MovieLens
+    ``links.csv``) and the last fetched movie summary. Rows older than
+    ``ttl`` seconds are stale: they are still served, but the caller should
+    refresh them. A row fetched with no TMDB match stores a NULL payload so
+    the miss is not retried before it goes stale.
+
+    The file is opened in WAL mode with one connection per thread, so web
+    workers and background refresh threads can share it safely.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = self._connection()
+        with connection:
+            connection.executescript(_SCHEMA)
+            version = self._meta('schema_version')
+            if version is not None and int(version) != SCHEMA_VERSION:
+                connection.execute('DELETE FROM movies')
+                connection.execute('DELETE FROM meta')
+            self._set_meta('schema_version', str(SCHEMA_VERSION))
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def _meta(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._connection().execute(
+            'INSERT INTO meta (key, value) VALUES (?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value', (key, value))
+
+    def seed_links(self, links, source_digest=None):
+        """Record movieId -> tmdbId pairs from a MovieLens links table.
+
+        Cached payloads are kept unless a movie's TMDB id changed.
+        ``source_digest`` is remembered so ``seed_links_file`` can skip files
+        that were already seeded. Returns the number of links written.
+        """
+        links = links.dropna(subset=['tmdbId'])
+        rows = list(zip(links['movieId'].astype(int).tolist(),
+                        links['tmdbId'].astype(int).tolist()))
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                'INSERT INTO movies (movie_id, tmdb_id) VALUES (?, ?) '
+                'ON CONFLICT(movie_id) DO UPDATE SET tmdb_id = excluded.tmdb_id, '
+                'payload = CASE WHEN movies.tmdb_id IS excluded.tmdb_id '
+                'THEN movies.payload END, '
+                'fetched_at = CASE WHEN movies.tmdb_id IS excluded.tmdb_id '
+                'THEN movies.fetched_at END', rows)
+            if source_digest is not None:
+                self._set_meta('links_digest', source_digest)
+        return len(rows)
+
+    def seed_links_file(self, path):
+        """Seed from ``links.csv`` (or a MovieLens zip) unless already done."""
+        digest = file_digest(path)
+        if self._meta('links_digest') == digest:
+            return 0
+        return self.seed_links(load_links(path), source_digest=digest)
+
+    def get_many(self, movie_ids):
+        """Return ``{movie_id: entry}`` for the cached ``movie_ids``.
+
+        Each entry is a dict with ``tmdb_id``, ``payload`` (None if unknown
+        or not found on TMDB), ``fetched`` (whether TMDB was ever queried)
+        and ``stale``.
+        """
+        movie_ids = [int(movie_id) for movie_id in movie_ids]
+        entries = {}
+        now = time.time()
+        connection = self._connection()
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(movie_ids), 500):
+            chunk = movie_ids[start:start + 500]
+            rows = connection.execute(
+                f"SELECT movie_id, tmdb_id, payload, fetched_at FROM movies "
+                f"WHERE movie_id IN ({', '.join('?' * len(chunk))})", chunk)
+            for movie_id, tmdb_id, payload, fetched_at in rows:
+                entries[movie_id] = {
+                    'tmdb_id': tmdb_id,
+                    'payload': json.loads(payload) if payload else None,
+                    'fetched': fetched_at is not None,
+                    'stale': fetched_at is not None and now - fetched_at > self.ttl,
+                }
+        return entries
+
+    def put_many(self, items):
+        """Store ``(movie_id, tmdb_id, payload)`` triples fetched just now."""
+        now = time.time()
+        rows = [(int(movie_id), tmdb_id, json.dumps(payload) if payload else None, now)
+                for movie_id, tmdb_id, payload in items]
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                'INSERT INTO movies (movie_id, tmdb_id, payload, fetched_at) '
+                'VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(movie_id) DO UPDATE SET tmdb_id = excluded.tmdb_id, '
+                'payload = excluded.payload, fetched_at = excluded.fetched_at', rows)
@@ -1,8 +1,18 @@
 from tmdbv3api import TMDb, Movie, Trending, Search, Person
+from concurrent.futures import ThreadPoolExecutor, wait
+import functools
 import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import CACHE_LOOKUPS, TMDB_REQUESTS, span
+
+TMDB_API_BASE_URL = 'https://api.themoviedb.org/3'
 
 class TMDBClient:
-    def __init__(self, api_key):
+    def __init__(self, api_key, base_url=TMDB_API_BASE_URL, max_workers=8,
+                 request_timeout=3.0, batch_timeout=5.0, metadata_cache=None):
         self.tmdb = TMDb()
         self.tmdb.api_key = api_key
         self.movie = Movie()
@@ -10,6 +20,26 @@ class TMDBClient:
         self.search = Search()
         self.person = Person()
 
+        # Batch lookups bypass tmdbv3api, which has no request timeouts and
+        # opens a new connection per call: a keep-alive session sized to the
+        # worker pool lets every worker reuse its connection.
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.request_timeout = request_timeout
+        self.batch_timeout = batch_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='tmdb')
+
+        # Optional TMDBMetadataCache keyed by MovieLens movieId
+        self.metadata_cache = metadata_cache
+        # Summary lookups in flight by movieId, shared by concurrent callers
+        self._fetching = {}
+        self._fetching_lock = threading.Lock()
+
     def get_trending_movies(self, time_window='week', page=1):
         """Get trending movies for the week or day."""
         try:
@@ -31,19 +61,181 @@ class TMDBClient:
         """Search for movies by title."""
         try:
             movies = self.search.movies(query, page=page)
-            return [{
-                'id': movie.id,
-                'title': movie.title,
-                'overview': movie.overview,
-                'poster_path': f"https://image.tmdb.org/t/p/w500{movie.poster_path}" if movie.poster_path else None,
-                'release_date': movie.release_date if hasattr(movie, 'release_date') else None,
-                'vote_average': movie.vote_average,
-                'vote_count': movie.vote_count
-            } for movie in movies]
+            return [self._search_result(movie) for movie in movies]
         except Exception as e:
             print(f"Error searching movies: {str(e)}")
             return []
 
+    def search_movies_batch(self, queries, timeout=None):
+        """Search for several movie titles concurrently.
+
+        Lookups run on the client's bounded thread pool, each with its own
+        request timeout, so the batch costs about one round-trip however many
+        titles it holds. Returns one list of results per query, in order;
+        lookups that fail or are still pending after ``timeout`` seconds
+        (default ``batch_timeout``) come back empty.
+        """
+        queries = list(queries)
+        results = []
+        for query, (ok, value) in zip(queries, self._run_batch(
+                self._search_request, [(query,) for query in queries], timeout)):
+            if not ok:
+                print(f"Error searching movies for '{query}': {value}")
+            results.append(value if ok else [])
+        return results
+
+    def get_movie_summaries(self, movie_ids, titles=None, timeout=None):
+        """Return the TMDB summary of each MovieLens movie, or None.
+
+        With a metadata cache, fresh entries are served from it and stale
+        ones are served while being refreshed in the background. Misses are
+        fetched concurrently by TMDB id, falling back to a title search for
+        movies without a link, and written back. Lookups still running after
+        ``timeout`` seconds (default ``batch_timeout``) come back as None but
+        finish in the background, so the next request finds them cached.
+        Without a cache every movie is looked up by title search.
+        """
+        movie_ids = [int(movie_id) for movie_id in movie_ids]
+        titles = list(titles) if titles is not None else [None] * len(movie_ids)
+        if self.metadata_cache is None:
+            return [results[0] if results else None
+                    for results in self.search_movies_batch(titles, timeout)]
+
+        entries = self.metadata_cache.get_many(movie_ids)
+        summaries = [None] * len(movie_ids)
+        missing, stale = [], []
+        for i, (movie_id, title) in enumerate(zip(movie_ids, titles)):
+            entry = entries.get(movie_id)
+            if entry is not None and entry['fetched']:
+                summaries[i] = entry['payload']
+                if entry['stale']:
+                    stale.append((movie_id, entry['tmdb_id'], title))
+                CACHE_LOOKUPS.inc(cache='tmdb', result='stale' if entry['stale'] else 'hit')
+            else:
+                missing.append((i, (movie_id, entry['tmdb_id'] if entry else None, title)))
+                CACHE_LOOKUPS.inc(cache='tmdb', result='miss')
+
+        if missing:
+            deadline = time.monotonic() + (self.batch_timeout if timeout is None else timeout)
+            lookups = [self._fetch_summary(*item) for _, item in missing]
+            done, _ = wait(lookups, timeout=max(0.0, deadline - time.monotonic()))
+            for (i, (movie_id, _, _)), lookup in zip(missing, lookups):
+                if lookup not in done:
+                    # Only this wait gives up; the lookup still fills the cache
+                    print(f"Error fetching TMDB data for movie {movie_id}: timed out")
+                elif lookup.exception() is None:
+                    summaries[i] = lookup.result()
+
+        for item in stale:
+            # Stale entries are served now and refreshed in the background
+            self._fetch_summary(*item)
+        return summaries
+
+    def _fetch_summary(self, movie_id, tmdb_id, title):
+        """Start (or join) the lookup of one movie summary; returns its future.
+
+        The lookup has its own ``batch_timeout`` and writes its result to the
+        metadata cache when it finishes, whether or not anyone still waits
+        for it. Concurrent lookups of the same movie share one request.
+        """
+        with self._fetching_lock:
+            lookup = self._fetching.get(movie_id)
+            started = lookup is None
+            if started:
+                lookup = self.executor.submit(self._summary_request, tmdb_id, title,
+                                              time.monotonic() + self.batch_timeout)
+                self._fetching[movie_id] = lookup
+        if started:
+            # Outside the lock: a lookup that already finished runs the callback here
+            lookup.add_done_callback(functools.partial(self._store_summary, movie_id, tmdb_id))
+        return lookup
+
+    def _store_summary(self, movie_id, tmdb_id, lookup):
+        """Done-callback of ``_fetch_summary``: cache the summary (None if TMDB has none)."""
+        try:
+            summary = lookup.result()
+            self.metadata_cache.put_many(
+                [(movie_id, summary['id'] if summary else tmdb_id, summary)])
+        except Exception as e:
+            print(f"Error fetching TMDB data for movie {movie_id}: {str(e)}")
+        finally:
+            with self._fetching_lock:
+                self._fetching.pop(movie_id, None)
+
+    def _run_batch(self, request, arguments, timeout=None):
+        """Run ``request(*args, deadline)`` for every args tuple on the pool.
+
+        Returns ``(ok, value)`` pairs in order: the result, or the error
+        message for calls that raised or were still pending at the deadline
+        (``timeout`` seconds, default ``batch_timeout``).
+        """
+        deadline = time.monotonic() + (self.batch_timeout if timeout is None else timeout)
+        futures = [self.executor.submit(request, *args, deadline) for args in arguments]
+        done, pending = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        for future in pending:
+            future.cancel()
+
+        outcomes = []
+        for future in futures:
+            if future not in done:
+                outcomes.append((False, 'timed out'))
+                continue
+            try:
+                outcomes.append((True, future.result()))
+            except Exception as e:
+                outcomes.append((False, str(e)))
+        return outcomes
+
+    def _get(self, path, deadline, **params):
+        """GET ``path`` through the pooled session, bounded by ``deadline``."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError('timed out')
+        params.update(api_key=self.api_key, language=self.tmdb.language)
+        with span('tmdb_io'):
+            try:
+                response = self.session.get(f"{self.base_url}{path}", params=params,
+                                            timeout=min(self.request_timeout, remaining))
+            except requests.Timeout:
+                TMDB_REQUESTS.inc(outcome='timeout')
+                raise
+            except requests.RequestException:
+                TMDB_REQUESTS.inc(outcome='error')
+                raise
+        TMDB_REQUESTS.inc(outcome=f'{response.status_code // 100}xx')
+        return response
+
+    def _search_request(self, query, deadline):
+        response = self._get('/search/movie', deadline, query=query)
+        response.raise_for_status()
+        return [self._search_result(movie) for movie in response.json().get('results', [])]
+
+    def _summary_request(self, tmdb_id, title, deadline):
+        """Fetch one movie summary by TMDB id (or title); None if TMDB has no match."""
+        if tmdb_id is None:
+            results = self._search_request(title, deadline) if title else []
+            return results[0] if results else None
+        response = self._get(f'/movie/{int(tmdb_id)}', deadline)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return self._search_result(response.json())
+
+    @staticmethod
+    def _search_result(movie):
+        """Shape a search hit (tmdbv3api object or raw JSON dict)."""
+        get = movie.get if isinstance(movie, dict) else lambda key: getattr(movie, key, None)
+        poster_path = get('poster_path')
+        return {
+            'id': get('id'),
+            'title': get('title'),
+            'overview': get('overview'),
+            'poster_path': f"https://image.tmdb.org/t/p/w500{poster_path}" if poster_path else None,
+            'release_date': get('release_date'),
+            'vote_average': get('vote_average'),
+            'vote_count': get('vote_count')
+        }
+
     def get_movie_details(self, movie_id):
         """Get detailed information about a specific movie."""
         try: